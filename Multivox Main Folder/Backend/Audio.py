@@ -1,14 +1,24 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
-import tempfile
+import itertools
 import os
 import traceback
 import speech_recognition as sr
 from deep_translator import GoogleTranslator
-import io
-import subprocess
+import json
+import queue
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from gtts import gTTS
 import logging
+from audio_decoder import DecoderPool, DecodeError, wav_to_pcm
+from translation_cache import translation_cache
+from tts_cache import TTSCache
+from vad import split_on_silence, span_seconds
+from voice_stream import StreamSession, SessionRegistry
+from translation_batch import translate_texts
+from audio_stages import (
+    FFMPEG_PATH, SR_CHUNK_MAX_SECONDS, SUPPORTED_LANGUAGES, recognize_pcm, translate_text
+)
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
@@ -19,71 +29,45 @@ CORS(app)
 
 app.config["MAX_CONTENT_LENGTH"] = 50 * 1024 * 1024  # 50 MB
 
-# Use environment variable for FFmpeg path or default to system PATH
-FFMPEG_PATH = os.environ.get("FFMPEG_PATH", "ffmpeg")
 FFPROBE_PATH = os.environ.get("FFPROBE_PATH", "ffprobe")
 
-# Supported languages for translation
-SUPPORTED_LANGUAGES = {
-    'en': 'English', 'es': 'Spanish', 'fr': 'French', 'de': 'German', 
-    'it': 'Italian', 'pt': 'Portuguese', 'ru': 'Russian', 'ja': 'Japanese',
-    'ko': 'Korean', 'zh': 'Chinese', 'ar': 'Arabic', 'hi': 'Hindi',
-    'ur': 'Urdu', 'tr': 'Turkish', 'nl': 'Dutch', 'sv': 'Swedish',
-    'pl': 'Polish', 'vi': 'Vietnamese', 'th': 'Thai'
-}
+# Bounded pool of pipe-based FFmpeg decoders shared by all requests
+decoder_pool = DecoderPool(ffmpeg_path=FFMPEG_PATH)
+
+# Byte-capped on-disk LRU of synthesized speech (TTS_CACHE_DIR / TTS_CACHE_MAX_BYTES)
+tts_cache = TTSCache()
+
+# Long clips are split on silence into chunks of at most SR_CHUNK_MAX_SECONDS,
+# recognized concurrently by a bounded pool
+SR_WORKERS = int(os.environ.get("SR_WORKERS", "4"))
+sr_pool = ThreadPoolExecutor(max_workers=SR_WORKERS, thread_name_prefix="speech-recognizer")
+
+# Live voice translation sessions (see voice_stream.py); idle ones are closed
+# by a background sweep (STREAM_IDLE_TIMEOUT / STREAM_SWEEP_INTERVAL)
+stream_sessions = SessionRegistry()
+stream_sessions.start()
+STREAM_INPUT_FORMATS = {None, "webm", "ogg", "s16le"}
+
+# Batch text translation: identical items are deduplicated, small strings packed
+# into provider-sized requests, and the packs fanned out on a bounded pool
+BATCH_MAX_ITEMS = int(os.environ.get("TRANSLATE_BATCH_MAX_ITEMS", "1000"))
+TRANSLATE_WORKERS = int(os.environ.get("TRANSLATE_WORKERS", "8"))
+translate_pool = ThreadPoolExecutor(max_workers=TRANSLATE_WORKERS, thread_name_prefix="translator")
 
 def convert_audio_to_wav(audio_data, input_ext=".webm"):
     """
-    Convert any audio format to WAV using FFmpeg
+    Convert any audio format to 16 kHz mono WAV.
+
+    The upload is piped through a pooled FFmpeg worker (no temp files);
+    input that is already 16 kHz mono PCM WAV is returned as-is.
     """
     try:
-        # Create temporary files
-        with tempfile.NamedTemporaryFile(delete=False, suffix=input_ext) as input_file:
-            input_file.write(audio_data)
-            input_path = input_file.name
-            
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as output_file:
-            output_path = output_file.name
-            
-        # Convert using FFmpeg
-        cmd = [
-            FFMPEG_PATH,
-            '-i', input_path,
-            '-acodec', 'pcm_s16le',
-            '-ac', '1',
-            '-ar', '16000',
-            output_path,
-            '-y'
-        ]
-        
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        
-        if result.returncode == 0:
-            # Read the converted file
-            with open(output_path, 'rb') as f:
-                wav_data = f.read()
-                
-            # Clean up
-            os.unlink(input_path)
-            os.unlink(output_path)
-            
-            return wav_data
-        else:
-            logging.error(f"FFmpeg conversion failed: {result.stderr}")
-            return None
-            
+        return decoder_pool.to_wav(audio_data)
+    except DecodeError as e:
+        logging.error(f"FFmpeg conversion failed: {e}")
+        return None
     except Exception as e:
         logging.error(f"Error in FFmpeg conversion: {e}")
-        try:
-            os.unlink(input_path)
-            os.unlink(output_path)
-        except:
-            pass
         return None
 
 def detect_audio_format(audio_data):
@@ -102,66 +86,115 @@ def detect_audio_format(audio_data):
         # Default to webm for Chrome recordings
         return '.webm'
 
+def recognize_chunks(pcm):
+    """
+    Split PCM on silence and recognize the chunks concurrently.
+    Yields (index, start_s, end_s, text, error) as each chunk finishes.
+    """
+    spans = split_on_silence(pcm, max_chunk_s=SR_CHUNK_MAX_SECONDS)
+    futures = {sr_pool.submit(recognize_pcm, pcm[s:e]): (i, (s, e)) for i, (s, e) in enumerate(spans)}
+    for future in as_completed(futures):
+        index, span = futures[future]
+        start, end = span_seconds(span)
+        try:
+            yield index, start, end, future.result(), None
+        except sr.RequestError as e:
+            yield index, start, end, "", f"Error with speech recognition service: {e}"
+        except Exception as e:
+            yield index, start, end, "", f"Error transcribing audio: {str(e)}"
+
 def transcribe_audio(audio_data):
     """
-    Transcribe audio using Google Speech Recognition
+    Transcribe a 16 kHz mono WAV blob using Google Speech Recognition.
+    Long clips are split on silence and the chunks recognized in parallel.
     """
     try:
-        recognizer = sr.Recognizer()
-        
-        # Create a temporary file in memory
-        with sr.AudioFile(io.BytesIO(audio_data)) as source:
-            audio_data = recognizer.record(source)
+        pcm = wav_to_pcm(audio_data)
+        texts = {}
+        errors = []
         print("Attempting recognition...")
-        text = recognizer.recognize_google(audio_data)
-        print("Recognized text:", text)
-        return text
-    except sr.UnknownValueError:
+        for index, _, _, text, error in recognize_chunks(pcm):
+            if error:
+                errors.append(error)
+            elif text:
+                texts[index] = text
+        if texts:
+            if errors:
+                logging.warning(f"{len(errors)} chunk(s) failed recognition: {errors[0]}")
+            text = " ".join(texts[i] for i in sorted(texts))
+            print("Recognized text:", text)
+            return text
+        if errors:
+            return errors[0]
         print("Google SR could not understand audio.")
         return "Could not understand audio"
-    except sr.RequestError as e:
-        return f"Error with speech recognition service: {e}"
     except Exception as e:
         return f"Error transcribing audio: {str(e)}"
 
-def translate_text(text, target_lang):
+def stream_translation(pcm, target_lang):
     """
-    Translate text using deep_translator library
+    Yield NDJSON lines with the transcript and translation of each chunk
+    as soon as it is recognized, then a final line with the full result.
     """
-    try:
-        if text.strip() and target_lang in SUPPORTED_LANGUAGES:
-            translation = GoogleTranslator(source='auto', target=target_lang).translate(text)
-            return translation
-        return text
-    except Exception as e:
-        return f"Translation error: {str(e)}"
+    transcripts = {}
+    translations = {}
+    for index, start, end, text, error in recognize_chunks(pcm):
+        event = {"index": index, "start": round(start, 2), "end": round(end, 2)}
+        if error:
+            event["error"] = error
+        else:
+            event["transcript"] = text
+            event["translated_text"] = translate_text(text, target_lang) if text else ""
+            if text:
+                transcripts[index] = text
+                translations[index] = event["translated_text"]
+        yield json.dumps(event) + "\n"
+
+    order = sorted(transcripts)
+    yield json.dumps({
+        "done": True,
+        "transcript": " ".join(transcripts[i] for i in order),
+        "translated_text": " ".join(translations[i] for i in order)
+    }) + "\n"
 
-def text_to_speech(text, lang='en'):
+def text_to_speech(text, lang='en', slow=False):
     """
-    Convert text to speech using gTTS
+    Convert text to speech using gTTS.
+    Returns an iterator of MP3 chunks that is written through to the TTS
+    cache as it is consumed, or None if synthesis fails to start.
     """
     try:
         if not text.strip():
             return None
-            
-        # Create a temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as tmp_file:
-            tts = gTTS(text=text, lang=lang, slow=False)
-            tts.save(tmp_file.name)
-            return tmp_file.name
+
+        chunks = tts_cache.stream_and_store(text, lang, slow, gTTS(text=text, lang=lang, slow=slow).stream())
+        # Pull the first chunk eagerly so request/language errors surface
+        # before the response headers are sent
+        first = next(chunks, None)
+        if first is None:
+            return None
+        return itertools.chain([first], chunks)
     except Exception as e:
         print(f"TTS error: {e}")
         return None
 
 @app.route("/health", methods=["GET"])
 def health():
-    info = {"status": "ok", "free_apis_available": True, "mode": "free_apis"}
+    info = {
+        "status": "ok",
+        "free_apis_available": True,
+        "mode": "free_apis",
+        "translation_cache": translation_cache.stats(),
+        "tts_cache": tts_cache.stats(),
+        "stream_sessions": len(stream_sessions)
+    }
     return jsonify(info)
 
 @app.route("/translate", methods=["POST", "OPTIONS"])
 def translate_audio():
     """
-    Accepts a recorded audio blob, transcribes it, and translates it
+    Accepts a recorded audio blob, transcribes it, and translates it.
+    With form field stream=true, per-chunk results are streamed as NDJSON.
     """
     if request.method == "OPTIONS":
         return jsonify({}), 200
@@ -173,6 +206,7 @@ def translate_audio():
         audio_file = request.files["file"]
         source_lang = request.form.get("source_lang", "auto")
         target_lang = request.form.get("target_lang", "en")
+        stream = request.form.get("stream", "false") == "true"
 
         # Validate target language
         if target_lang not in SUPPORTED_LANGUAGES:
@@ -191,6 +225,13 @@ def translate_audio():
         if not wav_data:
             return jsonify({"error": "Failed to process audio file. Please try a different format or check FFmpeg installation."}), 400
         
+        # Optionally stream per-chunk results as NDJSON
+        if stream:
+            return Response(
+                stream_with_context(stream_translation(wav_to_pcm(wav_data), target_lang)),
+                mimetype="application/x-ndjson"
+            )
+
         # Transcribe audio
         original_text = transcribe_audio(wav_data)
         
@@ -212,6 +253,109 @@ def translate_audio():
         traceback.print_exc()
         return jsonify({"error": f"Server exception: {str(e)}"}), 500
 
+@app.route("/stream/sessions", methods=["POST", "OPTIONS"])
+def create_stream_session():
+    """
+    JSON: { target_lang, format }
+    Starts a live translation session. `format` is "s16le" for raw 16 kHz
+    mono PCM frames; by default any container ffmpeg can decode incrementally
+    (MediaRecorder WebM/Opus or Ogg) is accepted.
+    """
+    if request.method == "OPTIONS":
+        return jsonify({}), 200
+
+    try:
+        data = request.get_json(force=True, silent=True) or {}
+        target_lang = data.get("target_lang", "en")
+        input_format = data.get("format")
+
+        if target_lang not in SUPPORTED_LANGUAGES:
+            return jsonify({"error": f"Unsupported target language: {target_lang}"}), 400
+        if input_format not in STREAM_INPUT_FORMATS:
+            return jsonify({"error": f"Unsupported stream format: {input_format}"}), 400
+
+        session = stream_sessions.add(
+            StreamSession(target_lang, recognize_pcm, translate_text, sr_pool, input_format=input_format)
+        )
+        return jsonify({
+            "session_id": session.id,
+            "audio_url": f"/stream/sessions/{session.id}/audio",
+            "events_url": f"/stream/sessions/{session.id}/events"
+        }), 201
+
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": f"Server exception: {str(e)}"}), 500
+
+@app.route("/stream/sessions/<session_id>/audio", methods=["POST", "OPTIONS"])
+def stream_session_audio(session_id):
+    """
+    Append recorded audio frames (request body, or multipart field 'file')
+    """
+    if request.method == "OPTIONS":
+        return jsonify({}), 200
+
+    session = stream_sessions.get(session_id)
+    if not session:
+        return jsonify({"error": "Unknown stream session."}), 404
+
+    audio_file = request.files.get("file")
+    data = audio_file.read() if audio_file else request.get_data()
+    if not data:
+        return jsonify({"error": "Empty audio frame."}), 400
+
+    try:
+        session.feed(data)
+        return jsonify({"status": "accepted"}), 202
+    except (ValueError, DecodeError) as e:
+        return jsonify({"error": str(e)}), 409
+
+@app.route("/stream/sessions/<session_id>/events", methods=["GET"])
+def stream_session_events(session_id):
+    """
+    Server-sent events: 'partial' while an utterance is in progress,
+    'result' (or 'error') when it is finalized, and 'end' after close.
+    """
+    session = stream_sessions.get(session_id)
+    if not session:
+        return jsonify({"error": "Unknown stream session."}), 404
+
+    def events():
+        try:
+            while True:
+                try:
+                    event = session.events.get(timeout=15)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+                if event["type"] == "end":
+                    break
+        finally:
+            session.close()
+            stream_sessions.remove(session_id)
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route("/stream/sessions/<session_id>", methods=["DELETE", "OPTIONS"])
+def close_stream_session(session_id):
+    """
+    Signal end of audio; remaining utterances are flushed before 'end'
+    """
+    if request.method == "OPTIONS":
+        return jsonify({}), 200
+
+    session = stream_sessions.get(session_id)
+    if not session:
+        return jsonify({"error": "Unknown stream session."}), 404
+
+    session.close()
+    return jsonify({"status": "closing"}), 202
+
 @app.route("/text-to-speech", methods=["POST", "OPTIONS"])
 def handle_text_to_speech():
     """
@@ -232,18 +376,31 @@ def handle_text_to_speech():
         if lang not in SUPPORTED_LANGUAGES:
             return jsonify({"error": f"Unsupported language: {lang}"}), 400
             
-        # Generate speech
-        audio_file = text_to_speech(text, lang)
-        
-        if not audio_file:
+        # Serve straight from disk on a cache hit
+        cached = tts_cache.open(text, lang)
+        if cached:
+            response = send_file(
+                cached,
+                mimetype="audio/mpeg",
+                as_attachment=True,
+                download_name="speech.mp3"
+            )
+            response.headers["X-TTS-Cache"] = "HIT"
+            return response
+
+        # Otherwise stream MP3 bytes as gTTS produces them
+        chunks = text_to_speech(text, lang)
+
+        if not chunks:
             return jsonify({"error": "Failed to generate speech"}), 500
-            
-        # Return the audio file
-        return send_file(
-            audio_file,
+
+        return Response(
+            stream_with_context(chunks),
             mimetype="audio/mpeg",
-            as_attachment=True,
-            download_name="speech.mp3"
+            headers={
+                "Content-Disposition": "attachment; filename=speech.mp3",
+                "X-TTS-Cache": "MISS"
+            }
         )
         
     except Exception as e:
@@ -279,6 +436,65 @@ def text_translate():
         traceback.print_exc()
         return jsonify({"error": f"Server exception: {str(e)}"}), 500
 
+@app.route("/text-translate/batch", methods=["POST", "OPTIONS"])
+def text_translate_batch():
+    """
+    JSON: { items: [{ text, source_lang, target_lang }, ...] }
+    Returns { results: [translated_text | null, ...], errors: [{ index, error }], stats }
+    with results in request order
+    """
+    if request.method == "OPTIONS":
+        return jsonify({}), 200
+
+    try:
+        data = request.get_json(force=True, silent=True) or {}
+        items = data.get("items")
+        if not isinstance(items, list) or not items:
+            return jsonify({"error": "Field 'items' must be a non-empty list."}), 400
+        if len(items) > BATCH_MAX_ITEMS:
+            return jsonify({"error": f"Too many items (limit {BATCH_MAX_ITEMS})."}), 400
+
+        results = [None] * len(items)
+        errors = []
+        groups = {}  # (source_lang, target_lang) -> item indices
+        for i, item in enumerate(items):
+            item = item if isinstance(item, dict) else {}
+            text = (item.get("text") or "").strip()
+            source_lang = item.get("source_lang", "auto")
+            target_lang = item.get("target_lang", "en")
+            if not text:
+                errors.append({"index": i, "error": "Field 'text' required."})
+            elif target_lang not in SUPPORTED_LANGUAGES:
+                errors.append({"index": i, "error": f"Unsupported target language: {target_lang}"})
+            elif source_lang != "auto" and source_lang not in SUPPORTED_LANGUAGES:
+                errors.append({"index": i, "error": f"Unsupported source language: {source_lang}"})
+            else:
+                groups.setdefault((source_lang, target_lang), []).append(i)
+
+        stats = {"items": len(items), "unique": 0, "cached": 0, "requests": 0}
+        for (source_lang, target_lang), indices in groups.items():
+            outcomes, group_stats = translate_texts(
+                [items[i]["text"] for i in indices],
+                lambda t: GoogleTranslator(source=source_lang, target=target_lang).translate(t),
+                lookup=lambda t: translation_cache.get(t, source_lang, target_lang, 'google'),
+                store=lambda t, out: translation_cache.set(t, source_lang, target_lang, 'google', out),
+                executor=translate_pool
+            )
+            for key in ("unique", "cached", "requests"):
+                stats[key] += group_stats[key]
+            for i, (translated, error) in zip(indices, outcomes):
+                if error:
+                    errors.append({"index": i, "error": f"Translation error: {error}"})
+                else:
+                    results[i] = translated
+
+        errors.sort(key=lambda e: e["index"])
+        return jsonify({"results": results, "errors": errors, "stats": stats})
+
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": f"Server exception: {str(e)}"}), 500
+
 @app.route("/languages", methods=["GET"])
 def get_languages():
     """
@@ -0,0 +1,294 @@
+"""
+ASGI serving mode for the voice translation service.
+
+Same routes and JSON contracts as Audio.py, served by Quart so a request
+waiting on the network no longer pins a worker thread:
+  - ffmpeg runs as an asyncio subprocess (audio_decoder.AsyncDecoder)
+  - the recognizer, translator and gTTS clients have no async API, so their
+    calls are awaited on a large I/O thread pool
+  - CPU-bound VAD chunking runs on a small separate executor
+
+Run with:  hypercorn Audio_async:app --bind 0.0.0.0:5001
+The sync app in Audio.py stays available for side-by-side comparison.
+"""
+import os
+import json
+import asyncio
+import logging
+import traceback
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+from quart import Quart, Response, request, jsonify
+from quart_cors import cors
+from gtts import gTTS
+
+# Shared stages come from a module without import-time side effects, so this
+# app does not start Audio.py's decoder pool, thread pools or session sweeper
+from audio_stages import (
+    SUPPORTED_LANGUAGES, SR_CHUNK_MAX_SECONDS, FFMPEG_PATH, recognize_pcm, translate_text
+)
+from translation_cache import translation_cache
+from tts_cache import TTSCache
+from audio_decoder import AsyncDecoder, DecodeError
+from vad import split_on_silence, span_seconds
+
+app = Quart(__name__)
+app = cors(app, allow_origin="*")
+
+app.config["MAX_CONTENT_LENGTH"] = 50 * 1024 * 1024  # 50 MB
+
+# Blocking network clients wait here; threads are cheap while they sleep on I/O
+ASYNC_IO_THREADS = int(os.environ.get("ASYNC_IO_THREADS", "64"))
+# Concurrent recognition requests per clip
+ASYNC_SR_CONCURRENCY = int(os.environ.get("ASYNC_SR_CONCURRENCY", "8"))
+
+io_pool = ThreadPoolExecutor(max_workers=ASYNC_IO_THREADS, thread_name_prefix="async-io")
+cpu_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="async-cpu")
+decoder = AsyncDecoder(ffmpeg_path=FFMPEG_PATH)
+# Byte-capped on-disk LRU of synthesized speech, shared with Audio.py through TTS_CACHE_DIR
+tts_cache = TTSCache()
+
+
+async def run_io(fn, *args, **kwargs):
+    """Await a blocking network call on the I/O pool."""
+    return await asyncio.get_running_loop().run_in_executor(io_pool, partial(fn, *args, **kwargs))
+
+
+async def run_cpu(fn, *args, **kwargs):
+    """Await a CPU-bound step on the CPU pool."""
+    return await asyncio.get_running_loop().run_in_executor(cpu_pool, partial(fn, *args, **kwargs))
+
+
+async def recognize_chunks(pcm):
+    """
+    Async version of Audio.recognize_chunks: yields
+    (index, start_s, end_s, text, error) as each VAD chunk is recognized.
+    """
+    spans = await run_cpu(split_on_silence, pcm, max_chunk_s=SR_CHUNK_MAX_SECONDS)
+    semaphore = asyncio.Semaphore(ASYNC_SR_CONCURRENCY)
+
+    async def recognize(index, span):
+        start, end = span_seconds(span)
+        async with semaphore:
+            try:
+                return index, start, end, await run_io(recognize_pcm, pcm[span[0]:span[1]]), None
+            except Exception as e:
+                return index, start, end, "", f"Error with speech recognition service: {e}"
+
+    tasks = [asyncio.ensure_future(recognize(i, span)) for i, span in enumerate(spans)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def transcribe_pcm(pcm):
+    """Transcribe 16 kHz mono PCM; same result strings as Audio.transcribe_audio."""
+    texts = {}
+    errors = []
+    async for index, _, _, text, error in recognize_chunks(pcm):
+        if error:
+            errors.append(error)
+        elif text:
+            texts[index] = text
+    if texts:
+        if errors:
+            logging.warning(f"{len(errors)} chunk(s) failed recognition: {errors[0]}")
+        return " ".join(texts[i] for i in sorted(texts))
+    if errors:
+        return errors[0]
+    return "Could not understand audio"
+
+
+async def stream_translation(pcm, target_lang):
+    """NDJSON stream of per-chunk results, as in Audio.stream_translation."""
+    transcripts = {}
+    translations = {}
+    async for index, start, end, text, error in recognize_chunks(pcm):
+        event = {"index": index, "start": round(start, 2), "end": round(end, 2)}
+        if error:
+            event["error"] = error
+        else:
+            event["transcript"] = text
+            event["translated_text"] = await run_io(translate_text, text, target_lang) if text else ""
+            if text:
+                transcripts[index] = text
+                translations[index] = event["translated_text"]
+        yield json.dumps(event) + "\n"
+
+    order = sorted(transcripts)
+    yield json.dumps({
+        "done": True,
+        "transcript": " ".join(transcripts[i] for i in order),
+        "translated_text": " ".join(translations[i] for i in order)
+    }) + "\n"
+
+
+async def stream_speech(text, lang):
+    """Drive the blocking gTTS stream from the I/O pool, chunk by chunk."""
+    chunks = tts_cache.stream_and_store(text, lang, False, gTTS(text=text, lang=lang, slow=False).stream())
+    try:
+        while True:
+            chunk = await run_io(next, chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        await run_io(chunks.close)
+
+
+@app.route("/health", methods=["GET"])
+async def health():
+    info = {
+        "status": "ok",
+        "free_apis_available": True,
+        "mode": "free_apis",
+        "server": "asgi",
+        "translation_cache": translation_cache.stats(),
+        "tts_cache": tts_cache.stats()
+    }
+    return jsonify(info)
+
+@app.route("/translate", methods=["POST", "OPTIONS"])
+async def translate_audio():
+    """
+    Accepts a recorded audio blob, transcribes it, and translates it.
+    With form field stream=true, per-chunk results are streamed as NDJSON.
+    """
+    if request.method == "OPTIONS":
+        return jsonify({}), 200
+
+    try:
+        files = await request.files
+        form = await request.form
+        if "file" not in files:
+            return jsonify({"error": "No file uploaded (field name must be 'file')."}), 400
+
+        target_lang = form.get("target_lang", "en")
+        stream = form.get("stream", "false") == "true"
+
+        if target_lang not in SUPPORTED_LANGUAGES:
+            return jsonify({"error": f"Unsupported target language: {target_lang}"}), 400
+
+        audio_data = files["file"].read()
+        if not audio_data:
+            return jsonify({"error": "Uploaded audio file is empty."}), 400
+
+        try:
+            pcm = await decoder.to_pcm(audio_data)
+        except (DecodeError, OSError) as e:
+            logging.error(f"FFmpeg conversion failed: {e}")
+            return jsonify({"error": "Failed to process audio file. Please try a different format or check FFmpeg installation."}), 400
+
+        if stream:
+            return Response(stream_translation(pcm, target_lang), mimetype="application/x-ndjson")
+
+        original_text = await transcribe_pcm(pcm)
+        if "Error" in original_text or "Could not understand" in original_text:
+            return jsonify({"error": original_text}), 400
+
+        translated_text = await run_io(translate_text, original_text, target_lang)
+        return jsonify({
+            "transcript": original_text,
+            "translated_text": translated_text
+        })
+
+    except Exception as e:
+        logging.error(f"Server exception in translate_audio: {str(e)}")
+        traceback.print_exc()
+        return jsonify({"error": f"Server exception: {str(e)}"}), 500
+
+@app.route("/text-to-speech", methods=["POST", "OPTIONS"])
+async def handle_text_to_speech():
+    """
+    Convert text to speech and return audio file
+    """
+    if request.method == "OPTIONS":
+        return jsonify({}), 200
+
+    try:
+        data = await request.get_json(force=True, silent=True) or {}
+        text = (data.get("text") or "").strip()
+        lang = data.get("lang", "en")
+
+        if not text:
+            return jsonify({"error": "Field 'text' required."}), 400
+        if lang not in SUPPORTED_LANGUAGES:
+            return jsonify({"error": f"Unsupported language: {lang}"}), 400
+
+        cached = await run_io(tts_cache.read, text, lang)
+        if cached:
+            return Response(cached, mimetype="audio/mpeg", headers={
+                "Content-Disposition": "attachment; filename=speech.mp3",
+                "X-TTS-Cache": "HIT"
+            })
+
+        chunks = stream_speech(text, lang)
+        try:
+            # Surface synthesis errors before the response headers are sent
+            first = await chunks.__anext__()
+        except StopAsyncIteration:
+            first = None
+        except Exception as e:
+            print(f"TTS error: {e}")
+            first = None
+        if first is None:
+            return jsonify({"error": "Failed to generate speech"}), 500
+
+        async def body():
+            yield first
+            async for chunk in chunks:
+                yield chunk
+
+        return Response(body(), mimetype="audio/mpeg", headers={
+            "Content-Disposition": "attachment; filename=speech.mp3",
+            "X-TTS-Cache": "MISS"
+        })
+
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": f"Server exception: {str(e)}"}), 500
+
+@app.route("/text-translate", methods=["POST", "OPTIONS"])
+async def text_translate():
+    """
+    JSON: { text, source_lang, target_lang }
+    Returns JSON translation
+    """
+    if request.method == "OPTIONS":
+        return jsonify({}), 200
+
+    try:
+        data = await request.get_json(force=True, silent=True) or {}
+        text = (data.get("text") or "").strip()
+        if not text:
+            return jsonify({"error": "Field 'text' required."}), 400
+
+        target_lang = data.get("target_lang", "en")
+        if target_lang not in SUPPORTED_LANGUAGES:
+            return jsonify({"error": f"Unsupported target language: {target_lang}"}), 400
+
+        translated = await run_io(translate_text, text, target_lang)
+        return jsonify({"translated_text": translated})
+
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": f"Server exception: {str(e)}"}), 500
+
+@app.route("/languages", methods=["GET"])
+async def get_languages():
+    """
+    Return supported languages
+    """
+    return jsonify(SUPPORTED_LANGUAGES)
+
+@app.route("/", methods=["GET"])
+async def index():
+    return jsonify({"message": "Voice Translation API is running", "mode": "free_apis", "server": "asgi"})
+
+if __name__ == "__main__":
+    print("Starting Quart (ASGI) server with free speech-to-text and translation APIs")
+    app.run(debug=True, port=5001, host="0.0.0.0")
@@ -4,49 +4,72 @@ import io
 import uuid
 import sqlite3
 import datetime as dt
-import asyncio
+import atexit
 import logging
 import json
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
+import csv
+from collections import namedtuple
 from reportlab.lib.utils import ImageReader
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
-from googletrans import Translator
-import pytesseract
-from PIL import Image
-from PyPDF2 import PdfReader
-from docx import Document
+from googletrans import LANGUAGES
 import tempfile
+from translation_cache import translation_cache
+from translation_batch import translate_texts, pack_items
+from googletrans_client import GoogletransClient
+from document_translation import make_chunks, translate_chunks, assemble, detected_source
+from document_extraction import open_document, ExtractionError, DocumentTooLarge, DOC_MAX_BYTES
+from domain_dictionary import DomainDictionary
+from translator_db import ConnectionPool, GroupCommitWriter, encode_cursor, decode_cursor
+from translation_memory import TranslationMemory, ORIGIN_PROVIDER, ORIGIN_MEMORY
+from ocr_pipeline import OcrPipeline
+from pdf_render import PdfCache, TEMPLATES as PDF_TEMPLATES, DEFAULT_TEMPLATE as DEFAULT_PDF_TEMPLATE
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 DB_PATH = "translator.db"
+BATCH_MAX_ITEMS = int(os.environ.get("TRANSLATE_BATCH_MAX_ITEMS", "1000"))
+DOMAIN_BULK_MAX_TERMS = int(os.environ.get("DOMAIN_BULK_MAX_TERMS", "100000"))
+HISTORY_MAX_LIMIT = 200
 
 app = Flask(__name__)
 CORS(app)
 
-# Create a wrapper for async translation
-async def async_translate(text, dest, src='auto'):
-    translator = Translator()
-    return await translator.translate(text, dest=dest, src=src)
+# One long-lived event loop and pooled googletrans Translator shared by all
+# handlers (GOOGLETRANS_CONCURRENCY / GOOGLETRANS_TIMEOUT)
+translator_client = GoogletransClient()
+atexit.register(translator_client.close)
+
+CachedTranslation = namedtuple("CachedTranslation", ["text", "src"])
 
 def sync_translate(text, dest, src='auto'):
-    return asyncio.run(async_translate(text, dest, src))
+    """Translate through the shared cache; returns an object with .text and .src"""
+    def remote():
+        tr = translator_client.translate(text, dest=dest, src=src)
+        return {"text": tr.text, "src": tr.src}
+    result = translation_cache.get_or_translate(text, src, dest, "googletrans", remote)
+    return CachedTranslation(result["text"], result["src"])
 
 # ---------- Utilities ----------
 def now_iso():
     return dt.datetime.utcnow().isoformat() + "Z"
 
+# WAL-mode connection pool (DB_POOL_SIZE) and a group-commit writer
+# (DB_COMMIT_BATCH / DB_COMMIT_DELAY_MS) shared by all handlers
+pool = ConnectionPool(DB_PATH)
+writer = GroupCommitWriter(pool)
+
 def db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Borrow a pooled connection: `with db() as conn: ...`"""
+    return pool.connection()
 
 def init_db():
-    conn = db()
+    with db() as conn:
+        create_schema(conn)
+
+def create_schema(conn):
     cur = conn.cursor()
     cur.execute("""
     CREATE TABLE IF NOT EXISTS translations (
@@ -83,6 +106,15 @@ def init_db():
         meaning TEXT
     )
     """)
+    # Provenance for translation memory: the provider's raw output (before the
+    # domain/style helpers) and where it came from (ORIGIN_PROVIDER / ORIGIN_MEMORY)
+    columns = {row["name"] for row in cur.execute("PRAGMA table_info(translations)").fetchall()}
+    for column in ("raw_text", "origin"):
+        if column not in columns:
+            cur.execute(f"ALTER TABLE translations ADD COLUMN {column} TEXT")
+    # History is read per owner, newest first (keyset on created_at, id)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_translations_owner_created ON translations(owner, created_at, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_translations_created ON translations(created_at)")
     conn.commit()
 
     # Seed small domain terms if empty
@@ -99,10 +131,25 @@ def init_db():
         ]
         cur.executemany("INSERT INTO domain_dictionary(domain, term, meaning) VALUES (?, ?, ?)", seeds)
         conn.commit()
-    conn.close()
 
 init_db()
 
+# Per-domain compiled term matchers, rebuilt when domain_dictionary rows change
+domain_dictionary = DomainDictionary(DB_PATH)
+
+# Exact and fuzzy matches against the phrasebook and past translations,
+# consulted before the provider (TM_FUZZY_THRESHOLD / TM_REFRESH_SECONDS)
+translation_memory = TranslationMemory(db_path=DB_PATH)
+translation_memory.refresh()
+
+# Concurrent OCR of scanned PDF pages and images, cached per image
+# (OCR_WORKERS / OCR_TARGET_DPI / OCR_LANG)
+ocr = OcrPipeline()
+
+# Rendered PDFs cached on disk by (text, languages, template)
+# (PDF_CACHE_DIR / PDF_CACHE_MAX_MB / PDF_CACHE_MAX_FILES)
+pdf_cache = PdfCache()
+
 # ---------- Helpers ----------
 def apply_style_rules(text: str, style: str) -> str:
     """
@@ -123,115 +170,50 @@ def apply_style_rules(text: str, style: str) -> str:
     return text
 
 def apply_domain_dictionary(text: str, domain: str):
-    """Append domain meanings in parentheses for known terms."""
-    if not domain:
-        return text
-    conn = db()
-    rows = conn.execute("SELECT term, meaning FROM domain_dictionary WHERE domain=?", (domain,)).fetchall()
-    conn.close()
-    out = text
-    for r in rows:
-        term = r["term"]
-        meaning = r["meaning"]
-        # naive replacement when the exact term appears (case-sensitive)
-        out = out.replace(f" {term} ", f" {term} ({meaning}) ")
-    return out
-
-def save_translation(owner, source_text, source_lang, target_lang, translated_text):
+    """Append domain meanings in parentheses for known terms (case-sensitive, whole tokens)."""
+    return domain_dictionary.apply(text, domain)
+
+def memory_info(match):
+    """Response field describing a translation-memory match (None on a miss)"""
+    if match is None:
+        return None
+    return {
+        "match": match.kind,
+        "score": match.score,
+        "source_text": match.source_text,
+        "translation": match.translation
+    }
+
+def memory_translate(text, dest, src='auto', fuzzy=True):
+    """
+    Translate from memory on an exact match, else through the provider (and
+    remember the raw result). A fuzzy match is never used as the translation,
+    only returned as a suggestion. Returns (CachedTranslation, MemoryMatch or None);
+    the translation came from memory iff the match is exact.
+    """
+    match = translation_memory.lookup(text, dest, src, fuzzy=fuzzy)
+    if match and match.kind == "exact":
+        return CachedTranslation(match.translation, match.source_lang or src), match
+    tr = sync_translate(text, dest=dest, src=src)
+    translation_memory.add(text, dest, tr.text, tr.src)
+    return tr, match
+
+def from_memory(match):
+    return match is not None and match.kind == "exact"
+
+def save_translation(owner, source_text, source_lang, target_lang, translated_text, raw_text=None, origin=None):
+    """
+    Insert a history row; concurrent saves share one commit, and this returns once it is durable.
+    raw_text/origin record the untouched provider output for translation memory;
+    rows without origin ORIGIN_PROVIDER are never learned from.
+    """
     tid = str(uuid.uuid4())
-    conn = db()
-    conn.execute("""
-        INSERT INTO translations(id, owner, source_text, source_lang, target_lang, translated_text, created_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (tid, owner, source_text, source_lang, target_lang, translated_text, now_iso()))
-    conn.commit()
-    conn.close()
+    writer.execute("""
+        INSERT INTO translations(id, owner, source_text, source_lang, target_lang, translated_text, raw_text, origin, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (tid, owner, source_text, source_lang, target_lang, translated_text, raw_text, origin, now_iso()))
     return tid
-def create_pdf(translated_text, source_lang, target_lang):
-    """Create a visually enhanced PDF with the translated text"""
-    buffer = io.BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-    
-    # Colors
-    primary_color = (0.2, 0.4, 0.6)  # Dark blue
-    accent_color = (0.1, 0.7, 0.9)   # Light blue
-    dark_color = (0.1, 0.1, 0.2)     # Dark background
-    
-    # Add header with gradient
-    c.setFillColorRGB(*primary_color)
-    c.rect(0, height - 80, width, 80, fill=1, stroke=0)
-    
-    # Add title
-    c.setFillColorRGB(1, 1, 1)  # White text
-    c.setFont("Helvetica-Bold", 18)
-    c.drawString(72, height - 40, f"Translation from {source_lang.upper()} to {target_lang.upper()}")
-    
-    # Add date
-    c.setFont("Helvetica", 10)
-    c.drawString(width - 200, height - 40, f"Generated: {dt.datetime.now().strftime('%Y-%m-%d %H:%M')}")
-    
-    # Add decorative line
-    c.setStrokeColorRGB(*accent_color)
-    c.setLineWidth(2)
-    c.line(72, height - 50, width - 72, height - 50)
-    
-    # Add content with better styling
-    c.setFillColorRGB(0.1, 0.1, 0.2)  # Dark text
-    y_position = height - 100
-    
-    # Create a box for content
-    c.setFillColorRGB(0.95, 0.95, 0.97)  # Light gray background
-    c.rect(50, 50, width - 100, height - 170, fill=1, stroke=0)
-    c.setFillColorRGB(0.1, 0.1, 0.2)  # Dark text
-    
-    # Format text with better wrapping
-    text_object = c.beginText(60, height - 100)
-    text_object.setFont("Helvetica", 12)
-    text_object.setFillColorRGB(0.1, 0.1, 0.2)
-    
-    # Simple text wrapping
-    lines = []
-    for line in translated_text.split('\n'):
-        if len(line) > 90:
-            words = line.split(' ')
-            current_line = ""
-            for word in words:
-                if len(current_line) + len(word) < 90:
-                    current_line += word + " "
-                else:
-                    lines.append(current_line)
-                    current_line = word + " "
-            if current_line:
-                lines.append(current_line)
-        else:
-            lines.append(line)
-    
-    # Add text to PDF
-    for line in lines:
-        if y_position < 100:
-            c.drawText(text_object)
-            c.showPage()
-            # Reset for new page
-            y_position = height - 50
-            text_object = c.beginText(60, height - 50)
-            text_object.setFont("Helvetica", 12)
-            text_object.setFillColorRGB(0.1, 0.1, 0.2)
-        
-        text_object.textLine(line)
-        y_position -= 15
-    
-    c.drawText(text_object)
-    
-    # Add footer
-    c.setFont("Helvetica", 8)
-    c.setFillColorRGB(0.5, 0.5, 0.5)
-    c.drawString(72, 30, "Generated by Language Translator App")
-    c.drawRightString(width - 72, 30, "Page 1")
-    
-    c.save()
-    buffer.seek(0)
-    return buffer
+
 # ---------- Core Routes ----------
 
 @app.route("/translate", methods=["POST"])
@@ -248,7 +230,7 @@ def translate_text():
         return jsonify({"error": "Missing text"}), 400
 
     try:
-        tr = sync_translate(text, dest=target_lang, src=source_lang if source_lang else "auto")
+        tr, match = memory_translate(text, dest=target_lang, src=source_lang if source_lang else "auto")
         out = tr.text or ""
         # domain & style helpers (deterministic)
         out = apply_domain_dictionary(out, domain)
@@ -256,17 +238,89 @@ def translate_text():
 
         tid = None
         if owner:
-            tid = save_translation(owner, text, tr.src, target_lang, out)
+            origin = ORIGIN_MEMORY if from_memory(match) else ORIGIN_PROVIDER
+            tid = save_translation(owner, text, tr.src, target_lang, out, raw_text=tr.text, origin=origin)
 
         return jsonify({
             "translated_text": out,
             "detected_source_lang": tr.src,
-            "translation_id": tid
+            "translation_id": tid,
+            "from_memory": from_memory(match),
+            "memory": memory_info(match)
         })
     except Exception as e:
         logger.error(f"Translation error: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route("/translate_batch", methods=["POST"])
+def translate_batch():
+    """
+    JSON: { items: [{ text, source_lang, target_lang }, ...] }
+    Identical items are translated once and short items are packed into
+    shared provider requests. Results come back in request order; failed
+    items are listed separately in `errors`.
+    """
+    data = request.get_json(force=True, silent=True) or {}
+    items = data.get("items")
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "items must be a non-empty list"}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"too many items (limit {BATCH_MAX_ITEMS})"}), 400
+
+    results = [None] * len(items)
+    errors = []
+    groups = {}  # (source_lang, target_lang) -> item indices
+    for i, item in enumerate(items):
+        item = item if isinstance(item, dict) else {}
+        text = (item.get("text") or "").strip()
+        source_lang = item.get("source_lang") or "auto"
+        target_lang = item.get("target_lang", "en")
+        if not text:
+            errors.append({"index": i, "error": "Missing text"})
+        elif target_lang not in LANGUAGES:
+            errors.append({"index": i, "error": f"Unsupported target language: {target_lang}"})
+        elif source_lang != "auto" and source_lang not in LANGUAGES:
+            errors.append({"index": i, "error": f"Unsupported source language: {source_lang}"})
+        else:
+            groups.setdefault((source_lang, target_lang), []).append(i)
+
+    stats = {"items": len(items), "unique": 0, "cached": 0, "requests": 0}
+    try:
+        for (source_lang, target_lang), indices in groups.items():
+            # Packs go straight to the provider; only the split per-item
+            # results are cached, with the language detected for their pack
+            detected = {}
+
+            def remote(t):
+                tr = translator_client.translate(t, dest=target_lang, src=source_lang)
+                for item in pack_items(t):
+                    detected[item] = tr.src
+                return tr.text
+
+            def store(t, out):
+                src = detected.get(t, source_lang)
+                translation_cache.set(t, source_lang, target_lang, "googletrans", {"text": out, "src": src})
+
+            outcomes, group_stats = translate_texts(
+                [items[i]["text"] for i in indices],
+                remote,
+                lookup=lambda t: (translation_cache.get(t, source_lang, target_lang, "googletrans") or {}).get("text"),
+                store=store
+            )
+            for key in ("unique", "cached", "requests"):
+                stats[key] += group_stats[key]
+            for i, (translated, error) in zip(indices, outcomes):
+                if error:
+                    errors.append({"index": i, "error": error})
+                else:
+                    results[i] = translated
+    except Exception as e:
+        logger.error(f"Batch translation error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+    errors.sort(key=lambda e: e["index"])
+    return jsonify({"results": results, "errors": errors, "stats": stats})
+
 @app.route("/smart_translate", methods=["POST"])
 def smart_translate():
     """
@@ -280,8 +334,33 @@ def smart_translate():
 
 # ---------- Document & OCR ----------
 
+def chunk_translator(target_lang, source_lang, memory_hits=None):
+    """
+    translate_fn for document chunks: (translated text, detected source).
+    Chunks served from translation memory (exact matches) are appended to `memory_hits`.
+    """
+    def translate(chunk):
+        # Suggestions are not surfaced per chunk, so skip the fuzzy search
+        tr, match = memory_translate(chunk, dest=target_lang, src=source_lang, fuzzy=False)
+        if from_memory(match) and memory_hits is not None:
+            memory_hits.append(match)
+        return tr.text or "", tr.src
+    return translate
+
 @app.route("/translate_file", methods=["POST"])
 def translate_file():
+    """
+    Translate an uploaded PDF, DOCX, image or text file.
+    Text is extracted page by page (or paragraph by paragraph) as translation
+    consumes it, cut into paragraph/sentence-aligned chunks and translated
+    concurrently; only failed chunks are retried. Uploads over the
+    DOC_MAX_MB / DOC_MAX_PAGES / DOC_MAX_CHARS limits are rejected with 413.
+    With form field stream=true, chunk results are streamed as NDJSON as they
+    finish, then a 'done' line.
+    """
+    # Reject before the body is parsed (multipart overhead allowed for)
+    if request.content_length and request.content_length > DOC_MAX_BYTES + 64 * 1024:
+        return jsonify({"error": f"file too large (limit {DOC_MAX_BYTES // (1024 * 1024)} MB)"}), 413
     if "file" not in request.files:
         return jsonify({"error": "file required"}), 400
     file = request.files["file"]
@@ -290,48 +369,77 @@ def translate_file():
     owner = request.form.get("owner")
     style = request.form.get("style")
     domain = request.form.get("domain")
+    stream = request.form.get("stream", "false") == "true"
 
-    # Extract text
-    ext = (file.filename or "").lower()
-    text = ""
     try:
-        if ext.endswith(".pdf"):
-            reader = PdfReader(file)
-            for p in reader.pages:
-                text += p.extract_text() or ""
-        elif ext.endswith(".docx"):
-            doc = Document(file)
-            text = "\n".join([p.text for p in doc.paragraphs])
-        elif ext.endswith((".jpg", ".jpeg", ".png")):
-            # Handle image files with OCR
-            img = Image.open(file.stream).convert("RGB")
-            text = pytesseract.image_to_string(img)
-        else:
-            # assume UTF-8 text
-            text = file.read().decode("utf-8", errors="ignore")
-    except Exception as e:
+        document = open_document(file, ocr)
+    except DocumentTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except ExtractionError as e:
         logger.error(f"File extraction error: {str(e)}")
         return jsonify({"error": f"extract failed: {e}"}), 500
 
-    if not text.strip():
-        return jsonify({"error": "no text found in file"}), 400
+    chunks = make_chunks(document)
+    memory_hits = []
+    translate_chunk = chunk_translator(target_lang, source_lang, memory_hits)
 
-    try:
-        tr = sync_translate(text, dest=target_lang, src=source_lang)
-        out = tr.text or ""
+    def finish(results):
+        """Reassemble, post-process and save; returns the final JSON payload"""
+        out = assemble(results)
         out = apply_domain_dictionary(out, domain)
         out = apply_style_rules(out, style)
+        src = detected_source(results) or source_lang
         tid = None
         if owner:
-            tid = save_translation(owner, text[:1000], tr.src, target_lang, out[:2000])  # store snippet to keep DB small
-
-        # return both JSON and a downloadable handle
-        return jsonify({
+            tid = save_translation(owner, document.preview, src, target_lang, out[:2000])  # store snippet to keep DB small
+        return {
             "translated_text": out,
-            "detected_source_lang": tr.src,
+            "detected_source_lang": src,
             "translation_id": tid,
-            "original_text": text[:500] + "..." if len(text) > 500 else text
-        })
+            "original_text": document.preview[:500] + "..." if document.chars > 500 else document.preview,
+            "chunks": len(results),
+            "failed_chunks": [r.index for r in results if r.error],
+            "memory_chunks": len(memory_hits),
+            "from_memory": bool(results) and len(memory_hits) == len(results)
+        }
+
+    if stream:
+        def events():
+            yield json.dumps({"type": "start"}) + "\n"
+            results = []
+            try:
+                for r in translate_chunks(chunks, translate_chunk):
+                    results.append(r)
+                    yield json.dumps({
+                        "type": "chunk",
+                        "index": r.index,
+                        "translated_text": r.text,
+                        "error": r.error,
+                        "done": len(results)
+                    }) + "\n"
+                if not document.has_text:
+                    raise ExtractionError("no text found in file")
+                yield json.dumps(dict(finish(results), type="done")) + "\n"
+            except Exception as e:
+                logger.error(f"File translation error: {str(e)}")
+                yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+
+        return Response(stream_with_context(events()), mimetype="application/x-ndjson")
+
+    try:
+        results = list(translate_chunks(chunks, translate_chunk))
+        if not document.has_text:
+            return jsonify({"error": "no text found in file"}), 400
+        failed = [r for r in results if r.error]
+        if failed and len(failed) == len(results):
+            raise RuntimeError(failed[0].error)
+        # return both JSON and a downloadable handle
+        return jsonify(finish(results))
+    except DocumentTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except ExtractionError as e:
+        logger.error(f"File extraction error: {str(e)}")
+        return jsonify({"error": f"extract failed: {e}"}), 500
     except Exception as e:
         logger.error(f"File translation error: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -342,26 +450,169 @@ def download_pdf():
     translated_text = data.get("translated_text", "")
     source_lang = data.get("source_lang", "auto")
     target_lang = data.get("target_lang", "en")
+    template = data.get("template", DEFAULT_PDF_TEMPLATE)
     
     if not translated_text:
         return jsonify({"error": "No text to download"}), 400
+    if template not in PDF_TEMPLATES:
+        return jsonify({"error": f"Unknown template: {template}"}), 400
         
     try:
-        pdf_buffer = create_pdf(translated_text, source_lang, target_lang)
-        return send_file(
-            pdf_buffer,
+        # Streamed from the cached file; identical requests are not re-rendered
+        pdf_file, key, cached = pdf_cache.open(translated_text, source_lang, target_lang, template)
+        response = send_file(
+            pdf_file,
             as_attachment=True,
             download_name=f"translation_{source_lang}_to_{target_lang}.pdf",
-            mimetype='application/pdf'
+            mimetype='application/pdf',
+            etag=key
         )
+        response.headers["X-Cache"] = "HIT" if cached else "MISS"
+        return response
     except Exception as e:
         logger.error(f"PDF creation error: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+# ---------- History ----------
+
+@app.route("/history", methods=["GET"])
+def history():
+    """
+    Saved translations of one owner, newest first.
+    Query: owner (required), limit (default 20, max HISTORY_MAX_LIMIT), cursor.
+    Pass the returned next_cursor to get the following page; keyset
+    pagination keeps every page an index range scan, however deep.
+    """
+    owner = request.args.get("owner")
+    if not owner:
+        return jsonify({"error": "owner required"}), 400
+    try:
+        limit = min(max(int(request.args.get("limit", 20)), 1), HISTORY_MAX_LIMIT)
+        cursor = request.args.get("cursor")
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    sql = """
+        SELECT id, source_text, source_lang, target_lang, translated_text, created_at
+        FROM translations WHERE owner = ?
+    """
+    params = [owner]
+    if after:
+        sql += " AND (created_at, id) < (?, ?)"
+        params += list(after)
+    sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+    params.append(limit + 1)
+
+    with db() as conn:
+        rows = [dict(r) for r in conn.execute(sql, params).fetchall()]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    return jsonify({"items": rows, "next_cursor": next_cursor})
+
+# ---------- Phrasebook ----------
+
+@app.route("/phrasebook", methods=["GET"])
+def list_phrasebook():
+    owner = request.args.get("owner")
+    if not owner:
+        return jsonify({"error": "owner required"}), 400
+    with db() as conn:
+        rows = conn.execute("""
+            SELECT id, source_text, target_lang, translated_text, created_at
+            FROM phrasebook WHERE owner = ? ORDER BY created_at DESC
+        """, (owner,)).fetchall()
+    return jsonify({"items": [dict(r) for r in rows]})
+
+@app.route("/phrasebook", methods=["POST"])
+def add_phrase():
+    """
+    JSON: { owner, source_text, target_lang, translated_text }
+    Phrasebook entries take precedence in translation memory over
+    translations learned from history.
+    """
+    data = request.get_json(force=True, silent=True) or {}
+    source_text = (data.get("source_text") or "").strip()
+    translated_text = (data.get("translated_text") or "").strip()
+    target_lang = data.get("target_lang")
+    if not source_text or not translated_text or not target_lang:
+        return jsonify({"error": "source_text, target_lang and translated_text required"}), 400
+    if target_lang not in LANGUAGES:
+        return jsonify({"error": f"Unsupported target language: {target_lang}"}), 400
+
+    pid = str(uuid.uuid4())
+    writer.execute("""
+        INSERT INTO phrasebook(id, owner, source_text, target_lang, translated_text, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (pid, data.get("owner"), source_text, target_lang, translated_text, now_iso()))
+    translation_memory.add(source_text, target_lang, translated_text, curated=True)
+    return jsonify({"id": pid}), 201
+
+# ---------- Domain Dictionary ----------
+
+@app.route("/domain_dictionary", methods=["GET"])
+def list_domains():
+    return jsonify({"domains": domain_dictionary.domains()})
+
+@app.route("/domain_dictionary/<domain>", methods=["POST"])
+def bulk_load_domain(domain):
+    """
+    Bulk-load a glossary in one transaction. Either JSON
+    { entries: [{term, meaning}, ...] | terms: {term: meaning}, replace: bool }
+    or a multipart CSV `file` of term,meaning rows (form field replace=true).
+    Existing terms are overwritten; replace drops the domain's other terms.
+    """
+    try:
+        if "file" in request.files:
+            rows = csv.reader(io.TextIOWrapper(request.files["file"].stream, encoding="utf-8-sig"))
+            entries = [(row[0], row[1]) for row in rows if len(row) >= 2]
+            replace = request.form.get("replace", "false") == "true"
+        else:
+            data = request.get_json(force=True, silent=True) or {}
+            if isinstance(data.get("terms"), dict):
+                entries = list(data["terms"].items())
+            else:
+                entries = [(e.get("term"), e.get("meaning")) for e in data.get("entries") or [] if isinstance(e, dict)]
+            replace = bool(data.get("replace"))
+    except (csv.Error, UnicodeDecodeError) as e:
+        return jsonify({"error": f"invalid glossary: {e}"}), 400
+
+    entries = [(str(t), str(m or "")) for t, m in entries if t]
+    if not entries:
+        return jsonify({"error": "no entries"}), 400
+    if len(entries) > DOMAIN_BULK_MAX_TERMS:
+        return jsonify({"error": f"too many entries (limit {DOMAIN_BULK_MAX_TERMS})"}), 400
+
+    try:
+        loaded = domain_dictionary.bulk_load(domain, entries, replace=replace)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except sqlite3.Error as e:
+        logger.error(f"Domain dictionary load error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"domain": domain, "loaded": loaded, "replaced": replace})
+
+@app.route("/domain_dictionary/<domain>", methods=["DELETE"])
+def delete_domain(domain):
+    domain_dictionary.delete_domain(domain)
+    return jsonify({"domain": domain, "deleted": True})
+
 # ---------- Health Check ----------
 @app.route("/health", methods=["GET"])
 def health_check():
-    return jsonify({"status": "ok", "message": "Translator API is running"})
+    return jsonify({
+        "status": "ok",
+        "message": "Translator API is running",
+        "translation_cache": translation_cache.stats(),
+        "translator_client": translator_client.stats(),
+        "domain_dictionary": domain_dictionary.stats(),
+        "db_writer": writer.stats(),
+        "translation_memory": translation_memory.stats(),
+        "ocr": ocr.stats(),
+        "pdf_cache": pdf_cache.stats()
+    })
 
 # ---------- Run ----------
 if __name__ == "__main__":
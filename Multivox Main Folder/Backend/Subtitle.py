@@ -1,22 +1,41 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
-import os, uuid, tempfile, shutil, time, logging
+import os, uuid, tempfile, shutil, time, logging, json, threading, importlib, queue, multiprocessing
+from types import SimpleNamespace
 
 # 🔧 Add FFmpeg path manually (IMPORTANT!)
 os.environ["PATH"] += os.pathsep + r"C:\ffmpeg\bin"
 
 import yt_dlp
 import whisper
+import tqdm
 from deep_translator import GoogleTranslator
 from werkzeug.utils import secure_filename
+from translation_cache import translation_cache
+from subtitle_jobs import JobManager, FINISHED
+from translation_batch import translate_texts
+from translation_memory import TranslationMemory, TM_DB_PATH
+from concurrent.futures import ThreadPoolExecutor
+from transcription import load_audio, split_windows, transcribe_windows, SAMPLE_RATE as WHISPER_SAMPLE_RATE, WINDOW_MAX_SECONDS
+from transcript_cache import TranscriptCache, audio_fingerprint
+from parallel_transcription import should_parallelize, parallelizes_duration, PARALLEL_WORKERS, PARALLEL_CHUNK_SECONDS
+from whisper_models import ModelManager, UnknownModelError, WARMUP_SIZES
+from upload_storage import UploadStorage
+import subtitle_render
+from subtitle_render import normalize_style, RENDER_PRESETS, DEFAULT_RENDER_PRESET
 
 # Configuration
 UPLOAD_FOLDER = "uploads"
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 ALLOWED_EXTENSIONS = {'mp4', 'webm', 'mov', 'avi', 'mkv', 'wav', 'mp3', 'm4a'}
-MODEL_SIZE = "base"
 MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB
 
+# yt-dlp format selectors: audio-only is enough for transcription, the full
+# video is fetched only when a later step needs frames
+VIDEO_FORMAT = 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best'
+AUDIO_FORMAT = 'bestaudio[ext=m4a]/bestaudio/best'
+# Audio-only downloads are stored as <uuid>.audio.<ext>
+AUDIO_ONLY_MARKER = ".audio"
+
 # Initialize Flask
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "http://localhost:5173"}})
@@ -25,14 +44,55 @@ CORS(app, resources={r"/api/*": {"origins": "http://localhost:5173"}})
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load Whisper model
-try:
-    logger.info("Loading Whisper model...")
-    model = whisper.load_model(MODEL_SIZE)
-    logger.info("Whisper model loaded.")
-except Exception as e:
-    logger.error(f"Failed to load Whisper model: {str(e)}")
-    raise e
+# Whisper models are loaded on first use, per requested size, within a RAM
+# budget (WHISPER_MODEL_SIZE / WHISPER_MODEL_BUDGET_MB / WHISPER_WARMUP).
+# Each model runs one transcription at a time; downloads and translation of
+# other jobs still overlap with it
+models = ModelManager()
+MODEL_SIZE = models.default_size
+WHISPER_FRAME_SECONDS = whisper.audio.HOP_LENGTH / whisper.audio.SAMPLE_RATE
+_progress_local = threading.local()
+
+class WhisperProgress(tqdm.tqdm):
+    """Whisper's progress bar, redirected to the calling thread's job when it has one"""
+    def __init__(self, *args, **kwargs):
+        self.on_frames = getattr(_progress_local, "on_frames", None)
+        if self.on_frames:
+            kwargs["disable"] = True
+        super().__init__(*args, **kwargs)
+        self.frames_done = 0
+
+    def update(self, n=1):
+        if self.on_frames is None:
+            return super().update(n)
+        self.frames_done += n
+        self.on_frames(self.frames_done, self.total)
+
+# whisper.transcribe is shadowed by the function of the same name
+importlib.import_module("whisper.transcribe").tqdm = SimpleNamespace(tqdm=WhisperProgress)
+
+# Background subtitle jobs (SUBTITLE_JOB_WORKERS / SUBTITLE_JOB_RETENTION)
+jobs = JobManager()
+
+# Segment translation batches in flight at once
+TRANSLATE_WORKERS = int(os.environ.get("SUBTITLE_TRANSLATE_WORKERS", "4"))
+translate_pool = ThreadPoolExecutor(max_workers=TRANSLATE_WORKERS, thread_name_prefix="segment-translator")
+_translator_local = threading.local()
+
+# Whisper transcripts keyed by decoded-audio hash (TRANSCRIPT_CACHE_DB / TRANSCRIPT_CACHE_MAX_BYTES)
+transcript_cache = TranscriptCache()
+WHISPER_OPTIONS = {"task": "transcribe"}
+
+# Uploads, downloads and renders expire after UPLOAD_TTL_SECONDS of disuse and
+# are evicted LRU-first above UPLOAD_MAX_BYTES; pinned files are kept
+storage = UploadStorage(UPLOAD_FOLDER)
+
+# Spawned worker processes re-import this module; only the server warms up
+# and sweeps
+if multiprocessing.parent_process() is None:
+    models.warm_up(WARMUP_SIZES)
+    models.start()
+    storage.start()
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -49,21 +109,489 @@ def seconds_to_srt_time(seconds):
         logger.error(f"Time conversion error: {e}")
         return "00:00:00,000"
 
+def srt_cue(number, seg):
+    """Format one SRT cue (1-based number)"""
+    start = seconds_to_srt_time(seg["start"])
+    end = seconds_to_srt_time(seg["end"])
+    return f"{number}\n{start} --> {end}\n{seg['text'].strip()}\n"
+
 def generate_srt(segments):
     """Generate SRT file content from segments"""
     srt_content = []
     for i, seg in enumerate(segments):
         try:
-            start = seconds_to_srt_time(seg["start"])
-            end = seconds_to_srt_time(seg["end"])
-            srt_content.append(f"{i+1}\n{start} --> {end}\n{seg['text'].strip()}\n")
+            srt_content.append(srt_cue(i + 1, seg))
         except Exception as e:
             logger.error(f"SRT segment error: {e}")
     return "\n".join(srt_content)
 
+def download_media(video_url, job=None, audio_only=False):
+    """
+    Download a URL into UPLOAD_FOLDER and return the stored filename.
+    audio_only fetches just the best audio stream, which is all Whisper needs.
+    """
+    stem = str(uuid.uuid4()) + (AUDIO_ONLY_MARKER if audio_only else "")
+    downloaded = {"bytes": 0}
+
+    def on_progress(d):
+        if d.get("status") in ("downloading", "finished"):
+            downloaded["bytes"] = d.get("downloaded_bytes") or d.get("total_bytes") or downloaded["bytes"]
+        if job and d.get("status") == "downloading":
+            total = d.get("total_bytes") or d.get("total_bytes_estimate")
+            if total:
+                job.update(
+                    download_percent=round(d.get("downloaded_bytes", 0) * 100 / total, 1),
+                    downloaded_bytes=d.get("downloaded_bytes", 0)
+                )
+
+    ydl_opts = {
+        'format': AUDIO_FORMAT if audio_only else VIDEO_FORMAT,
+        'outtmpl': os.path.join(UPLOAD_FOLDER, f"{stem}.%(ext)s"),
+        'quiet': True,
+        'progress_hooks': [on_progress],
+    }
+    if not audio_only:
+        ydl_opts['merge_output_format'] = 'mp4'
+
+    logger.info(f"Downloading ({'audio only' if audio_only else 'video'}): {video_url}")
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(video_url, download=True)
+        requested = info.get("requested_downloads") or []
+        temp_file_path = requested[0].get("filepath") if requested else ydl.prepare_filename(info)
+
+    logger.info(f"Downloaded {downloaded['bytes']} bytes to: {temp_file_path}")
+    filename = os.path.basename(temp_file_path)
+    storage.touch(filename)
+    return filename
+
+def fetch_video(media_filename, video_url, job=None):
+    """
+    Return a stored file with a video stream, downloading the full video only
+    if the URL was previously fetched audio-only.
+    """
+    if media_filename and not os.path.splitext(media_filename)[0].endswith(AUDIO_ONLY_MARKER):
+        return media_filename
+    if not video_url:
+        raise ValueError("No video stream available for this media")
+    if job:
+        job.update(stage="downloading_video", download_percent=0)
+    return download_media(video_url, job)
+
+def save_upload(file):
+    """Store an uploaded file in UPLOAD_FOLDER and return the stored filename"""
+    ext = secure_filename(file.filename).rsplit('.', 1)[1].lower()
+    filename = f"{uuid.uuid4()}.{ext}"
+    temp_file_path = os.path.join(UPLOAD_FOLDER, filename)
+    file.save(temp_file_path)
+    storage.touch(filename)
+    logger.info(f"Uploaded file saved: {temp_file_path}")
+    return filename
+
+def transcribe_media(audio, job=None, model_size=None):
+    """
+    Run Whisper on a media file path or decoded audio and return its segments.
+    Each model is used by one transcription at a time; with a job, Whisper's
+    progress bar is redirected to report transcribed seconds.
+    Long decoded audio goes to a CPU worker pool instead (see
+    parallel_transcription), which does not need a model in this process;
+    the pool is charged against the model budget and shut down when idle
+    (WHISPER_PARALLEL_WORKERS / WHISPER_PARALLEL_MIN_SECONDS / WHISPER_POOL_IDLE_SECONDS).
+    """
+    model_size = models.resolve(model_size)
+    if not isinstance(audio, str) and should_parallelize(audio):
+        def on_chunk(done, total):
+            if job:
+                job.update(transcribed_seconds=round(done, 1), duration_seconds=round(total, 1))
+        with models.use_pool(model_size) as pool:
+            return pool.transcribe(audio, progress=on_chunk, **WHISPER_OPTIONS)
+
+    with models.use(model_size) as loaded, loaded.lock:
+        if not job:
+            return loaded.model.transcribe(audio, task="transcribe", verbose=True).get("segments", [])
+
+        def on_frames(done, total):
+            job.update(
+                transcribed_seconds=round(done * WHISPER_FRAME_SECONDS, 1),
+                duration_seconds=round((total or 0) * WHISPER_FRAME_SECONDS, 1)
+            )
+
+        _progress_local.on_frames = on_frames
+        try:
+            return loaded.model.transcribe(audio, task="transcribe", verbose=None).get("segments", [])
+        finally:
+            _progress_local.on_frames = None
+
+def google_translator(lang):
+    """Per-thread GoogleTranslator for `lang`, reused across batches"""
+    clients = getattr(_translator_local, "clients", None)
+    if clients is None:
+        clients = _translator_local.clients = {}
+    if lang not in clients:
+        clients[lang] = GoogleTranslator(source='auto', target=lang)
+    return clients[lang]
+
+# Phrasebook and past translations from translator.db, refreshed as the
+# translator service writes new rows (TRANSLATION_MEMORY_DB / TM_REFRESH_SECONDS)
+translation_memory = TranslationMemory(db_path=TM_DB_PATH)
+
+def translate_segments(segments, lang, job=None):
+    """
+    Translate Whisper segments to `lang` ("same" keeps the original text).
+    Segments are deduplicated, packed into provider-sized batches and
+    translated several batches at a time; a batch that does not split back
+    cleanly is retried segment by segment.
+    """
+    if lang == "same":
+        return [{
+            "start": seg["start"],
+            "end": seg["end"],
+            "text": seg["text"]
+        } for seg in segments]
+
+    logger.info(f"Translating to: {lang}")
+
+    def on_progress(done, total):
+        logger.info(f"Translated {done}/{total} unique segments")
+        if job:
+            job.update(translated_segments=round(len(segments) * done / total), total_segments=len(segments))
+
+    from_memory = set()
+
+    def lookup(text):
+        # Only exact matches are safe to reuse unattended
+        match = translation_memory.lookup(text, lang, fuzzy=False)
+        if match:
+            from_memory.add(text)
+            return match.translation
+        return translation_cache.get(text, 'auto', lang, 'google')
+
+    def store(text, out):
+        translation_cache.set(text, 'auto', lang, 'google', out)
+        translation_memory.add(text, lang, out)
+
+    outcomes, stats = translate_texts(
+        [seg['text'] for seg in segments],
+        lambda text: google_translator(lang).translate(text),
+        lookup=lookup,
+        store=store,
+        executor=translate_pool,
+        progress=on_progress
+    )
+    logger.info(f"Segment translation: {stats}, {len(from_memory)} from translation memory")
+
+    translated_segments = []
+    for seg, (translated_text, error) in zip(segments, outcomes):
+        if not seg['text']:
+            translated_segments.append(seg)
+        elif error:
+            logger.warning(f"Translation failed: {error}")
+            translated_segments.append({
+                'start': seg['start'],
+                'end': seg['end'],
+                'text': f"[Error] {seg['text'][:100]}..."
+            })
+        else:
+            translated_segments.append({
+                'start': seg['start'],
+                'end': seg['end'],
+                'text': translated_text,
+                'from_memory': seg['text'].strip() in from_memory
+            })
+    if job:
+        job.update(translated_segments=len(segments), total_segments=len(segments))
+    return translated_segments
+
+def iter_pipelined_segments(audio, lang, job=None, model_size=None):
+    """
+    Pipelined transcription + translation of decoded audio.
+    Whisper transcribes pause-aligned windows on a background thread while
+    this generator translates the segments of finished windows, yielding
+    (original, translated) pairs in order. End-to-end time approaches
+    max(STT, MT) instead of their sum.
+    """
+    windows = split_windows(audio)
+    duration = len(audio) / WHISPER_SAMPLE_RATE
+    finished = queue.Queue()
+    stop = threading.Event()
+    done = object()
+
+    def transcribe():
+        try:
+            with models.use(model_size) as loaded:
+                for window_end, segments in transcribe_windows(
+                    loaded.model, audio, windows, lock=loaded.lock, stop=stop, task="transcribe", verbose=None
+                ):
+                    finished.put((window_end, segments))
+        except Exception as e:
+            finished.put(e)
+        finally:
+            finished.put(done)
+
+    threading.Thread(target=transcribe, name="whisper-pipeline", daemon=True).start()
+    translated_count = 0
+    try:
+        while True:
+            item = finished.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            window_end, batch = item
+            # Take every window that finished while the previous batch was translating
+            while True:
+                try:
+                    item = finished.get_nowait()
+                except queue.Empty:
+                    break
+                if item is done or isinstance(item, Exception):
+                    finished.put(item)
+                    break
+                window_end, more = item
+                batch = batch + more
+
+            if job:
+                job.update(transcribed_seconds=round(window_end, 1), duration_seconds=round(duration, 1))
+            for original, translated in zip(batch, translate_segments(batch, lang)):
+                yield original, translated
+            translated_count += len(batch)
+            if job:
+                job.update(translated_segments=translated_count)
+    finally:
+        stop.set()
+
+def transcript_options(pipelined, duration):
+    """
+    Whisper settings that change the transcript, part of the cache key.
+    Media of `duration` seconds that transcribe_media sends to the worker
+    pool is chunked and stitched, so it gets its own mode.
+    """
+    if pipelined:
+        return dict(WHISPER_OPTIONS, mode="windowed", window_seconds=WINDOW_MAX_SECONDS)
+    if parallelizes_duration(duration):
+        return dict(WHISPER_OPTIONS, mode="parallel", chunk_seconds=PARALLEL_CHUNK_SECONDS)
+    return dict(WHISPER_OPTIONS, mode="full")
+
+def prepare_transcript(media_filename, video_url, pipelined, job=None, audio_only=True, model_size=MODEL_SIZE):
+    """
+    Resolve the media and look up its cached transcript.
+    URLs are fetched audio-only unless a later step needs the video, and
+    the media is decoded to 16 kHz mono once; that array feeds both the
+    content hash and Whisper.
+    Returns (media_filename, audio, content_hash, segments, options):
+    segments is None on a cache miss; audio is None when a known URL skipped
+    the download; options is the transcript cache key to store under.
+    """
+    if video_url:
+        known = transcript_cache.lookup_url(video_url)
+        # URLs remembered without a duration cannot tell which mode applies
+        if known and known[2] is not None:
+            content_hash, known_filename, duration = known
+            options = transcript_options(pipelined, duration)
+            segments = transcript_cache.get(content_hash, model_size, options)
+            if segments is not None:
+                logger.info(f"Transcript cache hit for {video_url}, skipping download")
+                if known_filename and os.path.exists(storage.path(known_filename)):
+                    storage.touch(known_filename)
+                else:
+                    known_filename = None
+                return known_filename, None, content_hash, segments, options
+        if job:
+            job.update(stage="downloading", download_percent=0)
+        media_filename = download_media(video_url, job, audio_only=audio_only)
+
+    if job:
+        job.update(stage="decoding")
+    with storage.in_use(media_filename) as media_path:
+        audio = load_audio(media_path)
+    content_hash = audio_fingerprint(audio)
+    duration = len(audio) / WHISPER_SAMPLE_RATE
+    if video_url:
+        transcript_cache.remember_url(video_url, content_hash, media_filename, duration)
+    options = transcript_options(pipelined, duration)
+    segments = transcript_cache.get(content_hash, model_size, options)
+    if segments is not None:
+        logger.info("Transcript cache hit, skipping Whisper")
+    return media_filename, audio, content_hash, segments, options
+
+def run_subtitle_pipeline(lang, media_filename=None, video_url=None, job=None, pipelined=False, render=None,
+                          model_size=MODEL_SIZE):
+    """
+    Download (for URLs), transcribe, translate and build the SRT.
+    With render={"style", "preset"} a burn-in job is started on the result.
+    """
+    media_filename, audio, content_hash, segments, options = prepare_transcript(
+        media_filename, video_url, pipelined, job, audio_only=render is None, model_size=model_size
+    )
+
+    if segments is None and pipelined:
+        logger.info("Transcribing and translating (pipelined)...")
+        if job:
+            job.update(stage="transcribing", transcribed_seconds=0, translated_segments=0)
+        segments = []
+        translated_segments = []
+        for original, translated in iter_pipelined_segments(audio, lang, job, model_size):
+            segments.append(original)
+            translated_segments.append(translated)
+        transcript_cache.put(content_hash, model_size, options, segments)
+        logger.info(f"Pipelined transcription completed: {len(translated_segments)} segments")
+    else:
+        if segments is None:
+            # Transcribe with Whisper
+            logger.info("Transcribing...")
+            if job:
+                job.update(stage="transcribing", transcribed_seconds=0)
+            segments = transcribe_media(audio, job, model_size)
+            transcript_cache.put(content_hash, model_size, options, segments)
+            logger.info(f"Transcription completed: {len(segments)} segments")
+
+        # Translate if needed
+        if job:
+            job.update(stage="translating", translated_segments=0, total_segments=len(segments))
+        translated_segments = translate_segments(segments, lang, job)
+
+    # Generate SRT
+    srt_content = generate_srt(translated_segments)
+    if job:
+        job.update(stage="done")
+
+    result = {
+        "subtitles": translated_segments,
+        "srt": srt_content,
+        "language": lang,
+        "originalMediaFilename": media_filename
+    }
+    if render is not None:
+        result["render"] = start_render(media_filename, video_url, srt_content, **render)
+    return result
+
+def stream_subtitle_events(lang, media_filename=None, video_url=None, render=None, model_size=MODEL_SIZE):
+    """
+    NDJSON for the pipelined mode: a 'segment' line with its SRT cue as soon
+    as each segment is translated, then a 'done' line with the full result
+    """
+    try:
+        yield json.dumps({"type": "status", "stage": "preparing"}) + "\n"
+        media_filename, audio, content_hash, segments, options = prepare_transcript(
+            media_filename, video_url, pipelined=True, audio_only=render is None, model_size=model_size
+        )
+        yield json.dumps({"type": "status", "stage": "transcribing", "originalMediaFilename": media_filename,
+                          "cached": segments is not None}) + "\n"
+
+        if segments is not None:
+            pairs = zip(segments, translate_segments(segments, lang))
+        else:
+            pairs = iter_pipelined_segments(audio, lang, model_size=model_size)
+
+        originals = []
+        subtitles = []
+        for original, translated in pairs:
+            originals.append(original)
+            subtitles.append(translated)
+            yield json.dumps({
+                "type": "segment",
+                "index": len(subtitles) - 1,
+                "start": translated["start"],
+                "end": translated["end"],
+                "text": translated["text"],
+                "original": original["text"],
+                "srt": srt_cue(len(subtitles), translated)
+            }) + "\n"
+        if segments is None:
+            transcript_cache.put(content_hash, model_size, options, originals)
+
+        done = {
+            "type": "done",
+            "subtitles": subtitles,
+            "srt": generate_srt(subtitles),
+            "language": lang,
+            "originalMediaFilename": media_filename
+        }
+        if render is not None:
+            done["render"] = start_render(media_filename, video_url, done["srt"], **render)
+        yield json.dumps(done) + "\n"
+    except Exception as e:
+        logger.error(f"Streaming pipeline error: {e}", exc_info=True)
+        yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+
+def subtitle_job(job, lang, media_filename=None, video_url=None, pipelined=False, render=None,
+                 model_size=MODEL_SIZE):
+    return run_subtitle_pipeline(lang, media_filename, video_url, job, pipelined, render, model_size)
+
+def release_when_done(media_filename):
+    """on_done callback for jobs.submit: drop the pin the route took on the upload"""
+    if media_filename:
+        return lambda: storage.release(media_filename)
+    return None
+
+def render_job(job, media_filename, video_url, srt, style=None, preset=DEFAULT_RENDER_PRESET):
+    """Burn the SRT into the stored video, fetching the video first for audio-only downloads"""
+    video_filename = fetch_video(media_filename, video_url, job)
+    job.update(stage="rendering", rendered_seconds=0)
+
+    def on_progress(done, duration):
+        progress = {"rendered_seconds": round(done, 1)}
+        if duration:
+            progress.update(duration_seconds=round(duration, 1), render_percent=round(min(100, done * 100 / duration), 1))
+        job.update(**progress)
+
+    with storage.in_use(video_filename) as video_path:
+        output_filename, cached = subtitle_render.burn_subtitles(video_path, srt, UPLOAD_FOLDER, style, preset, on_progress)
+    storage.touch(output_filename)
+    job.update(stage="done")
+    return {
+        "burnedMediaFilename": output_filename,
+        "burnedMediaUrl": f"/files/{output_filename}",
+        "cached": cached,
+        "preset": preset
+    }
+
+def start_render(media_filename, video_url, srt, style=None, preset=DEFAULT_RENDER_PRESET):
+    """Queue a burn-in job; the media stays pinned until the job has used it"""
+    if media_filename:
+        storage.pin(media_filename)
+    job = jobs.submit("render", render_job, media_filename, video_url, srt, style=style, preset=preset,
+                      on_done=release_when_done(media_filename))
+    return {
+        "jobId": job.id,
+        "status": job.status,
+        "statusUrl": f"/api/jobs/{job.id}",
+        "eventsUrl": f"/api/jobs/{job.id}/events"
+    }
+
+def parse_render_options(style, preset):
+    """Validate burn-in style/preset from a request; raises ValueError"""
+    if isinstance(style, str):
+        try:
+            style = json.loads(style) if style.strip() else {}
+        except json.JSONDecodeError:
+            raise ValueError("subtitleStyle must be a JSON object")
+    if not isinstance(style or {}, dict):
+        raise ValueError("subtitleStyle must be a JSON object")
+    preset = preset or DEFAULT_RENDER_PRESET
+    if preset not in RENDER_PRESETS:
+        raise ValueError(f"Unknown render preset: {preset} (choose from {', '.join(RENDER_PRESETS)})")
+    return {"style": normalize_style(style), "preset": preset}
+
+def released_after(events, media_filename):
+    """Pass a stream through, releasing the upload's pin when it ends or the client leaves"""
+    try:
+        yield from events
+    finally:
+        if media_filename:
+            storage.release(media_filename)
+
 @app.route("/api/generate-subtitles", methods=["POST"])
 def generate_subtitles():
-    """Main transcription + translation route"""
+    """
+    Main transcription + translation route.
+    Form flags:
+      async=true      return 202 and a job id instead of waiting
+      pipelined=true  overlap Whisper with translation window by window
+      stream=true     pipelined, with segments and SRT cues streamed as NDJSON
+    modelSize picks the Whisper model (tiny/base/small/...), default WHISPER_MODEL_SIZE.
+    burnSubtitles=true also starts a burn-in job (see /api/render); its id is
+    returned under "render". subtitleStyle (JSON) and renderPreset tune it.
+    """
     content_length = request.content_length
     if content_length and content_length > MAX_FILE_SIZE:
         return jsonify({"error": f"File too large (limit {MAX_FILE_SIZE/1024/1024:.0f}MB)"}), 400
@@ -72,112 +600,166 @@ def generate_subtitles():
     video_url = request.form.get("videoUrl")
     file = request.files.get("file")
     burn_subtitles = request.form.get("burnSubtitles", "false") == "true"
+    run_async = request.form.get("async", "false") == "true"
+    stream = request.form.get("stream", "false") == "true"
+    pipelined = stream or request.form.get("pipelined", "false") == "true"
+    try:
+        model_size = models.resolve(request.form.get("modelSize"))
+    except UnknownModelError as e:
+        return jsonify({"error": str(e), "available": models.available()}), 400
+    # Transcription only needs audio; the video is fetched only when it will be rendered
+    render = None
+    if burn_subtitles:
+        try:
+            render = parse_render_options(request.form.get("subtitleStyle"), request.form.get("renderPreset"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
-    original_media_filename = None
-    temp_file_path = None
-
+    media_filename = None
+    # Set once a job or stream owns the upload's pin
+    handed_off = False
     try:
-        # Download from YouTube if URL provided
-        if video_url:
-            # Generate unique filename
-            filename = f"{uuid.uuid4()}.mp4"
-            temp_file_path = os.path.join(UPLOAD_FOLDER, filename)
-            
-            ydl_opts = {
-                'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
-                'outtmpl': temp_file_path,
-                'quiet': True,
-            }
-
-            logger.info(f"Downloading: {video_url}")
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([video_url])
-            
-            logger.info(f"Downloaded to: {temp_file_path}")
-            original_media_filename = filename
-
-        # Or save uploaded file
-        elif file and allowed_file(file.filename):
-            ext = secure_filename(file.filename).rsplit('.', 1)[1].lower()
-            filename = f"{uuid.uuid4()}.{ext}"
-            temp_file_path = os.path.join(UPLOAD_FOLDER, filename)
-            file.save(temp_file_path)
-            logger.info(f"Uploaded file saved: {temp_file_path}")
-            original_media_filename = filename
-        else:
-            return jsonify({"error": "No valid video or file provided"}), 400
+        if not video_url:
+            # Save uploaded file (URLs are downloaded by the pipeline)
+            if file and allowed_file(file.filename):
+                media_filename = save_upload(file)
+                storage.pin(media_filename)
+            else:
+                return jsonify({"error": "No valid video or file provided"}), 400
 
-        # Transcribe with Whisper
-        logger.info("Transcribing...")
-        result = model.transcribe(temp_file_path, task="transcribe", verbose=True)
-        segments = result.get("segments", [])
+        if stream:
+            handed_off = True
+            return Response(
+                stream_with_context(released_after(
+                    stream_subtitle_events(lang, media_filename, video_url, render, model_size), media_filename
+                )),
+                mimetype="application/x-ndjson"
+            )
 
-        logger.info(f"Transcription completed: {len(segments)} segments")
+        if run_async:
+            # The job releases the upload's pin when it finishes, even if cancelled while queued
+            job = jobs.submit(
+                "subtitles", subtitle_job, lang,
+                media_filename=media_filename, video_url=video_url, pipelined=pipelined, render=render,
+                model_size=model_size, on_done=release_when_done(media_filename)
+            )
+            handed_off = True
+            return jsonify({
+                "jobId": job.id,
+                "status": job.status,
+                "statusUrl": f"/api/jobs/{job.id}",
+                "eventsUrl": f"/api/jobs/{job.id}/events"
+            }), 202
 
-        # Translate if needed
-        translated_segments = []
-        if lang != "same":
-            logger.info(f"Translating to: {lang}")
-            for i, seg in enumerate(segments):
-                if not seg['text']:
-                    translated_segments.append(seg)
-                    continue
-                try:
-                    chunk_size = 5000
-                    text_chunks = [seg['text'][j:j+chunk_size] for j in range(0, len(seg['text']), chunk_size)]
-                    translated_chunks = []
-
-                    for chunk in text_chunks:
-                        translated = GoogleTranslator(source='auto', target=lang).translate(chunk)
-                        translated_chunks.append(translated)
-
-                    translated_text = "".join(translated_chunks)
-
-                    translated_segments.append({
-                        'start': seg['start'],
-                        'end': seg['end'],
-                        'text': translated_text
-                    })
-
-                    if i % 10 == 0:
-                        logger.info(f"Translated {i+1}/{len(segments)}")
-
-                except Exception as e:
-                    logger.warning(f"Translation failed: {e}")
-                    translated_segments.append({
-                        'start': seg['start'],
-                        'end': seg['end'],
-                        'text': f"[Error] {seg['text'][:100]}..."
-                    })
-        else:
-            translated_segments = [{
-                "start": seg["start"],
-                "end": seg["end"],
-                "text": seg["text"]
-            } for seg in segments]
-
-        # Generate SRT
-        srt_content = generate_srt(translated_segments)
-
-        return jsonify({
-            "subtitles": translated_segments,
-            "srt": srt_content,
-            "language": lang,
-            "originalMediaFilename": original_media_filename
-        })
+        return jsonify(run_subtitle_pipeline(
+            lang, media_filename, video_url, pipelined=pipelined, render=render, model_size=model_size
+        ))
 
     except Exception as e:
         logger.error(f"API error: {e}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
     finally:
-        # Cleanup only temporary files (not stored in UPLOAD_FOLDER)
-        pass
+        # Uploads stay in UPLOAD_FOLDER for /files/; the sweeper deletes them once unpinned and idle
+        if media_filename and not handed_off:
+            storage.release(media_filename)
+
+@app.route("/api/render", methods=["POST"])
+def render_subtitles():
+    """
+    Burn an SRT into a stored media file as a background job.
+    JSON: { mediaFilename, srt, style?, preset? }. Output is cached by
+    (media hash, SRT hash, style, preset) and served from /files/.
+    """
+    data = request.get_json(force=True, silent=True) or {}
+    media_filename = secure_filename(data.get("mediaFilename") or "")
+    srt = data.get("srt") or ""
+    if not media_filename or not os.path.isfile(storage.path(media_filename)):
+        return jsonify({"error": "Unknown mediaFilename"}), 404
+    if not srt.strip():
+        return jsonify({"error": "Field 'srt' required."}), 400
+    try:
+        render = parse_render_options(data.get("style"), data.get("preset"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(start_render(media_filename, None, srt, **render)), 202
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """Poll a job: status, progress and (once completed) the result"""
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+@app.route("/api/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    """Server-sent progress events until the job finishes"""
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+
+    def events():
+        version = -1
+        while True:
+            new_version = job.wait_for_change(version, timeout=15)
+            if new_version == version:
+                yield ": keep-alive\n\n"
+                continue
+            version = new_version
+            finished = job.status in FINISHED
+            yield f"event: {job.status if finished else 'progress'}\ndata: {json.dumps(job.to_dict(include_result=finished))}\n\n"
+            if finished:
+                break
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route("/api/jobs/<job_id>", methods=["DELETE"])
+def cancel_job(job_id):
+    """Request cancellation of a queued or running job"""
+    job = jobs.cancel(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict(include_result=False)), 202
+
+@app.route("/api/health", methods=["GET"])
+def health():
+    return jsonify({
+        "status": "ok",
+        "model": MODEL_SIZE,
+        "models": models.stats(),
+        "jobs": jobs.stats(),
+        "parallel_workers": PARALLEL_WORKERS,
+        "storage": storage.stats(),
+        "transcript_cache": transcript_cache.stats(),
+        "translation_cache": translation_cache.stats(),
+        "translation_memory": translation_memory.stats()
+    })
 
 # Serve uploaded/downloaded files
 @app.route('/files/<filename>')
 def serve_file(filename):
-    return send_from_directory(UPLOAD_FOLDER, filename)
+    """
+    Serve a stored file with Range, ETag and If-None-Match/If-Modified-Since
+    support, so players can seek without re-downloading. The file is pinned
+    until the response is closed.
+    """
+    filename = secure_filename(filename)
+    if not filename or not os.path.isfile(storage.path(filename)):
+        return jsonify({"error": "File not found"}), 404
+    storage.pin(filename)
+    try:
+        response = send_from_directory(UPLOAD_FOLDER, filename, conditional=True, etag=True, max_age=3600)
+    except Exception:
+        storage.release(filename)
+        raise
+    response.headers["Accept-Ranges"] = "bytes"
+    response.call_on_close(lambda: storage.release(filename))
+    return response
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,305 @@
+"""
+Pipe-based FFmpeg decoding for the voice translation service.
+
+Uploads are streamed through ffmpeg's stdin/stdout, so a normal request never
+touches the disk. Decoding runs on a bounded pool of worker threads (one ffmpeg
+process per job) with a per-job timeout, and inputs that are already 16 kHz
+mono 16-bit PCM WAV skip ffmpeg entirely.
+"""
+import io
+import os
+import asyncio
+import wave
+import logging
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+FFMPEG_PATH = os.environ.get("FFMPEG_PATH", "ffmpeg")
+
+# Format everything downstream (speech recognition, VAD) expects
+SAMPLE_RATE = 16000
+CHANNELS = 1
+SAMPLE_WIDTH = 2  # bytes, pcm_s16le
+
+DECODER_WORKERS = int(os.environ.get("DECODER_WORKERS", min(4, os.cpu_count() or 1)))
+DECODE_TIMEOUT = float(os.environ.get("DECODE_TIMEOUT", "60"))
+
+
+class DecodeError(Exception):
+    """Raised when an upload cannot be decoded to PCM."""
+
+
+def wav_params(data):
+    """Return (channels, sample_width, rate) of a PCM WAV blob, or None."""
+    if not data.startswith(b"RIFF") or data[8:12] != b"WAVE":
+        return None
+    try:
+        with wave.open(io.BytesIO(data), "rb") as wf:
+            if wf.getcomptype() != "NONE":
+                return None
+            return wf.getnchannels(), wf.getsampwidth(), wf.getframerate()
+    except (wave.Error, EOFError):
+        return None
+
+
+def is_target_wav(data):
+    """True if the blob is already 16 kHz mono 16-bit PCM WAV."""
+    return wav_params(data) == (CHANNELS, SAMPLE_WIDTH, SAMPLE_RATE)
+
+
+def wav_to_pcm(data):
+    """Strip the WAV container and return the raw PCM frames."""
+    with wave.open(io.BytesIO(data), "rb") as wf:
+        return wf.readframes(wf.getnframes())
+
+
+def pcm_to_wav(pcm):
+    """Wrap raw 16 kHz mono s16le PCM in a WAV container (in memory)."""
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(CHANNELS)
+        wf.setsampwidth(SAMPLE_WIDTH)
+        wf.setframerate(SAMPLE_RATE)
+        wf.writeframes(pcm)
+    return buf.getvalue()
+
+
+def _needs_seekable_input(data):
+    """MP4/MOV files with the moov atom at the end cannot be read from a pipe."""
+    return data[4:8] == b"ftyp"
+
+
+def ffmpeg_pcm_cmd(ffmpeg_path, input_path="pipe:0"):
+    """FFmpeg command line that decodes `input_path` to raw PCM on stdout."""
+    return [
+        ffmpeg_path,
+        '-hide_banner',
+        '-loglevel', 'error',
+        '-i', input_path,
+        '-vn',
+        '-f', 's16le',
+        '-acodec', 'pcm_s16le',
+        '-ac', str(CHANNELS),
+        '-ar', str(SAMPLE_RATE),
+        'pipe:1',
+    ]
+
+
+class DecoderPool:
+    """
+    Bounded pool of FFmpeg decoder workers.
+
+    At most `workers` ffmpeg processes run at once; extra jobs queue on the
+    executor instead of spawning unbounded subprocesses under load.
+    """
+
+    def __init__(self, workers=DECODER_WORKERS, timeout=DECODE_TIMEOUT, ffmpeg_path=FFMPEG_PATH):
+        self.timeout = timeout
+        self.ffmpeg_path = ffmpeg_path
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ffmpeg-decoder")
+
+    def to_pcm(self, data, timeout=None):
+        """Decode any supported audio blob to 16 kHz mono s16le PCM."""
+        if is_target_wav(data):
+            return wav_to_pcm(data)
+        future = self._executor.submit(self._decode, data, timeout or self.timeout)
+        return future.result()
+
+    def to_wav(self, data, timeout=None):
+        """Decode any supported audio blob to a 16 kHz mono PCM WAV blob."""
+        if is_target_wav(data):
+            return data
+        return pcm_to_wav(self.to_pcm(data, timeout))
+
+    def _decode(self, data, timeout):
+        try:
+            return self._run(ffmpeg_pcm_cmd(self.ffmpeg_path), data, timeout)
+        except DecodeError:
+            if not _needs_seekable_input(data):
+                raise
+            logger.info("Pipe decode failed for MP4 container, retrying from a seekable file")
+            return self._decode_seekable(data, timeout)
+
+    def _decode_seekable(self, data, timeout):
+        fd, path = tempfile.mkstemp(suffix=".mp4")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            return self._run(ffmpeg_pcm_cmd(self.ffmpeg_path, path), None, timeout)
+        finally:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def _run(self, cmd, data, timeout):
+        proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE if data is not None else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        try:
+            out, err = proc.communicate(input=data, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.communicate()
+            raise DecodeError(f"FFmpeg timed out after {timeout:.0f}s")
+        if proc.returncode != 0:
+            raise DecodeError(err.decode("utf-8", errors="replace").strip() or f"FFmpeg exited with {proc.returncode}")
+        if not out:
+            raise DecodeError("FFmpeg produced no audio")
+        return out
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+class AsyncDecoder:
+    """
+    asyncio counterpart of DecoderPool for the ASGI app.
+
+    ffmpeg runs as an asyncio subprocess, so waiting on it never blocks the
+    event loop; a semaphore bounds how many run at once.
+    """
+
+    def __init__(self, workers=DECODER_WORKERS, timeout=DECODE_TIMEOUT, ffmpeg_path=FFMPEG_PATH):
+        self.timeout = timeout
+        self.ffmpeg_path = ffmpeg_path
+        self._semaphore = asyncio.Semaphore(workers)
+
+    async def to_pcm(self, data, timeout=None):
+        """Decode any supported audio blob to 16 kHz mono s16le PCM."""
+        if is_target_wav(data):
+            return wav_to_pcm(data)
+        timeout = timeout or self.timeout
+        async with self._semaphore:
+            try:
+                return await self._run(ffmpeg_pcm_cmd(self.ffmpeg_path), data, timeout)
+            except DecodeError:
+                if not _needs_seekable_input(data):
+                    raise
+                logger.info("Pipe decode failed for MP4 container, retrying from a seekable file")
+                return await self._decode_seekable(data, timeout)
+
+    async def _decode_seekable(self, data, timeout):
+        fd, path = tempfile.mkstemp(suffix=".mp4")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                await asyncio.to_thread(f.write, data)
+            return await self._run(ffmpeg_pcm_cmd(self.ffmpeg_path, path), None, timeout)
+        finally:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    async def _run(self, cmd, data, timeout):
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=subprocess.PIPE if data is not None else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        try:
+            out, err = await asyncio.wait_for(proc.communicate(data), timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.communicate()
+            raise DecodeError(f"FFmpeg timed out after {timeout:.0f}s")
+        if proc.returncode != 0:
+            raise DecodeError(err.decode("utf-8", errors="replace").strip() or f"FFmpeg exited with {proc.returncode}")
+        if not out:
+            raise DecodeError("FFmpeg produced no audio")
+        return out
+
+
+class StreamingDecoder:
+    """
+    Long-lived FFmpeg process that decodes a growing input stream.
+
+    Containers produced by MediaRecorder (WebM/Ogg) only carry headers in
+    the first chunk, so live audio has to go through one process for the
+    whole session. Bytes passed to write() are piped to ffmpeg, and decoded
+    PCM is handed to on_pcm() from a reader thread as soon as it is available.
+    on_end() runs on that thread after the input is closed and fully decoded.
+    """
+
+    READ_SIZE = 3200  # 100 ms of 16 kHz mono s16le
+
+    def __init__(self, on_pcm, on_end, input_format=None, ffmpeg_path=FFMPEG_PATH):
+        self.on_pcm = on_pcm
+        self.on_end = on_end
+        cmd = ffmpeg_pcm_cmd(ffmpeg_path)
+        # Start decoding after a small probe instead of buffering seconds of input
+        live_flags = ['-fflags', 'nobuffer', '-probesize', '32768', '-analyzeduration', '0']
+        if input_format:
+            live_flags += ['-f', input_format]
+        i = cmd.index('-i')
+        cmd[i:i] = live_flags
+        cmd[-1:-1] = ['-flush_packets', '1']
+        self._proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        self._reader = threading.Thread(target=self._pump, name="ffmpeg-stream-reader", daemon=True)
+        self._reader.start()
+
+    def write(self, data):
+        try:
+            self._proc.stdin.write(data)
+            self._proc.stdin.flush()
+        except (BrokenPipeError, ValueError) as e:
+            raise DecodeError(f"FFmpeg stream closed: {e}")
+
+    def close(self):
+        try:
+            self._proc.stdin.close()
+        except (BrokenPipeError, ValueError):
+            pass
+
+    def _pump(self):
+        carry = b""
+        try:
+            while True:
+                chunk = self._proc.stdout.read1(self.READ_SIZE)
+                if not chunk:
+                    break
+                chunk = carry + chunk
+                usable = len(chunk) - len(chunk) % SAMPLE_WIDTH
+                carry = chunk[usable:]
+                if usable:
+                    self.on_pcm(chunk[:usable])
+        except Exception as e:
+            logger.error(f"Streaming decode failed: {e}")
+        finally:
+            returncode = self._proc.wait()
+            if returncode not in (0, None):
+                logger.warning(f"Streaming FFmpeg exited with {returncode}")
+            self.on_end()
+
+
+class PassthroughDecoder:
+    """Same interface as StreamingDecoder for clients that already send 16 kHz mono s16le PCM."""
+
+    def __init__(self, on_pcm, on_end):
+        self.on_pcm = on_pcm
+        self.on_end = on_end
+        self._carry = b""
+
+    def write(self, data):
+        data = self._carry + data
+        usable = len(data) - len(data) % SAMPLE_WIDTH
+        self._carry = data[usable:]
+        if usable:
+            self.on_pcm(data[:usable])
+
+    def close(self):
+        # Match StreamingDecoder: end-of-stream work runs off the caller's thread
+        threading.Thread(target=self.on_end, name="pcm-stream-end", daemon=True).start()
@@ -0,0 +1,54 @@
+"""
+Recognition and translation stages shared by Audio.py (Flask) and
+Audio_async.py (Quart).
+
+Importing this module has no side effects: it creates no pools, threads,
+decoders or app objects, so each server builds only the resources it uses.
+"""
+import os
+
+import speech_recognition as sr
+from deep_translator import GoogleTranslator
+
+from audio_decoder import SAMPLE_RATE, SAMPLE_WIDTH
+from translation_cache import translation_cache
+
+# Use environment variable for FFmpeg path or default to system PATH
+FFMPEG_PATH = os.environ.get("FFMPEG_PATH", "ffmpeg")
+
+# Long clips are split on silence into chunks of at most this many seconds
+SR_CHUNK_MAX_SECONDS = float(os.environ.get("SR_CHUNK_MAX_SECONDS", "15"))
+
+# Supported languages for translation
+SUPPORTED_LANGUAGES = {
+    'en': 'English', 'es': 'Spanish', 'fr': 'French', 'de': 'German', 
+    'it': 'Italian', 'pt': 'Portuguese', 'ru': 'Russian', 'ja': 'Japanese',
+    'ko': 'Korean', 'zh': 'Chinese', 'ar': 'Arabic', 'hi': 'Hindi',
+    'ur': 'Urdu', 'tr': 'Turkish', 'nl': 'Dutch', 'sv': 'Swedish',
+    'pl': 'Polish', 'vi': 'Vietnamese', 'th': 'Thai'
+}
+
+def recognize_pcm(pcm):
+    """
+    Recognize one chunk of 16 kHz mono PCM with Google Speech Recognition.
+    Returns "" when nothing intelligible was said.
+    """
+    recognizer = sr.Recognizer()
+    try:
+        return recognizer.recognize_google(sr.AudioData(pcm, SAMPLE_RATE, SAMPLE_WIDTH))
+    except sr.UnknownValueError:
+        return ""
+
+def translate_text(text, target_lang):
+    """
+    Translate text using deep_translator library
+    """
+    try:
+        if text.strip() and target_lang in SUPPORTED_LANGUAGES:
+            return translation_cache.get_or_translate(
+                text, 'auto', target_lang, 'google',
+                lambda: GoogleTranslator(source='auto', target=target_lang).translate(text)
+            )
+        return text
+    except Exception as e:
+        return f"Translation error: {str(e)}"
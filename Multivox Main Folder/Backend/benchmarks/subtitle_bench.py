@@ -0,0 +1,319 @@
+"""
+Offline load benchmark for the subtitle pipeline (Subtitle.py).
+
+Runs Subtitle.run_subtitle_pipeline itself (ingest/decode + transcript
+cache, Whisper model manager and locking, batched segment translation, SRT
+generation) with stand-ins for everything remote or heavy:
+  - generated speech-like test audio instead of uploads/YouTube
+  - FakeWhisperModel: synthetic segments, compute time = audio length x --stt-rtf
+  - FakeTranslator: local text transform with injected latency per request
+Stage latencies are taken from the stage updates the pipeline reports to
+its job, and end-to-end throughput at --jobs concurrent jobs is written as
+JSON; --baseline compares against a previous run and exits 1 on
+a regression beyond --tolerance.
+
+Run from the Backend folder (needs the service's Python dependencies, but no
+network, model download or ffmpeg):
+    python benchmarks/subtitle_bench.py --jobs 4 --total 16 --output bench.json
+"""
+import os
+import re
+import sys
+import json
+import time
+import wave
+import random
+import logging
+import argparse
+import platform
+import tempfile
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_RATE = 16000
+STAGES = ("ingest", "stt", "mt", "srt", "total")
+
+WORDS = ("the quick brown fox jumps over a lazy dog while seven wizards quietly "
+         "judge boxing matches near the old harbour every single evening").split()
+
+
+# ---------- Stand-ins ----------
+
+def generate_audio(seconds, seed):
+    """Speech-like test signal: modulated tone bursts of 1-6 s separated by 0.3-1.2 s pauses."""
+    rng = random.Random(seed)
+    out = []
+    total = 0
+    while total < seconds * SAMPLE_RATE:
+        burst = int(rng.uniform(1.0, 6.0) * SAMPLE_RATE)
+        t = np.arange(burst) / SAMPLE_RATE
+        freq = rng.uniform(120, 300)
+        envelope = 0.5 + 0.5 * np.sin(2 * np.pi * rng.uniform(3, 6) * t)
+        out.append(0.3 * envelope * np.sin(2 * np.pi * freq * t))
+        pause = int(rng.uniform(0.3, 1.2) * SAMPLE_RATE)
+        out.append(np.random.default_rng(seed + total).normal(0, 0.002, pause))
+        total += burst + pause
+    return np.concatenate(out)[: int(seconds * SAMPLE_RATE)].astype(np.float32)
+
+
+def write_wav(path, audio):
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes((np.clip(audio, -1, 1) * 32767).astype("<i2").tobytes())
+
+
+def read_wav(path):
+    """Stand-in for whisper.load_audio on the generated 16 kHz mono WAVs."""
+    with wave.open(path, "rb") as w:
+        pcm = w.readframes(w.getnframes())
+    return np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0
+
+
+class FakeWhisperModel:
+    """Emits one synthetic segment per --segment-seconds of audio after a simulated compute delay."""
+
+    def __init__(self, rtf, segment_seconds):
+        self.rtf = rtf
+        self.segment_seconds = segment_seconds
+
+    def parameters(self):
+        return []
+
+    def buffers(self):
+        return []
+
+    def transcribe(self, audio, **options):
+        duration = len(audio) / SAMPLE_RATE
+        time.sleep(duration * self.rtf)
+        # Content depends on the audio so different jobs get different text
+        rng = random.Random(int(abs(float(np.sum(audio[:4000]))) * 1e6))
+        segments = []
+        start = 0.0
+        while start < duration:
+            end = min(duration, start + self.segment_seconds)
+            text = " " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 12))) + "."
+            segments.append({"start": start, "end": end, "text": text})
+            start = end
+        return {"text": "".join(s["text"] for s in segments), "segments": segments}
+
+
+class FakeTranslator:
+    """Reverses each word (leaving the [[n]] pack markers intact) after an injected delay."""
+
+    def __init__(self, latency, jitter, per_char):
+        self.latency = latency
+        self.jitter = jitter
+        self.per_char = per_char
+        self.requests = 0
+        self.chars = 0
+        self._lock = threading.Lock()
+
+    def translate(self, text):
+        with self._lock:
+            self.requests += 1
+            self.chars += len(text)
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)) + self.per_char * len(text))
+        return re.sub(r"[^\W\d_]+", lambda m: m.group(0)[::-1], text)
+
+
+# ---------- Harness ----------
+
+# Seconds the last generate_srt call on this thread took
+_srt_timing = threading.local()
+
+
+class StageClock:
+    """Stands in for a subtitle job: records when the pipeline enters each stage."""
+
+    def __init__(self):
+        self.entered = {}
+
+    def update(self, stage=None, **fields):
+        if stage and stage not in self.entered:
+            self.entered[stage] = time.perf_counter()
+
+
+def load_pipeline(workdir, args, translator):
+    """Import Subtitle.py inside a scratch directory and plug in the stand-ins."""
+    os.environ["TRANSLATION_CACHE_DB"] = ""  # memory-only translation cache
+    os.environ["TRANSCRIPT_CACHE_DB"] = os.path.join(workdir, "transcripts.db")
+    os.environ["WHISPER_PARALLEL_WORKERS"] = "0"
+    os.environ["WHISPER_WARMUP"] = ""
+    os.chdir(workdir)  # uploads/ is created relative to the working directory
+    sys.path.insert(0, BACKEND_DIR)
+
+    import Subtitle
+    from whisper_models import ModelManager
+
+    # Per-request INFO logs would dominate the output and the timings
+    logging.getLogger().setLevel(logging.WARNING)
+    Subtitle.models = ModelManager(
+        default_size=args.model_size,
+        loader=lambda size: FakeWhisperModel(args.stt_rtf, args.segment_seconds)
+    )
+    Subtitle.load_audio = read_wav
+    Subtitle.google_translator = lambda lang: translator
+
+    generate_srt = Subtitle.generate_srt
+
+    def timed_generate_srt(segments):
+        mark = time.perf_counter()
+        try:
+            return generate_srt(segments)
+        finally:
+            _srt_timing.seconds = time.perf_counter() - mark
+
+    Subtitle.generate_srt = timed_generate_srt
+    return Subtitle
+
+
+def run_job(pipeline, index, args, timings):
+    """One subtitle job through run_subtitle_pipeline, split into stages by its job updates."""
+    seed = args.seed if args.same_audio else args.seed + index
+    audio = generate_audio(args.audio_seconds, seed)
+    media_filename = f"bench-{index}.wav"
+    clock = StageClock()
+
+    started = time.perf_counter()
+    write_wav(pipeline.storage.path(media_filename), audio)
+    pipeline.storage.touch(media_filename)
+    result = pipeline.run_subtitle_pipeline(
+        args.lang, media_filename=media_filename, job=clock, pipelined=args.pipelined, model_size=args.model_size
+    )
+    finished = time.perf_counter()
+
+    entered = clock.entered
+    transcribing = entered.get("transcribing")
+    translating = entered.get("translating")
+    done = entered.get("done", finished)
+    srt = _srt_timing.seconds
+    stage = {"ingest": (transcribing or translating or done) - started, "srt": srt, "total": finished - started}
+    if translating is None:
+        # Pipelined: STT and MT overlap, so the combined time is reported as STT, MT as zero
+        stage["stt"] = done - srt - (transcribing or done)
+        stage["mt"] = 0.0
+    else:
+        stage["stt"] = translating - transcribing if transcribing else 0.0
+        stage["mt"] = done - srt - translating
+
+    for name, seconds in stage.items():
+        timings[name].append(seconds)
+    return len(result["subtitles"])
+
+
+def summarize(samples):
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        "count": len(samples),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "p50_ms": round(pct(50) * 1000, 3),
+        "p95_ms": round(pct(95) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def compare(result, baseline, tolerance):
+    """Return human-readable regressions of result against baseline."""
+    regressions = []
+    for name in STAGES:
+        old = baseline.get("stages", {}).get(name, {}).get("p50_ms")
+        new = result["stages"].get(name, {}).get("p50_ms")
+        # Sub-millisecond stages are too noisy to compare
+        if old and new and old >= 1 and new > old * (1 + tolerance):
+            regressions.append(f"{name} p50 {old} ms -> {new} ms")
+    old = baseline.get("throughput", {}).get("jobs_per_second")
+    new = result["throughput"]["jobs_per_second"]
+    if old and new < old * (1 - tolerance):
+        regressions.append(f"throughput {old} -> {new} jobs/s")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--jobs", type=int, default=4, help="concurrent jobs")
+    parser.add_argument("--total", type=int, default=None, help="jobs to run in all (default: 4 x --jobs)")
+    parser.add_argument("--audio-seconds", type=float, default=120.0, help="length of each generated clip")
+    parser.add_argument("--same-audio", action="store_true", help="every job gets the same clip (cache-hit path)")
+    parser.add_argument("--pipelined", action="store_true", help="use the pipelined STT+MT mode")
+    parser.add_argument("--lang", default="fr")
+    parser.add_argument("--model-size", default="base")
+    parser.add_argument("--stt-rtf", type=float, default=0.02, help="fake Whisper seconds of compute per audio second")
+    parser.add_argument("--segment-seconds", type=float, default=3.0, help="fake Whisper segment length")
+    parser.add_argument("--mt-latency", type=float, default=0.15, help="fake translator seconds per request")
+    parser.add_argument("--mt-jitter", type=float, default=0.05)
+    parser.add_argument("--mt-per-char", type=float, default=0.00001, help="extra seconds per request character")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    parser.add_argument("--baseline", help="previous JSON result to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown vs baseline")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    total_jobs = args.total or args.jobs * 4
+    cwd = os.getcwd()
+    translator = FakeTranslator(args.mt_latency, args.mt_jitter, args.mt_per_char)
+    timings = {name: [] for name in STAGES}
+
+    with tempfile.TemporaryDirectory(prefix="subtitle-bench-") as workdir:
+        pipeline = load_pipeline(workdir, args, translator)
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+                segment_counts = list(pool.map(lambda i: run_job(pipeline, i, args, timings), range(total_jobs)))
+            wall = time.perf_counter() - started
+        finally:
+            pipeline.storage.stop()
+            os.chdir(cwd)
+
+    result = {
+        "benchmark": "subtitle_pipeline",
+        "timestamp": time.time(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "stages": {name: summarize(timings[name]) for name in STAGES},
+        "throughput": {
+            "jobs": total_jobs,
+            "wall_seconds": round(wall, 3),
+            "jobs_per_second": round(total_jobs / wall, 4),
+            "audio_seconds_per_second": round(total_jobs * args.audio_seconds / wall, 2),
+            "segments": sum(segment_counts),
+        },
+        "translator": {"requests": translator.requests, "chars": translator.chars},
+    }
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION: {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
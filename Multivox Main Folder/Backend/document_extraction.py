@@ -0,0 +1,158 @@
+"""
+Streaming, size-limited text extraction for /translate_file.
+
+open_document() checks the upload against the limits it can check up front
+(file size, PDF page count, size of the DOCX body) and rejects an oversized
+document before any text is extracted. It returns an Extraction: an iterable
+of (text, separator) blocks (a PDF page, a DOCX paragraph, a line of plain
+text) that are read only as they are consumed, so it can be fed straight into
+document_translation.make_chunks and translation starts on the first pages
+while later pages are still being read. The total extracted text is capped
+at DOC_MAX_CHARS as it streams.
+
+DOCX bodies are parsed incrementally from word/document.xml, and each
+paragraph is dropped from the tree once its text has been yielded, so memory
+stays flat however long the document is.
+"""
+import os
+import io
+import zipfile
+import logging
+import xml.etree.ElementTree as ET
+
+from PyPDF2 import PdfReader
+
+logger = logging.getLogger(__name__)
+
+DOC_MAX_BYTES = int(os.environ.get("DOC_MAX_MB", "50")) * 1024 * 1024
+DOC_MAX_PAGES = int(os.environ.get("DOC_MAX_PAGES", "500"))
+DOC_MAX_CHARS = int(os.environ.get("DOC_MAX_CHARS", "2000000"))
+# XML markup is several times the text it holds; this only stops zip bombs
+DOCX_MAX_XML_BYTES = DOC_MAX_BYTES * 20
+PREVIEW_CHARS = 1000
+
+WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+class ExtractionError(Exception):
+    """The document could not be read."""
+
+
+class DocumentTooLarge(ExtractionError):
+    """The document exceeds DOC_MAX_BYTES, DOC_MAX_PAGES or DOC_MAX_CHARS."""
+
+
+def stream_size(stream):
+    position = stream.tell()
+    stream.seek(0, io.SEEK_END)
+    size = stream.tell()
+    stream.seek(position)
+    return size
+
+
+def pdf_blocks(reader, stream, ocr):
+    for text in ocr.pdf_pages(reader, stream):
+        yield text, "\n"
+
+
+def docx_blocks(archive):
+    """One block per paragraph of word/document.xml (tables included), parsed incrementally."""
+    with archive, archive.open("word/document.xml") as xml:
+        stack = []
+        for event, element in ET.iterparse(xml, events=("start", "end")):
+            if event == "start":
+                stack.append(element)
+                continue
+            stack.pop()
+            if element.tag != WORD_NS + "p":
+                continue
+            parts = []
+            for node in element.iter():
+                if node.tag == WORD_NS + "t":
+                    parts.append(node.text or "")
+                elif node.tag == WORD_NS + "tab":
+                    parts.append("\t")
+                elif node.tag in (WORD_NS + "br", WORD_NS + "cr"):
+                    parts.append("\n")
+            yield "".join(parts), "\n"
+            if stack:
+                stack[-1].remove(element)
+
+
+def image_blocks(stream, ocr):
+    yield ocr.ocr_image(stream.read()), ""
+
+
+def text_blocks(stream):
+    """Lines of a UTF-8 text file; undecodable bytes are dropped."""
+    for line in io.TextIOWrapper(stream, encoding="utf-8", errors="ignore", newline=""):
+        text = line.rstrip("\r\n")
+        yield text, line[len(text):]
+
+
+class Extraction:
+    """Lazily extracted (text, separator) blocks of one document, with DOC_MAX_CHARS enforced."""
+
+    def __init__(self, blocks, max_chars=DOC_MAX_CHARS):
+        self._blocks = blocks
+        self.max_chars = max_chars
+        self.chars = 0
+        self.preview = ""      # first PREVIEW_CHARS of the source text
+        self.has_text = False  # any non-blank text seen so far
+
+    def __iter__(self):
+        blocks = iter(self._blocks)
+        while True:
+            try:
+                block = next(blocks, None)
+            except ExtractionError:
+                raise
+            except Exception as e:
+                raise ExtractionError(str(e)) from e
+            if block is None:
+                return
+            text, sep = block
+            self.chars += len(text) + len(sep)
+            if self.chars > self.max_chars:
+                raise DocumentTooLarge(f"document has more than {self.max_chars} characters of text")
+            if len(self.preview) < PREVIEW_CHARS:
+                self.preview += (text + sep)[:PREVIEW_CHARS - len(self.preview)]
+            self.has_text = self.has_text or bool(text.strip())
+            yield text, sep
+
+
+def open_document(file, ocr, max_bytes=DOC_MAX_BYTES, max_pages=DOC_MAX_PAGES):
+    """
+    Validate an uploaded werkzeug FileStorage and return its Extraction.
+    Raises DocumentTooLarge for an oversized upload, ExtractionError if the
+    file cannot be opened.
+    """
+    name = (file.filename or "").lower()
+    stream = file.stream
+    size = stream_size(stream)
+    if size > max_bytes:
+        raise DocumentTooLarge(f"file is {size // (1024 * 1024)} MB (limit {max_bytes // (1024 * 1024)} MB)")
+    try:
+        if name.endswith(".pdf"):
+            reader = PdfReader(stream)
+            pages = len(reader.pages)
+            if pages > max_pages:
+                raise DocumentTooLarge(f"PDF has {pages} pages (limit {max_pages})")
+            blocks = pdf_blocks(reader, stream, ocr)
+        elif name.endswith(".docx"):
+            archive = zipfile.ZipFile(stream)
+            body = archive.getinfo("word/document.xml").file_size
+            if body > DOCX_MAX_XML_BYTES:
+                archive.close()
+                raise DocumentTooLarge(f"DOCX body is {body // (1024 * 1024)} MB uncompressed")
+            blocks = docx_blocks(archive)
+        elif name.endswith(IMAGE_EXTENSIONS):
+            blocks = image_blocks(stream, ocr)
+        else:
+            blocks = text_blocks(stream)
+    except ExtractionError:
+        raise
+    except Exception as e:
+        raise ExtractionError(str(e)) from e
+    return Extraction(blocks)
@@ -0,0 +1,168 @@
+"""
+Chunked, concurrent document translation.
+
+A document is cut at paragraph breaks into chunks of at most
+DOC_CHUNK_MAX_CHARS (a paragraph that is too long is cut at sentence ends,
+and a sentence that is too long at spaces). Each chunk remembers the exact
+whitespace that followed it, so reassembling the translated chunks in order
+keeps the document's line and paragraph structure.
+
+Chunks are translated on a bounded executor and reported as they finish.
+A chunk that fails is retried on its own, with backoff, up to
+DOC_CHUNK_RETRIES times; the others are not re-sent. The backoff is waited
+out by the consumer, not on a worker, so throttled chunks do not hold pool
+threads that other chunks could use. Chunks are pulled
+lazily from the input, so a generator of blocks is never held in full.
+"""
+import os
+import re
+import time
+import heapq
+import logging
+from collections import namedtuple, Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+# googletrans rejects requests above ~5000 characters
+DOC_CHUNK_MAX_CHARS = int(os.environ.get("DOC_CHUNK_MAX_CHARS", "4000"))
+DOC_TRANSLATE_WORKERS = int(os.environ.get("DOC_TRANSLATE_WORKERS", "4"))
+DOC_CHUNK_RETRIES = int(os.environ.get("DOC_CHUNK_RETRIES", "2"))
+RETRY_BACKOFF = 0.5  # seconds, doubled per attempt
+
+PARAGRAPH_RE = re.compile(r"(\n[ \t]*\n\s*|\n)")
+SENTENCE_RE = re.compile(r"(?<=[.!?。！？।])(\s+)")
+
+Chunk = namedtuple("Chunk", ["index", "text", "separator"])
+ChunkResult = namedtuple("ChunkResult", ["index", "source", "text", "src", "error", "attempts", "separator"])
+
+_executor = None
+
+
+def default_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=DOC_TRANSLATE_WORKERS, thread_name_prefix="doc-translate")
+    return _executor
+
+
+def split_paragraphs(text):
+    """Yield (paragraph, separator) pairs; joining them gives back `text`."""
+    parts = PARAGRAPH_RE.split(text)
+    # parts = [para0, sep0, para1, sep1, ..., paraN]
+    for i in range(0, len(parts), 2):
+        yield parts[i], parts[i + 1] if i + 1 < len(parts) else ""
+
+
+def _split_long(text, max_chars):
+    """Cut one over-long paragraph into (piece, separator) pairs at sentence ends, then spaces."""
+    parts = SENTENCE_RE.split(text)
+    pieces = [(parts[i], parts[i + 1] if i + 1 < len(parts) else "") for i in range(0, len(parts), 2)]
+    for sentence, sep in pieces:
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            yield sentence[:cut], ""
+            sentence = sentence[cut:]
+        yield sentence, sep
+
+
+def make_chunks(blocks, max_chars=DOC_CHUNK_MAX_CHARS):
+    """
+    Pack (text, separator) blocks into Chunks of at most max_chars, cutting
+    only between blocks (or inside a block that is too long on its own).
+    """
+    index = 0
+    current = ""
+    pending_sep = ""
+    started = False
+    for text, sep in blocks:
+        if len(text) <= max_chars:
+            pieces = [(text, sep)]
+        else:
+            pieces = list(_split_long(text, max_chars))
+            pieces[-1] = (pieces[-1][0], pieces[-1][1] + sep)
+        for piece, piece_sep in pieces:
+            if started and len(current) + len(pending_sep) + len(piece) > max_chars:
+                yield Chunk(index, current, pending_sep)
+                index += 1
+                current, pending_sep, started = "", "", False
+            current = current + pending_sep + piece if started else piece
+            pending_sep = piece_sep
+            started = True
+    if started:
+        yield Chunk(index, current, pending_sep)
+
+
+def chunk_text(text, max_chars=DOC_CHUNK_MAX_CHARS):
+    return make_chunks(split_paragraphs(text), max_chars)
+
+
+def _translate_one(chunk, translate_fn):
+    if not chunk.text.strip():
+        return chunk.text, None
+    return translate_fn(chunk.text)
+
+
+def translate_chunks(chunks, translate_fn, executor=None, retries=DOC_CHUNK_RETRIES, max_in_flight=None):
+    """
+    Translate an iterable of Chunks; yields ChunkResults in completion order.
+    translate_fn(text) -> (translated_text, detected_src). A chunk that still
+    fails after `retries` retries is yielded with its error and text=None.
+    If the consumer stops early, chunks not yet started are cancelled.
+    """
+    executor = executor or default_executor()
+    max_in_flight = max_in_flight or getattr(executor, "_max_workers", DOC_TRANSLATE_WORKERS) * 2
+    source = iter(chunks)
+    running = {}  # future -> (chunk, attempt)
+    delayed = []  # heap of (ready_at, index, chunk, attempt) waiting out their backoff
+    exhausted = False
+    try:
+        while True:
+            now = time.monotonic()
+            while delayed and delayed[0][0] <= now:
+                _, _, chunk, attempt = heapq.heappop(delayed)
+                running[executor.submit(_translate_one, chunk, translate_fn)] = (chunk, attempt)
+            while not exhausted and len(running) + len(delayed) < max_in_flight:
+                chunk = next(source, None)
+                if chunk is None:
+                    exhausted = True
+                    break
+                running[executor.submit(_translate_one, chunk, translate_fn)] = (chunk, 0)
+            if not running and not delayed:
+                return
+            timeout = max(0.0, delayed[0][0] - time.monotonic()) if delayed else None
+            if not running:
+                time.sleep(timeout)
+                continue
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                chunk, attempt = running.pop(future)
+                try:
+                    text, src = future.result()
+                except Exception as e:
+                    if attempt < retries:
+                        logger.info(f"Chunk {chunk.index} failed ({e}); retry {attempt + 1}/{retries}")
+                        ready_at = time.monotonic() + RETRY_BACKOFF * 2 ** attempt
+                        heapq.heappush(delayed, (ready_at, chunk.index, chunk, attempt + 1))
+                        continue
+                    logger.warning(f"Chunk {chunk.index} failed after {attempt + 1} attempts: {e}")
+                    yield ChunkResult(chunk.index, chunk.text, None, None, str(e), attempt + 1, chunk.separator)
+                    continue
+                yield ChunkResult(chunk.index, chunk.text, text, src, None, attempt + 1, chunk.separator)
+    finally:
+        for future in running:
+            future.cancel()
+
+
+def assemble(results):
+    """Join ChunkResults in document order; failed chunks keep their source text."""
+    ordered = sorted(results, key=lambda r: r.index)
+    return "".join((r.text if r.error is None else r.source) + r.separator for r in ordered)
+
+
+def detected_source(results):
+    """Most common source language detected across chunks."""
+    counts = Counter(r.src for r in results if r.src and r.src != "auto")
+    return counts.most_common(1)[0][0] if counts else None
@@ -0,0 +1,204 @@
+"""
+Compiled domain-dictionary matching for Lang_translator.py.
+
+Each domain's terms are compiled once into a single trie-shaped regular
+expression, so annotating a translation is one pass over the text however
+many terms the domain has. Matches respect token boundaries (a term is not
+matched inside a longer word, but is matched at line edges and next to
+punctuation), and the longest term wins where terms overlap.
+
+Compiled matchers are invalidated automatically: SQLite triggers bump a
+per-domain version whenever domain_dictionary rows are inserted, updated or
+deleted (by this process or any other), and `PRAGMA data_version` tells us
+cheaply when anything in the database may have changed.
+
+Terms are limited to DOMAIN_TERM_MAX_CHARS: the trie nests one optional group
+per term that is a prefix of a longer one, and Python's regex compiler
+recurses once per nested group.
+"""
+import os
+import re
+import logging
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+DOMAIN_TERM_MAX_CHARS = int(os.environ.get("DOMAIN_TERM_MAX_CHARS", "200"))
+
+VERSION_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS domain_dictionary_version (
+        domain TEXT PRIMARY KEY,
+        version INTEGER NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_domain_dictionary_domain ON domain_dictionary(domain)",
+    """
+    CREATE TRIGGER IF NOT EXISTS domain_dictionary_after_insert AFTER INSERT ON domain_dictionary BEGIN
+        INSERT INTO domain_dictionary_version(domain, version) VALUES (NEW.domain, 1)
+        ON CONFLICT(domain) DO UPDATE SET version = version + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS domain_dictionary_after_delete AFTER DELETE ON domain_dictionary BEGIN
+        INSERT INTO domain_dictionary_version(domain, version) VALUES (OLD.domain, 1)
+        ON CONFLICT(domain) DO UPDATE SET version = version + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS domain_dictionary_after_update AFTER UPDATE ON domain_dictionary BEGIN
+        INSERT INTO domain_dictionary_version(domain, version) VALUES (OLD.domain, 1)
+        ON CONFLICT(domain) DO UPDATE SET version = version + 1;
+        INSERT INTO domain_dictionary_version(domain, version) VALUES (NEW.domain, 1)
+        ON CONFLICT(domain) DO UPDATE SET version = version + 1;
+    END
+    """,
+]
+
+
+def trie_pattern(terms):
+    """Regex source matching any of `terms`, factored on shared prefixes."""
+    trie = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    # Built bottom-up with an explicit stack, so term length is not bounded by recursion depth
+    built = {}  # id(node) -> regex source of the subtree
+    stack = [(trie, False)]
+    while stack:
+        node, children_done = stack.pop()
+        if not children_done:
+            stack.append((node, True))
+            stack.extend((child, False) for ch, child in node.items() if ch)
+            continue
+        branches = [re.escape(ch) + built.pop(id(child)) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            built[id(node)] = ""
+            continue
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # A term ends here: the longer continuations are optional (greedy, so longest first)
+        built[id(node)] = f"(?:{body})?" if "" in node else body
+    return built[id(trie)]
+
+
+class DomainMatcher:
+    """Annotates every known term in a text with its meaning, in one pass."""
+
+    def __init__(self, entries):
+        self.meanings = {}
+        skipped = 0
+        for term, meaning in entries:
+            term = (term or "").strip()
+            if len(term) > DOMAIN_TERM_MAX_CHARS:
+                skipped += 1
+            elif term:
+                self.meanings[term] = meaning
+        if skipped:
+            logger.warning(f"Skipped {skipped} domain terms longer than {DOMAIN_TERM_MAX_CHARS} characters")
+        self.pattern = None
+        if self.meanings:
+            self.pattern = re.compile(r"(?<!\w)" + trie_pattern(self.meanings) + r"(?!\w)")
+
+    def __len__(self):
+        return len(self.meanings)
+
+    def apply(self, text):
+        if self.pattern is None or not text:
+            return text
+        return self.pattern.sub(lambda m: f"{m.group(0)} ({self.meanings[m.group(0)]})", text)
+
+
+class DomainDictionary:
+    """Per-domain compiled matchers over the domain_dictionary table."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            for statement in VERSION_SCHEMA:
+                self._conn.execute(statement)
+        self._data_version = None
+        self._versions = {}
+        self._matchers = {}  # domain -> (version, DomainMatcher)
+        self._stats = {"builds": 0, "hits": 0}
+
+    def _refresh_versions_locked(self):
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self._data_version:
+            self._versions = dict(self._conn.execute("SELECT domain, version FROM domain_dictionary_version").fetchall())
+            self._data_version = data_version
+
+    def matcher(self, domain):
+        with self._lock:
+            self._refresh_versions_locked()
+            version = self._versions.get(domain, 0)
+            cached = self._matchers.get(domain)
+            if cached and cached[0] == version:
+                self._stats["hits"] += 1
+                return cached[1]
+            rows = self._conn.execute(
+                "SELECT term, meaning FROM domain_dictionary WHERE domain=? ORDER BY rowid", (domain,)
+            ).fetchall()
+            matcher = DomainMatcher((r["term"], r["meaning"]) for r in rows)
+            self._matchers[domain] = (version, matcher)
+            self._stats["builds"] += 1
+            logger.info(f"Compiled domain dictionary '{domain}' ({len(matcher)} terms, version {version})")
+            return matcher
+
+    def apply(self, text, domain):
+        if not domain:
+            return text
+        return self.matcher(domain).apply(text)
+
+    def _write(self, statements):
+        """Run (sql, params_seq) pairs in one transaction on the shared connection."""
+        with self._lock:
+            with self._conn:
+                for sql, params in statements:
+                    self._conn.executemany(sql, params)
+            # Writes on this connection do not change its own data_version
+            self._data_version = None
+
+    def bulk_load(self, domain, entries, replace=False):
+        """
+        Insert or overwrite (term, meaning) pairs for a domain in one transaction.
+        With replace=True the domain's existing terms are dropped first.
+        Raises ValueError if a term is longer than DOMAIN_TERM_MAX_CHARS.
+        """
+        entries = [(domain, term.strip(), meaning) for term, meaning in entries if term and term.strip()]
+        too_long = [e[1] for e in entries if len(e[1]) > DOMAIN_TERM_MAX_CHARS]
+        if too_long:
+            raise ValueError(f"{len(too_long)} terms are longer than {DOMAIN_TERM_MAX_CHARS} characters "
+                             f"(first: {too_long[0][:40]!r}...)")
+        statements = []
+        if replace:
+            statements.append(("DELETE FROM domain_dictionary WHERE domain=?", [(domain,)]))
+        else:
+            statements.append(("DELETE FROM domain_dictionary WHERE domain=? AND term=?", [e[:2] for e in entries]))
+        statements.append(("INSERT INTO domain_dictionary(domain, term, meaning) VALUES (?, ?, ?)", entries))
+        self._write(statements)
+        return len(entries)
+
+    def delete_domain(self, domain):
+        self._write([("DELETE FROM domain_dictionary WHERE domain=?", [(domain,)])])
+
+    def domains(self):
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT d.domain, COUNT(*) AS terms, COALESCE(v.version, 0) AS version
+                FROM domain_dictionary d LEFT JOIN domain_dictionary_version v ON v.domain = d.domain
+                GROUP BY d.domain ORDER BY d.domain
+            """).fetchall()
+        return [dict(r) for r in rows]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["compiled"] = {domain: len(m) for domain, (_, m) in self._matchers.items()}
+        return stats
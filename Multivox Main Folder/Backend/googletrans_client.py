@@ -0,0 +1,112 @@
+"""
+Shared googletrans client for sync Flask handlers.
+
+googletrans 4.x is async-only. Calling asyncio.run() per request builds a
+new event loop, Translator and httpx connection pool every time. Instead,
+one background thread runs a long-lived event loop that owns a single
+Translator; handlers submit coroutines to it and block on the result, so
+concurrent translations multiplex over the same kept-alive (HTTP/2)
+connections. A semaphore bounds requests in flight and every call has a
+timeout.
+"""
+import os
+import asyncio
+import logging
+import threading
+import concurrent.futures
+
+import httpx
+from googletrans import Translator
+
+logger = logging.getLogger(__name__)
+
+GOOGLETRANS_CONCURRENCY = int(os.environ.get("GOOGLETRANS_CONCURRENCY", "16"))
+GOOGLETRANS_TIMEOUT = float(os.environ.get("GOOGLETRANS_TIMEOUT", "15"))  # seconds per translation
+GOOGLETRANS_CONNECT_TIMEOUT = float(os.environ.get("GOOGLETRANS_CONNECT_TIMEOUT", "5"))
+
+
+class TranslateTimeout(Exception):
+    """Raised when a translation does not finish within the timeout."""
+
+
+class GoogletransClient:
+    """Background event loop with one pooled Translator; started on first use."""
+
+    def __init__(self, concurrency=GOOGLETRANS_CONCURRENCY, timeout=GOOGLETRANS_TIMEOUT,
+                 connect_timeout=GOOGLETRANS_CONNECT_TIMEOUT):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self._loop = None
+        self._thread = None
+        self._translator = None
+        self._semaphore = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "failed": 0, "timeouts": 0, "in_flight": 0}
+
+    def _ensure_started(self):
+        if self._loop is not None:
+            return self._loop
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="googletrans-loop", daemon=True)
+                thread.start()
+                # The httpx client and semaphore must be created on the loop that uses them
+                asyncio.run_coroutine_threadsafe(self._setup(), loop).result()
+                self._thread = thread
+                self._loop = loop
+                logger.info(f"googletrans loop started (concurrency {self.concurrency}, timeout {self.timeout}s)")
+        return self._loop
+
+    async def _setup(self):
+        self._translator = Translator(timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout))
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def _translate(self, text, dest, src):
+        async with self._semaphore:
+            return await asyncio.wait_for(self._translator.translate(text, dest=dest, src=src), self.timeout)
+
+    def _count(self, key, delta=1):
+        with self._stats_lock:
+            self._stats[key] += delta
+
+    def translate(self, text, dest, src="auto", timeout=None):
+        """Translate on the shared loop; blocks the calling thread until done."""
+        loop = self._ensure_started()
+        # Waiting for a semaphore slot counts against the caller's timeout too
+        timeout = timeout or self.timeout * 2
+        self._count("requests")
+        self._count("in_flight")
+        future = asyncio.run_coroutine_threadsafe(self._translate(text, dest, src), loop)
+        try:
+            return future.result(timeout)
+        except (concurrent.futures.TimeoutError, asyncio.TimeoutError):
+            future.cancel()
+            self._count("timeouts")
+            raise TranslateTimeout(f"Translation timed out after {timeout:.0f}s")
+        except Exception:
+            self._count("failed")
+            raise
+        finally:
+            self._count("in_flight", -1)
+
+    def close(self):
+        """Close the HTTP pool and stop the loop."""
+        with self._start_lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._translator.client.aclose(), loop).result(5)
+        except Exception as e:
+            logger.warning(f"Closing googletrans client failed: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join(timeout=5)
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update(started=self._loop is not None, concurrency=self.concurrency, timeout=self.timeout)
+        return stats
@@ -0,0 +1,202 @@
+"""
+Page-parallel OCR for /translate_file.
+
+PDF pages whose text layer is missing (scans) are rasterized whole with
+PDFium, straight to grayscale at OCR_TARGET_DPI, so every way a scanner
+draws a page (JBIG2/CCITT images, tiled strips, vector content) is OCR'd the
+same way. Uploaded images are OCR'd directly, after being converted to
+grayscale and resampled to OCR_TARGET_DPI (images that carry no DPI
+information are only capped at OCR_MAX_SIDE pixels), which keeps Tesseract
+accurate on low-resolution scans and fast on huge ones.
+
+Images are OCR'd concurrently, OCR_WORKERS at a time. pytesseract runs the
+tesseract binary as a subprocess per image, so worker threads spread the
+work over all cores without re-importing the Flask app in spawned worker
+processes; each tesseract process is limited to one OpenMP thread so they do
+not oversubscribe the CPU. Results are cached by a hash of the image
+(encoded bytes for uploads, rendered pixels for PDF pages). PDFium is not
+thread-safe, so pages are rendered one at a time on the consuming thread
+while earlier pages are OCR'd.
+"""
+import os
+import io
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+
+# Must be set before tesseract subprocesses are started
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+import pytesseract
+import pypdfium2 as pdfium
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", str(os.cpu_count() or 1)))
+OCR_TARGET_DPI = int(os.environ.get("OCR_TARGET_DPI", "300"))
+OCR_MAX_SIDE = int(os.environ.get("OCR_MAX_SIDE", "4000"))  # pixels
+OCR_LANG = os.environ.get("OCR_LANG", "eng")
+OCR_CACHE_ENTRIES = int(os.environ.get("OCR_CACHE_ENTRIES", "1024"))
+# A PDF page with less extracted text than this is treated as a scan
+OCR_MIN_TEXT_CHARS = int(os.environ.get("OCR_MIN_TEXT_CHARS", "20"))
+PDF_POINTS_PER_INCH = 72
+
+
+def normalize_image(img, dpi=None):
+    """Grayscale, resampled to OCR_TARGET_DPI (or capped at OCR_MAX_SIDE without a DPI)."""
+    img = img.convert("L")
+    scale = min(OCR_TARGET_DPI / dpi if dpi else 1.0, OCR_MAX_SIDE / max(img.size))
+    if abs(scale - 1.0) > 0.05:
+        size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+        img = img.resize(size, Image.LANCZOS)
+    return img
+
+
+def image_dpi(img, dpi_hint=None):
+    """Horizontal DPI from the caller's hint (PDF geometry) or the file's metadata."""
+    if dpi_hint:
+        return dpi_hint
+    dpi = img.info.get("dpi")
+    try:
+        return float(dpi[0]) if dpi and float(dpi[0]) > 1 else None
+    except (TypeError, ValueError):
+        return None
+
+
+def ocr_bytes(data, dpi_hint=None, lang=OCR_LANG):
+    """Decode, normalize and OCR one encoded image."""
+    with Image.open(io.BytesIO(data)) as img:
+        normalized = normalize_image(img, image_dpi(img, dpi_hint))
+    return pytesseract.image_to_string(normalized, lang=lang)
+
+
+def render_page(page):
+    """Rasterize a PDFium page to grayscale at OCR_TARGET_DPI (capped at OCR_MAX_SIDE)."""
+    width, height = page.get_size()  # points
+    scale = min(OCR_TARGET_DPI / PDF_POINTS_PER_INCH, OCR_MAX_SIDE / max(width, height, 1))
+    return page.render(scale=scale, grayscale=True).to_pil()
+
+
+class OcrPipeline:
+    """Bounded OCR worker pool with a per-image result cache."""
+
+    def __init__(self, workers=OCR_WORKERS, cache_entries=OCR_CACHE_ENTRIES, lang=OCR_LANG):
+        self.workers = workers
+        self.cache_entries = cache_entries
+        self.lang = lang
+        self._executor = None
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._stats = {"images": 0, "cache_hits": 0, "scanned_pages": 0, "render_failures": 0}
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ocr")
+            return self._executor
+
+    def _key(self, data):
+        return hashlib.sha256(data).hexdigest() + f":{self.lang}:{OCR_TARGET_DPI}"
+
+    def _cached(self, key):
+        with self._lock:
+            text = self._cache.get(key)
+            if text is not None:
+                self._cache.move_to_end(key)
+                self._stats["cache_hits"] += 1
+            return text
+
+    def _remember(self, key, text):
+        with self._lock:
+            self._cache[key] = text
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+    def _run(self, key, ocr_fn):
+        text = ocr_fn()
+        self._remember(key, text)
+        with self._lock:
+            self._stats["images"] += 1
+        return text
+
+    def _submit(self, key, ocr_fn):
+        text = self._cached(key)
+        if text is None:
+            return self._pool().submit(self._run, key, ocr_fn)
+        future = Future()
+        future.set_result(text)
+        return future
+
+    def submit(self, data, dpi_hint=None):
+        """Start OCR of one encoded image; returns a future of its text."""
+        return self._submit(self._key(data), lambda: ocr_bytes(data, dpi_hint, self.lang))
+
+    def submit_page_image(self, img):
+        """Start OCR of an already rasterized, normalized page; returns a future of its text."""
+        key = self._key(img.tobytes() + f"{img.mode}{img.size}".encode())
+        return self._submit(key, lambda: pytesseract.image_to_string(img, lang=self.lang))
+
+    def ocr_image(self, data):
+        return self.submit(data).result()
+
+    def pdf_pages(self, reader, source):
+        """
+        Yield the text of each page of the PDF that `reader` (PyPDF2) has
+        opened from the seekable stream `source`, in order. Pages with a text
+        layer use it; scanned pages are rasterized and OCR'd, up to workers + 1
+        pages ahead of the one being yielded (rendered pages are held until
+        OCR'd, so the look-ahead bounds memory).
+        """
+        pending = []  # (text, future or None) in page order
+        document = None  # PDFium handle, opened at the first scanned page
+        try:
+            for index, page in enumerate(reader.pages):
+                text = page.extract_text() or ""
+                future = None
+                if len(text.strip()) < OCR_MIN_TEXT_CHARS:
+                    if document is None:
+                        document = pdfium.PdfDocument(source)
+                    future = self._scan(document, index)
+                pending.append((text, future))
+                while pending and (len(pending) > self.workers or pending[0][1] is None):
+                    yield self._page_text(*pending.pop(0))
+            while pending:
+                yield self._page_text(*pending.pop(0))
+        finally:
+            if document is not None:
+                document.close()
+
+    def _scan(self, document, index):
+        try:
+            page = document[index]
+            try:
+                img = render_page(page)
+            finally:
+                page.close()
+        except Exception as e:
+            logger.warning(f"Could not rasterize PDF page {index + 1}: {e}")
+            with self._lock:
+                self._stats["render_failures"] += 1
+            return None
+        with self._lock:
+            self._stats["scanned_pages"] += 1
+        return self.submit_page_image(img)
+
+    @staticmethod
+    def _page_text(text, future):
+        if future is None:
+            return text
+        ocr_text = future.result().strip()
+        # Keep whatever little text layer there was if OCR finds nothing
+        return ocr_text or text
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(cached=len(self._cache), workers=self.workers)
+        return stats
+
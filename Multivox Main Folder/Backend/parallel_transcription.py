@@ -0,0 +1,154 @@
+"""
+Process-parallel Whisper transcription for long media.
+
+One model.transcribe() call keeps a single process busy for the whole file.
+Here the decoded audio is cut at pauses into chunks of at most
+WHISPER_PARALLEL_CHUNK_SECONDS, the chunks are transcribed on a pool of
+worker processes (each with its own CPU copy of the model), and the results
+are stitched back into one segment list with global timestamps. Each chunk
+starts slightly before its cut so words on the boundary are not clipped;
+text that both neighbours transcribed is dropped from the later chunk.
+"""
+import os
+import re
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from transcription import SAMPLE_RATE, split_windows
+
+logger = logging.getLogger(__name__)
+
+# 0 disables the long-media mode
+PARALLEL_WORKERS = int(os.environ.get("WHISPER_PARALLEL_WORKERS", str(min(4, max(1, (os.cpu_count() or 1) // 2)))))
+PARALLEL_CHUNK_SECONDS = float(os.environ.get("WHISPER_PARALLEL_CHUNK_SECONDS", "120"))
+# Media shorter than this is transcribed in-process
+PARALLEL_MIN_SECONDS = float(os.environ.get("WHISPER_PARALLEL_MIN_SECONDS", "600"))
+# Audio before each cut that is fed to the later chunk as well
+CHUNK_OVERLAP_SECONDS = 1.0
+
+_worker_model = None
+
+
+def _init_worker(model_size, threads):
+    """Load a CPU-only model once per worker process."""
+    global _worker_model
+    os.environ["CUDA_VISIBLE_DEVICES"] = ""
+    import torch
+    import whisper
+    torch.set_num_threads(threads)
+    _worker_model = whisper.load_model(model_size, device="cpu")
+
+
+def _transcribe_chunk(offset, audio, options):
+    """Transcribe one chunk in a worker; returns segments with global timestamps."""
+    result = _worker_model.transcribe(audio, fp16=False, verbose=None, **options)
+    length = len(audio) / SAMPLE_RATE
+    return [{
+        "start": round(offset + min(seg["start"], length), 3),
+        "end": round(offset + min(seg["end"], length), 3),
+        "text": seg["text"],
+    } for seg in result.get("segments", [])]
+
+
+def _normalize(text):
+    return re.sub(r"\W+", " ", text).strip().lower()
+
+
+def stitch(chunks):
+    """
+    Merge per-chunk segment lists (in chunk order) into one list.
+    Segments that end before the text already kept, or that repeat the last
+    kept text across the boundary, are dropped; starts never go backwards.
+    """
+    stitched = []
+    for segments in chunks:
+        for seg in segments:
+            if stitched:
+                last = stitched[-1]
+                if seg["end"] <= last["end"]:
+                    continue
+                if _normalize(seg["text"]) == _normalize(last["text"]) and seg["start"] < last["end"] + CHUNK_OVERLAP_SECONDS:
+                    continue
+                if seg["start"] < last["end"]:
+                    seg = dict(seg, start=last["end"])
+            stitched.append(seg)
+    return stitched
+
+
+def parallelizes_duration(seconds, workers=PARALLEL_WORKERS):
+    """True for media this many seconds long, if it is worth the worker pool."""
+    return workers > 0 and seconds >= PARALLEL_MIN_SECONDS
+
+
+def should_parallelize(audio, workers=PARALLEL_WORKERS):
+    """True for decoded audio long enough to be worth the worker pool."""
+    return parallelizes_duration(len(audio) / SAMPLE_RATE, workers)
+
+
+class ParallelTranscriber:
+    """Pool of CPU Whisper worker processes for one model size."""
+
+    def __init__(self, model_size, workers=PARALLEL_WORKERS, chunk_seconds=PARALLEL_CHUNK_SECONDS):
+        self.model_size = model_size
+        self.workers = workers
+        self.chunk_seconds = chunk_seconds
+        self._executor = None
+
+    def _pool(self):
+        if self._executor is None:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            logger.info(f"Starting {self.workers} Whisper worker processes ({self.model_size}, {threads} threads each)")
+            # spawn: torch is not fork-safe once its thread pools are running
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_size, threads),
+            )
+        return self._executor
+
+    def should_use(self, audio):
+        return should_parallelize(audio, self.workers)
+
+    def chunks(self, audio):
+        """(offset_seconds, start, end) sample ranges, each widened by the overlap."""
+        overlap = int(CHUNK_OVERLAP_SECONDS * SAMPLE_RATE)
+        windows = split_windows(audio, max_seconds=self.chunk_seconds, min_seconds=self.chunk_seconds / 2)
+        return [(max(0, start - overlap) / SAMPLE_RATE, max(0, start - overlap), end) for start, end in windows]
+
+    def transcribe(self, audio, progress=None, **options):
+        """
+        Transcribe `audio` across the pool and return stitched segments.
+        progress(done_seconds, total_seconds) is called as chunks finish; if
+        it raises, chunks not yet started are cancelled and the error propagates.
+        """
+        chunks = self.chunks(audio)
+        total = len(audio) / SAMPLE_RATE
+        pool = self._pool()
+        futures = {
+            pool.submit(_transcribe_chunk, offset, audio[start:end], options): i
+            for i, (offset, start, end) in enumerate(chunks)
+        }
+        results = [None] * len(chunks)
+        done_seconds = 0.0
+        try:
+            for future in as_completed(futures):
+                i = futures[future]
+                results[i] = future.result()
+                _, start, end = chunks[i]
+                done_seconds += (end - start) / SAMPLE_RATE
+                if progress:
+                    progress(min(done_seconds, total), total)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        segments = stitch(results)
+        logger.info(f"Parallel transcription: {len(chunks)} chunks, {len(segments)} segments")
+        return segments
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,230 @@
+"""
+PDF rendering for /download_pdf.
+
+Text is wrapped by measured string width (reportlab's font metrics), not by
+character count, and laid out page by page: every page gets the template's
+header and content box and a "Page n of N" footer. Pages are written to a
+file as they are drawn and the file is streamed to the client, so a long
+translation is never held in memory as one PDF buffer.
+
+Rendered files are cached on disk under a hash of (text, source language,
+target language, template). The cache is bounded by PDF_CACHE_MAX_MB and
+PDF_CACHE_MAX_FILES; least recently used files are evicted first.
+"""
+import os
+import hashlib
+import logging
+import tempfile
+import threading
+import datetime as dt
+
+from reportlab.pdfgen import canvas
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.lib.pagesizes import letter
+
+logger = logging.getLogger(__name__)
+
+PDF_CACHE_DIR = os.environ.get("PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "multivox-pdf"))
+PDF_CACHE_MAX_BYTES = int(os.environ.get("PDF_CACHE_MAX_MB", "200")) * 1024 * 1024
+PDF_CACHE_MAX_FILES = int(os.environ.get("PDF_CACHE_MAX_FILES", "500"))
+# Bump when the layout changes so cached files are not reused
+LAYOUT_VERSION = "1"
+
+TEMPLATES = {
+    "default": {
+        "header": (0.2, 0.4, 0.6),    # Dark blue
+        "accent": (0.1, 0.7, 0.9),    # Light blue
+        "box": (0.95, 0.95, 0.97),    # Light gray background
+        "title": (1, 1, 1),
+        "font": "Helvetica",
+        "size": 12,
+        "leading": 15,
+    },
+    "plain": {
+        "header": None,
+        "accent": (0.6, 0.6, 0.6),
+        "box": None,
+        "title": (0.1, 0.1, 0.2),
+        "font": "Times-Roman",
+        "size": 12,
+        "leading": 15,
+    },
+}
+DEFAULT_TEMPLATE = "default"
+
+PAGE_WIDTH, PAGE_HEIGHT = letter
+TEXT_LEFT = 60
+TEXT_WIDTH = PAGE_WIDTH - 2 * TEXT_LEFT
+TEXT_TOP = PAGE_HEIGHT - 100
+TEXT_BOTTOM = 70
+TEXT_COLOR = (0.1, 0.1, 0.2)
+
+
+def _fit(word, font, size, max_width):
+    """Length of the longest prefix of `word` that fits in max_width (at least 1)."""
+    width = 0
+    for i, ch in enumerate(word):
+        width += stringWidth(ch, font, size)
+        if width > max_width:
+            return max(i, 1)
+    return len(word)
+
+
+def wrap_lines(text, font, size, max_width):
+    """Yield lines of `text` no wider than max_width; over-long words are broken."""
+    space = stringWidth(" ", font, size)
+    for paragraph in text.replace("\r", "").replace("\t", "    ").split("\n"):
+        line, line_width = "", 0
+        for word in paragraph.split(" "):
+            word_width = stringWidth(word, font, size)
+            if line and line_width + space + word_width <= max_width:
+                line, line_width = f"{line} {word}", line_width + space + word_width
+                continue
+            if line:
+                yield line
+            while word_width > max_width:
+                cut = _fit(word, font, size, max_width)
+                yield word[:cut]
+                word = word[cut:]
+                word_width = stringWidth(word, font, size)
+            line, line_width = word, word_width
+        yield line
+
+
+def _draw_page_frame(c, template, title, generated, page, pages):
+    width, height = PAGE_WIDTH, PAGE_HEIGHT
+    if template["header"]:
+        c.setFillColorRGB(*template["header"])
+        c.rect(0, height - 80, width, 80, fill=1, stroke=0)
+    c.setFillColorRGB(*template["title"])
+    c.setFont("Helvetica-Bold", 18)
+    c.drawString(72, height - 40, title)
+    c.setFont("Helvetica", 10)
+    c.drawString(width - 200, height - 40, f"Generated: {generated}")
+    if template["accent"]:
+        c.setStrokeColorRGB(*template["accent"])
+        c.setLineWidth(2)
+        c.line(72, height - 50, width - 72, height - 50)
+    if template["box"]:
+        c.setFillColorRGB(*template["box"])
+        c.rect(50, 50, width - 100, height - 170, fill=1, stroke=0)
+    c.setFont("Helvetica", 8)
+    c.setFillColorRGB(0.5, 0.5, 0.5)
+    c.drawString(72, 30, "Generated by Language Translator App")
+    c.drawRightString(width - 72, 30, f"Page {page} of {pages}")
+
+
+def render_pdf(path, text, source_lang, target_lang, template=DEFAULT_TEMPLATE):
+    """Write the translation to a PDF file at `path`; returns the page count."""
+    style = TEMPLATES[template]
+    lines = list(wrap_lines(text, style["font"], style["size"], TEXT_WIDTH))
+    per_page = int((TEXT_TOP - TEXT_BOTTOM) // style["leading"]) + 1
+    pages = max(1, -(-len(lines) // per_page))
+    title = f"Translation from {source_lang.upper()} to {target_lang.upper()}"
+    generated = dt.datetime.now().strftime('%Y-%m-%d %H:%M')
+
+    c = canvas.Canvas(path, pagesize=letter)
+    for page in range(pages):
+        _draw_page_frame(c, style, title, generated, page + 1, pages)
+        text_object = c.beginText(TEXT_LEFT, TEXT_TOP)
+        text_object.setFont(style["font"], style["size"], style["leading"])
+        text_object.setFillColorRGB(*TEXT_COLOR)
+        for line in lines[page * per_page:(page + 1) * per_page]:
+            text_object.textLine(line)
+        c.drawText(text_object)
+        c.showPage()
+    c.save()
+    return pages
+
+
+def pdf_key(text, source_lang, target_lang, template):
+    raw = "\x1f".join([LAYOUT_VERSION, template, source_lang, target_lang, text])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class PdfCache:
+    """Rendered PDFs on disk, keyed by content, bounded in size and count."""
+
+    def __init__(self, directory=PDF_CACHE_DIR, max_bytes=PDF_CACHE_MAX_BYTES, max_files=PDF_CACHE_MAX_FILES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._rendering = {}  # key -> lock, so identical requests render once
+        self._stats = {"hits": 0, "renders": 0, "evicted": 0}
+
+    def open(self, text, source_lang, target_lang, template=DEFAULT_TEMPLATE):
+        """
+        Return (open binary file, key, cached) for the rendered PDF. The file is
+        opened before it can be evicted, so the caller can always stream it.
+        """
+        if template not in TEMPLATES:
+            raise ValueError(f"Unknown template: {template}")
+        key = pdf_key(text, source_lang, target_lang, template)
+        path = os.path.join(self.directory, f"{key}.pdf")
+        f = self._open_cached(path)
+        if f:
+            return f, key, True
+        with self._lock:
+            render_lock = self._rendering.setdefault(key, threading.Lock())
+        try:
+            with render_lock:
+                f = self._open_cached(path)
+                if f:
+                    return f, key, True
+                part = f"{path}.part-{threading.get_ident()}"
+                try:
+                    pages = render_pdf(part, text, source_lang, target_lang, template)
+                    os.replace(part, path)
+                finally:
+                    if os.path.exists(part):
+                        os.remove(part)
+                f = open(path, "rb")
+        finally:
+            with self._lock:
+                self._rendering.pop(key, None)
+        with self._lock:
+            self._stats["renders"] += 1
+        logger.info(f"Rendered PDF {key[:12]} ({pages} pages)")
+        self.evict()
+        return f, key, False
+
+    def _open_cached(self, path):
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        with self._lock:
+            self._stats["hits"] += 1
+        return f
+
+    def evict(self):
+        """Drop least recently used PDFs until the cache is within its limits."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".pdf"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        while entries and (total > self.max_bytes or len(entries) > self.max_files):
+            _, size, name = entries.pop(0)
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            total -= size
+            with self._lock:
+                self._stats["evicted"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["files"] = sum(1 for name in os.listdir(self.directory) if name.endswith(".pdf"))
+        return stats
@@ -0,0 +1,174 @@
+"""
+Background job subsystem for long-running subtitle generation.
+
+Submitting returns a job id immediately; a bounded worker pool runs the
+pipeline while clients poll the job or subscribe to its progress. Jobs can be
+cancelled (the pipeline checks between steps and from its progress hooks),
+and finished jobs are kept for a retention window before being purged.
+"""
+import os
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.environ.get("SUBTITLE_JOB_WORKERS", "2"))
+JOB_RETENTION = float(os.environ.get("SUBTITLE_JOB_RETENTION", 3600))  # seconds
+
+QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED = "queued", "running", "completed", "failed", "cancelled"
+FINISHED = {COMPLETED, FAILED, CANCELLED}
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once cancellation has been requested."""
+
+
+class Job:
+    """State, progress and result of one submitted job."""
+
+    def __init__(self, kind):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.status = QUEUED
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.version = 0
+        self._cancel = threading.Event()
+        self._changed = threading.Condition()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def update(self, **progress):
+        """Merge progress fields and wake subscribers; raises JobCancelled if cancelled."""
+        with self._changed:
+            self.progress.update(progress)
+            self.version += 1
+            self._changed.notify_all()
+        self.check_cancelled()
+
+    def _request_cancel(self):
+        self._cancel.set()
+        with self._changed:
+            self.progress["cancelRequested"] = True
+            self.version += 1
+            self._changed.notify_all()
+
+    def _finish(self, status, result=None, error=None):
+        with self._changed:
+            self.status = status
+            self.result = result
+            self.error = error
+            self.finished_at = time.time()
+            self.version += 1
+            self._changed.notify_all()
+
+    def _set_status(self, status):
+        with self._changed:
+            self.status = status
+            self.version += 1
+            self._changed.notify_all()
+
+    def wait_for_change(self, seen_version, timeout):
+        """Block until the job changes past seen_version (or timeout); returns the new version."""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != seen_version, timeout)
+            return self.version
+
+    def to_dict(self, include_result=True):
+        data = {
+            "jobId": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": dict(self.progress),
+            "createdAt": self.created_at,
+            "finishedAt": self.finished_at,
+        }
+        if self.error:
+            data["error"] = self.error
+        if include_result and self.status == COMPLETED:
+            data["result"] = self.result
+        return data
+
+
+class JobManager:
+    """Bounded worker pool plus an in-memory job table with retention."""
+
+    def __init__(self, workers=JOB_WORKERS, retention=JOB_RETENTION):
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="subtitle-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, fn, *args, on_done=None, **kwargs):
+        """
+        Queue fn(job, *args, **kwargs); its return value becomes the job result.
+        on_done() is called when the job ends, however it ends (including a
+        cancel while still queued), before it is reported finished.
+        """
+        self.purge()
+        job = Job(kind)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, fn, args, kwargs, on_done)
+        return job
+
+    def _run(self, job, fn, args, kwargs, on_done=None):
+        status, result, error = CANCELLED, None, None
+        try:
+            if not job.cancelled:
+                job._set_status(RUNNING)
+                try:
+                    result = fn(job, *args, **kwargs)
+                    status = COMPLETED
+                except JobCancelled:
+                    logger.info(f"Job {job.id} cancelled")
+                except Exception as e:
+                    if not job.cancelled:
+                        logger.error(f"Job {job.id} failed: {e}", exc_info=True)
+                        status, error = FAILED, str(e)
+        finally:
+            # Cleanup runs before the job is reported finished
+            if on_done:
+                try:
+                    on_done()
+                except Exception as e:
+                    logger.error(f"Job {job.id} cleanup failed: {e}", exc_info=True)
+            job._finish(status, result=result, error=error)
+
+    def get(self, job_id):
+        self.purge()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job and job.status not in FINISHED:
+            job._request_cancel()
+        return job
+
+    def purge(self):
+        """Drop finished jobs older than the retention window."""
+        cutoff = time.time() - self.retention
+        with self._lock:
+            expired = [j for j in self._jobs.values() if j.finished_at and j.finished_at < cutoff]
+            for job in expired:
+                del self._jobs[job.id]
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
@@ -0,0 +1,200 @@
+"""
+Subtitle burn-in render stage.
+
+Burns an SRT into a stored video with ffmpeg's subtitles filter. Only the
+video is re-encoded (x264 with a speed/quality preset); the audio stream is
+copied as-is. Outputs are cached in the uploads folder under a key derived
+from (media hash, SRT hash, style, preset), so a repeated request returns
+the existing file without running ffmpeg.
+"""
+import os
+import re
+import hashlib
+import logging
+import threading
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+FFMPEG_PATH = os.environ.get("FFMPEG_PATH", "ffmpeg")
+FFPROBE_PATH = os.environ.get("FFPROBE_PATH", "ffprobe")
+RENDER_THREADS = int(os.environ.get("RENDER_THREADS", "0"))  # 0 lets x264 pick
+
+# x264 speed/quality trade-offs
+RENDER_PRESETS = {
+    "fast": {"preset": "veryfast", "crf": "26"},
+    "balanced": {"preset": "medium", "crf": "23"},
+    "quality": {"preset": "slow", "crf": "19"},
+}
+DEFAULT_RENDER_PRESET = os.environ.get("RENDER_PRESET", "fast")
+
+# ASS style fields accepted for force_style, with the values each may take
+STYLE_FIELDS = {
+    "FontName": re.compile(r"^[\w \-]{1,64}$"),
+    "FontSize": re.compile(r"^\d{1,3}$"),
+    "PrimaryColour": re.compile(r"^&H[0-9A-Fa-f]{6,8}&?$"),
+    "OutlineColour": re.compile(r"^&H[0-9A-Fa-f]{6,8}&?$"),
+    "BackColour": re.compile(r"^&H[0-9A-Fa-f]{6,8}&?$"),
+    "Bold": re.compile(r"^-?[01]$"),
+    "BorderStyle": re.compile(r"^[13]$"),
+    "Outline": re.compile(r"^\d{1,2}$"),
+    "Shadow": re.compile(r"^\d{1,2}$"),
+    "Alignment": re.compile(r"^[1-9]$"),
+    "MarginV": re.compile(r"^\d{1,3}$"),
+}
+
+HASH_MEMO_SIZE = 1024
+_hash_memo = {}
+_hash_lock = threading.Lock()
+
+
+class RenderError(Exception):
+    """Raised when ffmpeg fails to render the burned-in output."""
+
+
+def normalize_style(style):
+    """Validate a style dict against STYLE_FIELDS; returns it with sorted keys and string values."""
+    style = style or {}
+    normalized = {}
+    for key, value in style.items():
+        pattern = STYLE_FIELDS.get(key)
+        value = str(value)
+        if pattern is None or not pattern.match(value):
+            raise ValueError(f"Invalid subtitle style {key}={value!r}")
+        normalized[key] = value
+    return dict(sorted(normalized.items()))
+
+
+def file_hash(path):
+    """SHA-256 of a file, memoized on (path, size, mtime)."""
+    st = os.stat(path)
+    memo_key = (path, st.st_size, st.st_mtime_ns)
+    with _hash_lock:
+        if memo_key in _hash_memo:
+            return _hash_memo[memo_key]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    with _hash_lock:
+        if len(_hash_memo) >= HASH_MEMO_SIZE:
+            _hash_memo.clear()
+        _hash_memo[memo_key] = digest.hexdigest()
+    return digest.hexdigest()
+
+
+def render_key(media_hash, srt, style, preset):
+    srt_hash = hashlib.sha256(srt.encode("utf-8")).hexdigest()
+    raw = "|".join([media_hash, srt_hash, repr(sorted(style.items())), preset])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def probe_duration(path, ffprobe_path=FFPROBE_PATH):
+    """Media duration in seconds, or None if ffprobe cannot tell."""
+    try:
+        out = subprocess.run(
+            [ffprobe_path, "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path],
+            capture_output=True, text=True, timeout=30,
+        ).stdout.strip()
+        return float(out) if out else None
+    except (OSError, ValueError, subprocess.TimeoutExpired):
+        return None
+
+
+def filter_path(path):
+    """Escape a path for use inside an ffmpeg filter argument."""
+    return path.replace("\\", "/").replace(":", "\\:").replace("'", "\\'")
+
+
+def subtitles_filter(srt_path, style):
+    value = f"subtitles='{filter_path(srt_path)}'"
+    if style:
+        value += ":force_style='" + ",".join(f"{k}={v}" for k, v in style.items()) + "'"
+    return value
+
+
+def burn_cmd(media_path, srt_path, output_path, style, preset, audio_codec="copy", ffmpeg_path=FFMPEG_PATH):
+    settings = RENDER_PRESETS[preset]
+    cmd = [
+        ffmpeg_path, "-hide_banner", "-nostats", "-y",
+        "-i", media_path,
+        "-vf", subtitles_filter(srt_path, style),
+        "-c:v", "libx264", "-preset", settings["preset"], "-crf", settings["crf"],
+        "-c:a", audio_codec,
+        "-movflags", "+faststart",
+        "-progress", "pipe:1",
+    ]
+    if RENDER_THREADS:
+        cmd += ["-threads", str(RENDER_THREADS)]
+    return cmd + ["-f", "mp4", output_path]
+
+
+def run_ffmpeg(cmd, duration=None, progress=None):
+    """
+    Run ffmpeg, calling progress(seconds_done, duration) from its -progress
+    output. If progress raises, ffmpeg is killed and the error propagates.
+    """
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    stderr_tail = []
+
+    def drain_stderr():
+        for line in proc.stderr:
+            stderr_tail.append(line)
+            del stderr_tail[:-20]
+
+    drainer = threading.Thread(target=drain_stderr, daemon=True)
+    drainer.start()
+    try:
+        for line in proc.stdout:
+            key, _, value = line.strip().partition("=")
+            if key == "out_time_us" and value.isdigit() and progress:
+                progress(int(value) / 1_000_000, duration)
+        proc.wait()
+    except BaseException:
+        proc.kill()
+        proc.wait()
+        raise
+    finally:
+        drainer.join(timeout=5)
+    if proc.returncode != 0:
+        raise RenderError("".join(stderr_tail).strip() or f"ffmpeg exited with {proc.returncode}")
+
+
+def burn_subtitles(media_path, srt, output_dir, style=None, preset=DEFAULT_RENDER_PRESET, progress=None):
+    """
+    Burn `srt` into the video at media_path and return (output_filename, cached).
+    progress(seconds_done, duration_seconds) is called while ffmpeg runs.
+    """
+    if preset not in RENDER_PRESETS:
+        raise ValueError(f"Unknown render preset: {preset}")
+    style = normalize_style(style)
+    key = render_key(file_hash(media_path), srt, style, preset)
+    output_filename = f"burned-{key[:32]}.mp4"
+    output_path = os.path.join(output_dir, output_filename)
+    if os.path.exists(output_path):
+        logger.info(f"Render cache hit: {output_filename}")
+        return output_filename, True
+
+    # Per-thread scratch names, so identical concurrent renders do not collide
+    scratch = f"burned-{key[:32]}.part-{threading.get_ident()}"
+    srt_path = os.path.join(output_dir, f"{scratch}.srt")
+    part_path = os.path.join(output_dir, f"{scratch}.mp4")
+    with open(srt_path, "w", encoding="utf-8") as f:
+        f.write(srt)
+    duration = probe_duration(media_path)
+    try:
+        try:
+            run_ffmpeg(burn_cmd(media_path, srt_path, part_path, style, preset), duration, progress)
+        except RenderError as e:
+            # Some source audio codecs cannot be copied into MP4; re-encode only then
+            logger.info(f"Audio stream copy failed, re-encoding audio: {str(e)[-200:]}")
+            run_ffmpeg(burn_cmd(media_path, srt_path, part_path, style, preset, audio_codec="aac"), duration, progress)
+        os.replace(part_path, output_path)
+    finally:
+        for path in (srt_path, part_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    logger.info(f"Rendered {output_filename}")
+    return output_filename, False
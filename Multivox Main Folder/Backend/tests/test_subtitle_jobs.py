@@ -0,0 +1,53 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from subtitle_jobs import JobManager, CANCELLED, COMPLETED
+from upload_storage import UploadStorage
+
+
+class JobCleanupTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.storage = UploadStorage(self.dir.name)
+        self.jobs = JobManager(workers=1)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def wait_finished(self, job):
+        version = job.version
+        while job.finished_at is None:
+            version = job.wait_for_change(version, timeout=5)
+
+    def test_cancelled_while_queued_releases_pin(self):
+        gate = threading.Event()
+        blocker = self.jobs.submit("block", lambda job: gate.wait(5))
+        self.storage.pin("upload.mp4")
+        ran = []
+        queued = self.jobs.submit("subtitles", lambda job: ran.append(True),
+                                  on_done=lambda: self.storage.release("upload.mp4"))
+        self.jobs.cancel(queued.id)
+        gate.set()
+        self.wait_finished(blocker)
+        self.wait_finished(queued)
+
+        self.assertEqual(queued.status, CANCELLED)
+        self.assertEqual(ran, [])
+        self.assertEqual(self.storage.stats()["pinned"], 0)
+
+    def test_completed_job_releases_pin(self):
+        self.storage.pin("upload.mp4")
+        job = self.jobs.submit("subtitles", lambda job: "ok", on_done=lambda: self.storage.release("upload.mp4"))
+        self.wait_finished(job)
+
+        self.assertEqual(job.status, COMPLETED)
+        self.assertEqual(self.storage.stats()["pinned"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+"""
+Persistent Whisper transcript cache.
+
+Transcripts are keyed by a hash of the decoded audio plus the model size and
+Whisper options, so re-uploads of the same media (in any container) and
+requests for a different target language skip Whisper entirely. Video URLs
+are mapped to the content hash of what they downloaded, so repeated URLs
+skip the download too. Segments are stored as zlib-compressed JSON rows in
+SQLite, and the least recently used transcripts are evicted once the cache
+exceeds its byte budget.
+"""
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPT_CACHE_DB = os.environ.get("TRANSCRIPT_CACHE_DB", "transcripts.db")
+TRANSCRIPT_CACHE_MAX_BYTES = int(os.environ.get("TRANSCRIPT_CACHE_MAX_BYTES", 256 * 1024 * 1024))  # 256 MB
+
+
+def audio_fingerprint(audio):
+    """Content hash of decoded audio (a numpy array or raw bytes)."""
+    data = audio.tobytes() if hasattr(audio, "tobytes") else audio
+    return hashlib.sha256(data).hexdigest()
+
+
+def transcript_key(content_hash, model_size, options):
+    raw = json.dumps([content_hash, model_size, options], sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def pack_segments(segments):
+    rows = [[round(s["start"], 3), round(s["end"], 3), s["text"]] for s in segments]
+    return zlib.compress(json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def unpack_segments(blob):
+    return [{"start": start, "end": end, "text": text}
+            for start, end, text in json.loads(zlib.decompress(blob).decode("utf-8"))]
+
+
+class TranscriptCache:
+    """SQLite-backed transcript store with URL mapping and LRU size eviction."""
+
+    def __init__(self, db_path=TRANSCRIPT_CACHE_DB, max_bytes=TRANSCRIPT_CACHE_MAX_BYTES):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "url_hits": 0, "evictions": 0}
+        self._init_db()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS transcripts (
+            key TEXT PRIMARY KEY,
+            content_hash TEXT,
+            model_size TEXT,
+            segments BLOB,
+            size INTEGER,
+            created_at REAL,
+            last_access REAL
+        )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_transcripts_last_access ON transcripts(last_access)")
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS media_urls (
+            url TEXT PRIMARY KEY,
+            content_hash TEXT,
+            media_filename TEXT,
+            created_at REAL,
+            duration REAL
+        )
+        """)
+        if "duration" not in {row["name"] for row in conn.execute("PRAGMA table_info(media_urls)")}:
+            conn.execute("ALTER TABLE media_urls ADD COLUMN duration REAL")
+        conn.commit()
+        conn.close()
+
+    def get(self, content_hash, model_size, options):
+        """Return cached segments or None."""
+        key = transcript_key(content_hash, model_size, options)
+        conn = self._connect()
+        row = conn.execute("SELECT segments FROM transcripts WHERE key=?", (key,)).fetchone()
+        if row:
+            conn.execute("UPDATE transcripts SET last_access=? WHERE key=?", (time.time(), key))
+            conn.commit()
+        conn.close()
+        with self._lock:
+            self._stats["hits" if row else "misses"] += 1
+        return unpack_segments(row["segments"]) if row else None
+
+    def put(self, content_hash, model_size, options, segments):
+        key = transcript_key(content_hash, model_size, options)
+        blob = pack_segments(segments)
+        now = time.time()
+        conn = self._connect()
+        conn.execute("""
+            INSERT OR REPLACE INTO transcripts(key, content_hash, model_size, segments, size, created_at, last_access)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (key, content_hash, model_size, blob, len(blob), now, now))
+        conn.commit()
+        self._evict(conn)
+        conn.close()
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM transcripts").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for row in conn.execute("SELECT key, size FROM transcripts ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM transcripts WHERE key=?", (row["key"],))
+            total -= row["size"]
+            evicted += 1
+        # URLs whose transcripts are all gone would only cost a lookup
+        conn.execute("DELETE FROM media_urls WHERE content_hash NOT IN (SELECT content_hash FROM transcripts)")
+        conn.commit()
+        with self._lock:
+            self._stats["evictions"] += evicted
+
+    def remember_url(self, url, content_hash, media_filename, duration=None):
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO media_urls(url, content_hash, media_filename, created_at, duration) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (url, content_hash, media_filename, time.time(), duration),
+        )
+        conn.commit()
+        conn.close()
+
+    def lookup_url(self, url):
+        """
+        Return (content_hash, media_filename, duration) for a previously
+        downloaded URL, or None. duration (seconds) is None for older rows.
+        """
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT content_hash, media_filename, duration FROM media_urls WHERE url=?", (url,)
+        ).fetchone()
+        conn.close()
+        if row:
+            with self._lock:
+                self._stats["url_hits"] += 1
+            return row["content_hash"], row["media_filename"], row["duration"]
+        return None
+
+    def stats(self):
+        conn = self._connect()
+        entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transcripts").fetchone()
+        conn.close()
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats.update(
+            entries=entries,
+            bytes=total,
+            max_bytes=self.max_bytes,
+            hit_ratio=round(stats["hits"] / lookups, 4) if lookups else 0.0,
+        )
+        return stats
@@ -0,0 +1,71 @@
+"""
+Windowed Whisper transcription.
+
+model.transcribe() only returns once the whole file is done. Here the decoded
+audio is cut at pauses into windows of at most WHISPER_WINDOW_MAX_SECONDS
+(Whisper's own context is 30 s), each window is transcribed on its own with
+the tail of the previous text as prompt, and its segments are yielded with
+global timestamps as soon as the window finishes. Later stages can then work
+on the start of a file while Whisper is still on the rest of it.
+"""
+import os
+import logging
+
+import numpy as np
+import whisper
+
+from vad import split_on_silence
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = whisper.audio.SAMPLE_RATE  # 16 kHz
+WINDOW_MAX_SECONDS = float(os.environ.get("WHISPER_WINDOW_MAX_SECONDS", "30"))
+WINDOW_MIN_SECONDS = float(os.environ.get("WHISPER_WINDOW_MIN_SECONDS", "10"))
+# Characters of previous text passed as initial_prompt to keep context across windows
+PROMPT_CHARS = 200
+
+
+def load_audio(media_path):
+    """Decode any media file to 16 kHz mono float32 (via Whisper's ffmpeg loader)."""
+    return whisper.load_audio(media_path)
+
+
+def audio_to_pcm16(audio):
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+def split_windows(audio, max_seconds=WINDOW_MAX_SECONDS, min_seconds=WINDOW_MIN_SECONDS):
+    """Return (start, end) sample ranges cut at pauses; silent stretches are skipped."""
+    spans = split_on_silence(audio_to_pcm16(audio), sample_rate=SAMPLE_RATE,
+                             max_chunk_s=max_seconds, min_chunk_s=min_seconds)
+    return [(start // 2, end // 2) for start, end in spans]
+
+
+def transcribe_windows(model, audio, windows, lock=None, stop=None, **options):
+    """
+    Transcribe `windows` of `audio` in order, yielding (window_end_seconds,
+    segments) after each one. `lock` guards the shared model per window, so
+    other transcriptions can interleave; setting the `stop` event ends the
+    generator before the next window.
+    """
+    prompt = None
+    for start, end in windows:
+        if stop is not None and stop.is_set():
+            return
+        offset = start / SAMPLE_RATE
+        length = (end - start) / SAMPLE_RATE
+        window_options = dict(options, initial_prompt=prompt)
+        if lock is not None:
+            with lock:
+                result = model.transcribe(audio[start:end], **window_options)
+        else:
+            result = model.transcribe(audio[start:end], **window_options)
+        segments = [{
+            "start": round(offset + min(seg["start"], length), 3),
+            "end": round(offset + min(seg["end"], length), 3),
+            "text": seg["text"],
+        } for seg in result.get("segments", [])]
+        text = "".join(seg["text"] for seg in segments).strip()
+        if text:
+            prompt = text[-PROMPT_CHARS:]
+        yield offset + length, segments
@@ -0,0 +1,154 @@
+"""
+Batch translation helpers.
+
+Many short strings are translated with few remote calls. Identical strings
+are translated once, cached strings skip the provider, and the rest are
+packed into provider-sized requests joined by numbered delimiters. The packs
+fan out on a bounded executor and are split back onto the original items.
+A pack that fails or comes back with mangled delimiters is retried one item
+at a time, so one bad item only fails itself.
+"""
+import os
+import re
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# deep_translator / googletrans reject requests above 5000 characters
+PACK_MAX_CHARS = int(os.environ.get("TRANSLATE_PACK_MAX_CHARS", "4500"))
+PACK_MAX_ITEMS = int(os.environ.get("TRANSLATE_PACK_MAX_ITEMS", "50"))
+BATCH_WORKERS = int(os.environ.get("TRANSLATE_BATCH_WORKERS", "8"))
+
+# Numbered markers survive machine translation far better than plain newlines
+DELIMITER = "\n[[{}]]\n"
+DELIMITER_RE = re.compile(r"\s*\[\[\s*(\d+)\s*\]\]\s*")
+
+_default_executor = None
+
+
+class PackSplitError(Exception):
+    """Raised when a packed translation cannot be split back into items."""
+
+
+def default_executor():
+    global _default_executor
+    if _default_executor is None:
+        _default_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="translate-batch")
+    return _default_executor
+
+
+def pack(texts, max_chars=PACK_MAX_CHARS, max_items=PACK_MAX_ITEMS):
+    """
+    Group texts into provider-sized packs.
+    Returns a list of lists of indices into `texts`, preserving order.
+    """
+    packs = []
+    current = []
+    size = 0
+    for i, text in enumerate(texts):
+        cost = len(text) + len(DELIMITER) + 4
+        if current and (size + cost > max_chars or len(current) >= max_items):
+            packs.append(current)
+            current = []
+            size = 0
+        current.append(i)
+        size += cost
+    if current:
+        packs.append(current)
+    return packs
+
+
+def join_pack(texts):
+    return "".join(DELIMITER.format(i) + text for i, text in enumerate(texts)).strip()
+
+
+def pack_items(packed):
+    """The source texts of a request built by join_pack (or [packed] for a single item)."""
+    parts = DELIMITER_RE.split(packed)
+    if len(parts) == 1:
+        return [packed]
+    return [t.strip() for t in parts[2::2]]
+
+
+def split_pack(translated, count):
+    """Split a packed translation; raises PackSplitError unless markers 0..count-1 all come back in order."""
+    parts = DELIMITER_RE.split(translated or "")
+    # parts = [prefix, n0, text0, n1, text1, ...]
+    if parts[0].strip():
+        raise PackSplitError("text before first delimiter")
+    numbers = [int(n) for n in parts[1::2]]
+    if numbers != list(range(count)):
+        raise PackSplitError(f"expected {count} delimiters, got {numbers[:10]}")
+    return [t.strip() for t in parts[2::2]]
+
+
+def translate_pack(texts, translate_fn):
+    """Translate several texts in one request; falls back to one request per text."""
+    if len(texts) == 1:
+        return [(translate_fn(texts[0]), None)]
+    try:
+        return [(t, None) for t in split_pack(translate_fn(join_pack(texts)), len(texts))]
+    except Exception as e:
+        logger.info(f"Packed translation of {len(texts)} items failed ({e}); retrying individually")
+    results = []
+    for text in texts:
+        try:
+            results.append((translate_fn(text), None))
+        except Exception as e:
+            results.append((None, str(e)))
+    return results
+
+
+def translate_texts(texts, translate_fn, lookup=None, store=None, executor=None,
+                    max_chars=PACK_MAX_CHARS, max_items=PACK_MAX_ITEMS, progress=None):
+    """
+    Translate a list of strings for one (source, target) pair.
+
+    translate_fn(text) -> str performs one remote request and must not cache
+    its input, which may be a whole pack; lookup(text) and
+    store(text, translation) read/write the cache per item. progress(done, total)
+    is called with unique-text counts as packs complete; if it raises, the
+    packs not yet started are cancelled and the exception propagates.
+    Returns a list of (translation, error) tuples in input order, plus a
+    stats dict.
+    """
+    unique = list(dict.fromkeys(t.strip() for t in texts))
+    resolved = {}
+    for text in unique:
+        if not text:
+            resolved[text] = ("", None)
+            continue
+        hit = lookup(text) if lookup else None
+        if hit is not None:
+            resolved[text] = (hit, None)
+    pending = [t for t in unique if t not in resolved]
+
+    packs = [[pending[i] for i in p] for p in pack(pending, max_chars, max_items)]
+    if packs:
+        executor = executor or default_executor()
+        futures = [executor.submit(translate_pack, p, translate_fn) for p in packs]
+        try:
+            for items, future in zip(packs, futures):
+                try:
+                    outcomes = future.result()
+                except Exception as e:
+                    outcomes = [(None, str(e))] * len(items)
+                for text, (translation, error) in zip(items, outcomes):
+                    resolved[text] = (translation, error)
+                    if error is None and store:
+                        store(text, translation)
+                if progress:
+                    progress(len(resolved), len(unique))
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+    stats = {
+        "items": len(texts),
+        "unique": len(unique),
+        "cached": len(unique) - len(pending),
+        "requests": len(packs),
+    }
+    return [resolved[t.strip()] for t in texts], stats
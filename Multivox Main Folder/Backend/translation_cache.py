@@ -0,0 +1,250 @@
+"""
+Content-addressed translation cache shared by Audio.py, Subtitle.py and
+Lang_translator.py.
+
+Entries are keyed on (normalized text, source lang, target lang, provider);
+normalization keeps line breaks, so multi-line text keeps its own entries.
+A size-bounded in-memory LRU sits in front of an optional persistent tier
+stored in translator.db, so all three services share results across restarts.
+The persistent tier is bounded too: every TRANSLATION_CACHE_SWEEP_WRITES
+writes, expired rows are deleted and then the least recently used ones until
+the table is within TRANSLATION_CACHE_DB_MAX_BYTES.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+CACHE_MAX_BYTES = int(os.environ.get("TRANSLATION_CACHE_MAX_BYTES", 32 * 1024 * 1024))  # 32 MB
+CACHE_TTL = float(os.environ.get("TRANSLATION_CACHE_TTL", 7 * 24 * 3600))  # seconds, <= 0 disables expiry
+CACHE_DB_PATH = os.environ.get("TRANSLATION_CACHE_DB", "translator.db")  # empty string disables persistence
+CACHE_DB_MAX_BYTES = int(os.environ.get("TRANSLATION_CACHE_DB_MAX_BYTES", 256 * 1024 * 1024))  # 256 MB
+CACHE_SWEEP_WRITES = int(os.environ.get("TRANSLATION_CACHE_SWEEP_WRITES", "100"))
+
+
+def normalize_text(text):
+    """
+    Canonical form used for cache keys: NFC, trimmed, runs of spaces and tabs
+    collapsed. Line breaks are kept, so "A\nB" and "A B" are different keys.
+    """
+    text = unicodedata.normalize("NFC", text or "").replace("\r\n", "\n").replace("\r", "\n")
+    return "\n".join(" ".join(line.split()) for line in text.split("\n")).strip()
+
+
+def make_key(text, source, target, provider):
+    raw = "\x1f".join([provider, source or "auto", target, normalize_text(text)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+    """Two-tier (memory LRU + SQLite) translation cache with per-entry TTLs."""
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES, default_ttl=CACHE_TTL, db_path=CACHE_DB_PATH,
+                 db_max_bytes=CACHE_DB_MAX_BYTES, sweep_writes=CACHE_SWEEP_WRITES):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.db_path = db_path or None
+        self.db_max_bytes = db_max_bytes
+        self.sweep_writes = sweep_writes
+        self._entries = OrderedDict()  # key -> (value, expires_at, size)
+        self._bytes = 0
+        self._writes = 0  # persistent writes since the last sweep
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "persistent_hits": 0, "misses": 0, "evictions": 0,
+                       "persistent_expired": 0, "persistent_evictions": 0}
+        if self.db_path:
+            self._init_db()
+
+    # ---------- Persistent tier ----------
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def _init_db(self):
+        try:
+            conn = self._connect()
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS translation_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT,
+                expires_at REAL,
+                created_at REAL,
+                size INTEGER,
+                last_access REAL
+            )
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(translation_cache)")}
+            if "size" not in columns:
+                # Tables created before the size bound: backfill from the stored rows
+                conn.execute("ALTER TABLE translation_cache ADD COLUMN size INTEGER")
+                conn.execute("ALTER TABLE translation_cache ADD COLUMN last_access REAL")
+                conn.execute("UPDATE translation_cache SET size = LENGTH(key) + LENGTH(value), last_access = created_at")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_translation_cache_last_access ON translation_cache(last_access)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_translation_cache_expires_at ON translation_cache(expires_at)")
+            conn.commit()
+            conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Translation cache persistence disabled: {e}")
+            self.db_path = None
+
+    def _db_get(self, key):
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, expires_at FROM translation_cache WHERE key=?", (key,)
+            ).fetchone()
+            now = time.time()
+            if row and row[1] is not None and row[1] <= now:
+                conn.execute("DELETE FROM translation_cache WHERE key=?", (key,))
+                conn.commit()
+                row = None
+            elif row:
+                conn.execute("UPDATE translation_cache SET last_access=? WHERE key=?", (now, key))
+                conn.commit()
+            conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Translation cache read failed: {e}")
+            return None
+        if not row:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def _db_set(self, key, payload, expires_at):
+        try:
+            now = time.time()
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO translation_cache(key, value, expires_at, created_at, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, payload, expires_at, now, len(key) + len(payload), now),
+            )
+            conn.commit()
+            with self._lock:
+                self._writes += 1
+                sweep = self._writes >= self.sweep_writes
+                if sweep:
+                    self._writes = 0
+            if sweep:
+                self._sweep(conn)
+            conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Translation cache write failed: {e}")
+
+    def _sweep(self, conn):
+        """Delete expired rows, then least recently used ones until within db_max_bytes."""
+        expired = conn.execute(
+            "DELETE FROM translation_cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+        ).rowcount
+        # Keep the most recently used rows whose running total fits the budget
+        evicted = conn.execute("""
+            DELETE FROM translation_cache WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, SUM(size) OVER (ORDER BY last_access DESC, key) AS running
+                    FROM translation_cache
+                ) WHERE running > ?
+            )
+        """, (self.db_max_bytes,)).rowcount
+        conn.commit()
+        with self._lock:
+            self._stats["persistent_expired"] += expired
+            self._stats["persistent_evictions"] += evicted
+        if expired or evicted:
+            logger.info(f"Translation cache sweep: {expired} expired, {evicted} evicted")
+
+    def sweep(self):
+        """Run the persistent-tier sweep now."""
+        if not self.db_path:
+            return
+        try:
+            conn = self._connect()
+            self._sweep(conn)
+            conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Translation cache sweep failed: {e}")
+
+    # ---------- Memory tier ----------
+    def _remember(self, key, value, expires_at, size):
+        # Entries larger than an eighth of the budget would flush everything else
+        if size > self.max_bytes // 8:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old:
+                self._bytes -= old[2]
+            self._entries[key] = (value, expires_at, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._stats["evictions"] += 1
+
+    # ---------- Public API ----------
+    def get(self, text, source, target, provider):
+        """Return the cached value or None."""
+        key = make_key(text, source, target, provider)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                value, expires_at, size = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return value
+                del self._entries[key]
+                self._bytes -= size
+        if self.db_path:
+            found = self._db_get(key)
+            if found:
+                value, expires_at = found
+                self._remember(key, value, expires_at, len(key) + len(json.dumps(value)))
+                with self._lock:
+                    self._stats["persistent_hits"] += 1
+                return value
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def set(self, text, source, target, provider, value, ttl=None):
+        """Store a JSON-serializable value; ttl=None uses the default TTL."""
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl and ttl > 0 else None
+        key = make_key(text, source, target, provider)
+        payload = json.dumps(value)
+        self._remember(key, value, expires_at, len(key) + len(payload))
+        if self.db_path:
+            self._db_set(key, payload, expires_at)
+
+    def get_or_translate(self, text, source, target, provider, translate_fn, ttl=None):
+        """
+        Return the cached translation, calling translate_fn() on a miss.
+        Exceptions from translate_fn propagate and nothing is cached.
+        """
+        value = self.get(text, source, target, provider)
+        if value is None:
+            value = translate_fn()
+            if value is not None:
+                self.set(text, source, target, provider, value, ttl)
+        return value
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+            stats["max_bytes"] = self.max_bytes
+            stats["db_max_bytes"] = self.db_max_bytes
+        lookups = stats["memory_hits"] + stats["persistent_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((lookups - stats["misses"]) / lookups, 4) if lookups else 0.0
+        stats["persistent"] = bool(self.db_path)
+        return stats
+
+
+# Shared per-process instance
+translation_cache = TranslationCache()
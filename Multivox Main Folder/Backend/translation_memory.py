@@ -0,0 +1,267 @@
+"""
+Translation memory over the phrasebook and saved translations.
+
+Past translations are held in memory under two indexes per target language:
+  - exact: normalized source text -> translation
+  - fuzzy: character trigram -> entries, scored with the Dice coefficient
+A lookup returns the exact hit if there is one, otherwise the best fuzzy
+match scoring at least TM_FUZZY_THRESHOLD. Only exact hits may be used as a
+translation: a fuzzy match can differ by a negation ("should not take") and
+still score high, so callers offer it as a suggestion and still ask the
+provider. Fuzzy matches must also contain the same numbers as the query.
+Rows written to translator.db by other processes are picked up
+incrementally every TM_REFRESH_SECONDS.
+
+Phrasebook entries are curated: they override anything learned and are never
+evicted. From history only raw provider output is learned (the raw_text of
+rows with origin 'provider'), never text rewritten by the domain/style
+helpers or served from memory. Learned entries are evicted least recently
+used first once TM_MAX_ENTRIES is reached.
+"""
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+from collections import namedtuple, Counter, OrderedDict
+
+from translation_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+TM_FUZZY_THRESHOLD = float(os.environ.get("TM_FUZZY_THRESHOLD", "0.9"))
+# Fuzzy matching is meant for sentence-sized text; longer text is exact-only
+TM_FUZZY_MAX_CHARS = int(os.environ.get("TM_FUZZY_MAX_CHARS", "500"))
+TM_MAX_ENTRIES = int(os.environ.get("TM_MAX_ENTRIES", "200000"))
+TM_REFRESH_SECONDS = float(os.environ.get("TM_REFRESH_SECONDS", "60"))
+TM_DB_PATH = os.environ.get("TRANSLATION_MEMORY_DB", "translator.db")
+NGRAM = 3
+# Trigrams shared by more entries than this are too common to narrow the search
+MAX_POSTING = 5000
+
+NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+
+# Provenance of a translations row (translations.origin)
+ORIGIN_PROVIDER = "provider"
+ORIGIN_MEMORY = "memory"
+
+MemoryMatch = namedtuple("MemoryMatch", ["translation", "score", "kind", "source_text", "source_lang"])
+
+
+def fuzzy_key(text):
+    return normalize_text(text).lower()
+
+
+def ngrams(text):
+    padded = f" {text} "
+    return Counter(padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1))
+
+
+class _Entry:
+    __slots__ = ("id", "target", "source_text", "source_lang", "translation", "key", "grams", "size", "numbers")
+
+    def __init__(self, entry_id, target, source_text, source_lang, translation):
+        self.id = entry_id
+        self.target = target
+        self.source_text = source_text
+        self.source_lang = source_lang
+        self.translation = translation
+        self.key = fuzzy_key(source_text)
+        self.grams = ngrams(self.key)
+        self.size = sum(self.grams.values())
+        self.numbers = NUMBER_RE.findall(source_text)
+
+
+class TranslationMemory:
+    """Exact + trigram-fuzzy lookup of previous translations, per target language."""
+
+    def __init__(self, threshold=TM_FUZZY_THRESHOLD, max_entries=TM_MAX_ENTRIES, db_path=None,
+                 refresh_seconds=TM_REFRESH_SECONDS):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._exact = {}              # (normalized text, target) -> _Entry
+        self._learned = OrderedDict()  # keys of evictable entries, least recently used first
+        self._entries = {}            # target -> entry id -> fuzzy-indexed _Entry
+        self._postings = {}           # target -> trigram -> {entry id}
+        self._next_id = 0
+        self._loaded_until = {"phrasebook": "", "translations": ""}
+        self._last_refresh = 0.0
+        self._stats = {"exact_hits": 0, "fuzzy_hits": 0, "misses": 0, "evicted": 0}
+
+    def add(self, source_text, target_lang, translation, source_lang=None, curated=False):
+        """
+        Remember a translation. Curated (phrasebook) entries replace whatever is
+        stored for the text and are never evicted; learned entries never replace
+        an existing entry.
+        """
+        source_text = (source_text or "").strip()
+        if not source_text or not translation or not target_lang:
+            return
+        key = (normalize_text(source_text), target_lang)
+        source_lang = source_lang if source_lang not in (None, "auto") else None
+        with self._lock:
+            existing = self._exact.get(key)
+            if existing:
+                if curated:
+                    # Updated in place so the fuzzy index sees the new translation too
+                    existing.translation, existing.source_lang = translation, source_lang
+                    self._learned.pop(key, None)
+                else:
+                    self._touch(key)
+                return
+            entry = _Entry(self._next_id, target_lang, source_text, source_lang, translation)
+            self._next_id += 1
+            self._exact[key] = entry
+            if not curated:
+                self._learned[key] = None
+            if len(entry.key) <= TM_FUZZY_MAX_CHARS:
+                self._entries.setdefault(target_lang, {})[entry.id] = entry
+                postings = self._postings.setdefault(target_lang, {})
+                for gram in entry.grams:
+                    postings.setdefault(gram, set()).add(entry.id)
+            while len(self._exact) > self.max_entries and self._learned:
+                self._evict(self._learned.popitem(last=False)[0])
+
+    def _touch(self, key):
+        if key in self._learned:
+            self._learned.move_to_end(key)
+
+    def _evict(self, key):
+        entry = self._exact.pop(key)
+        entries = self._entries.get(entry.target, {})
+        if entries.pop(entry.id, None) is not None:
+            postings = self._postings[entry.target]
+            for gram in entry.grams:
+                ids = postings.get(gram)
+                if ids is not None:
+                    ids.discard(entry.id)
+                    if not ids:
+                        del postings[gram]
+        self._stats["evicted"] += 1
+
+    def lookup(self, text, target_lang, source_lang=None, fuzzy=True):
+        """
+        Return a MemoryMatch or None. Only kind == "exact" may be used as the
+        translation; a fuzzy match is a suggestion. fuzzy=False skips the
+        fuzzy search.
+        """
+        self.refresh_if_stale()
+        text = (text or "").strip()
+        if not text:
+            return None
+        with self._lock:
+            key = (normalize_text(text), target_lang)
+            entry = self._exact.get(key)
+            if entry and self._source_compatible(entry, source_lang):
+                self._touch(key)
+                self._stats["exact_hits"] += 1
+                return MemoryMatch(entry.translation, 1.0, "exact", entry.source_text, entry.source_lang)
+            match = self._fuzzy(text, target_lang, source_lang) if fuzzy else None
+            self._stats["fuzzy_hits" if match else "misses"] += 1
+            return match
+
+    @staticmethod
+    def _source_compatible(entry, source_lang):
+        return not source_lang or source_lang == "auto" or entry.source_lang in (None, source_lang)
+
+    def _fuzzy(self, text, target_lang, source_lang):
+        key = fuzzy_key(text)
+        if self.threshold >= 1 or len(key) > TM_FUZZY_MAX_CHARS:
+            return None
+        entries = self._entries.get(target_lang)
+        if not entries:
+            return None
+        postings = self._postings[target_lang]
+        grams = ngrams(key)
+        size = sum(grams.values())
+        # Dice >= t requires the candidate's size to lie within these bounds
+        low = size * self.threshold / (2 - self.threshold)
+        high = size * (2 - self.threshold) / self.threshold
+        shared = Counter()
+        for gram, count in grams.items():
+            posting = postings.get(gram)
+            if posting and len(posting) <= MAX_POSTING:
+                for entry_id in posting:
+                    shared[entry_id] += count
+        numbers = NUMBER_RE.findall(text)
+        best = None
+        best_score = self.threshold
+        for entry_id, _ in shared.most_common(50):
+            entry = entries[entry_id]
+            if not low <= entry.size <= high or entry.numbers != numbers:
+                continue
+            if not self._source_compatible(entry, source_lang):
+                continue
+            overlap = sum(min(count, entry.grams.get(gram, 0)) for gram, count in grams.items())
+            score = 2 * overlap / (size + entry.size)
+            if score >= best_score:
+                best, best_score = entry, score
+        if best is None:
+            return None
+        return MemoryMatch(best.translation, round(best_score, 4), "fuzzy", best.source_text, best.source_lang)
+
+    # ---------- Loading from translator.db ----------
+
+    def refresh_if_stale(self):
+        if self.db_path and time.time() - self._last_refresh >= self.refresh_seconds:
+            self.refresh()
+
+    def refresh(self):
+        """Load phrasebook and translations rows newer than the last load."""
+        if not self._refresh_lock.acquire(blocking=False):
+            return 0  # another thread is already loading
+        try:
+            return self._refresh()
+        finally:
+            self._refresh_lock.release()
+
+    def _refresh(self):
+        self._last_refresh = time.time()
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+        except sqlite3.Error as e:
+            logger.warning(f"Translation memory refresh failed: {e}")
+            return 0
+        loaded = 0
+        try:
+            # Newest rows first, capped, then replayed oldest first so later rows win.
+            # History contributes only raw provider output (not memory hits,
+            # not domain/style-rewritten text); older rows without it are skipped
+            queries = {
+                "phrasebook": "SELECT source_text, NULL, target_lang, translated_text, created_at "
+                              "FROM phrasebook WHERE created_at > ? ORDER BY created_at DESC LIMIT ?",
+                "translations": "SELECT source_text, source_lang, target_lang, raw_text, created_at "
+                                f"FROM translations WHERE created_at > ? AND origin = '{ORIGIN_PROVIDER}' "
+                                "AND raw_text IS NOT NULL ORDER BY created_at DESC LIMIT ?",
+            }
+            for table, sql in queries.items():
+                try:
+                    rows = conn.execute(sql, (self._loaded_until[table], self.max_entries)).fetchall()
+                except sqlite3.OperationalError:
+                    continue  # table (or provenance columns) not created yet
+                for source_text, source_lang, target_lang, translated, created_at in reversed(rows):
+                    self.add(source_text, target_lang, translated, source_lang, curated=table == "phrasebook")
+                    loaded += 1
+                    self._loaded_until[table] = created_at or self._loaded_until[table]
+        finally:
+            conn.close()
+        if loaded:
+            logger.info(f"Translation memory loaded {loaded} rows ({len(self._exact)} entries)")
+        return loaded
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(
+                entries=len(self._exact),
+                curated=len(self._exact) - len(self._learned),
+                fuzzy_entries=sum(len(e) for e in self._entries.values()),
+                max_entries=self.max_entries,
+                threshold=self.threshold
+            )
+        return stats
@@ -0,0 +1,179 @@
+"""
+Pooled SQLite access for Lang_translator.py.
+
+- A fixed pool of connections, each in WAL mode with synchronous=NORMAL and a
+  busy timeout, so readers never block on the writer and connections are not
+  reopened per call.
+- A group-commit writer: concurrent writes are queued to one thread that
+  commits whatever has queued up in a single transaction, so N concurrent
+  saves cost one fsync instead of N. Callers still wait for their commit.
+- Keyset pagination helpers for the history API.
+"""
+import os
+import time
+import queue
+import base64
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "8"))
+DB_BUSY_TIMEOUT_MS = int(os.environ.get("DB_BUSY_TIMEOUT_MS", "10000"))
+DB_COMMIT_BATCH = int(os.environ.get("DB_COMMIT_BATCH", "256"))
+DB_COMMIT_DELAY = float(os.environ.get("DB_COMMIT_DELAY_MS", "2")) / 1000  # extra wait to let a group form
+
+
+class ConnectionPool:
+    """Fixed-size pool of WAL-mode SQLite connections shared across threads."""
+
+    def __init__(self, db_path, size=DB_POOL_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=DB_BUSY_TIMEOUT_MS / 1000)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; uncommitted work is rolled back when it is returned."""
+        conn = None
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if self._created < self.size:
+                    self._created += 1
+                    conn = self._open()
+            if conn is None:
+                conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+
+class _Write:
+    __slots__ = ("sql", "params", "done", "error")
+
+    def __init__(self, sql, params):
+        self.sql = sql
+        self.params = params
+        self.done = threading.Event()
+        self.error = None
+
+
+class GroupCommitWriter:
+    """Single writer thread committing queued statements in shared transactions."""
+
+    def __init__(self, pool, max_batch=DB_COMMIT_BATCH, max_delay=DB_COMMIT_DELAY):
+        self.pool = pool
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"writes": 0, "commits": 0, "failed": 0}
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="sqlite-group-commit", daemon=True)
+                    self._thread.start()
+
+    def execute(self, sql, params=(), wait=True, timeout=30):
+        """Queue one statement; with wait=True, block until it is committed (or raise its error)."""
+        self._ensure_started()
+        write = _Write(sql, params)
+        self._queue.put(write)
+        if wait:
+            if not write.done.wait(timeout):
+                raise TimeoutError("database write not committed in time")
+            if write.error:
+                raise write.error
+        return write
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+        return batch
+
+    def _commit(self, batch):
+        with self.pool.connection() as conn:
+            try:
+                with conn:
+                    for write in batch:
+                        conn.execute(write.sql, write.params)
+                commits = 1
+            except sqlite3.Error:
+                # One bad statement must not fail the rest of the group
+                commits = 0
+                for write in batch:
+                    try:
+                        with conn:
+                            conn.execute(write.sql, write.params)
+                        commits += 1
+                    except sqlite3.Error as e:
+                        write.error = e
+        failed = sum(1 for w in batch if w.error)
+        with self._stats_lock:
+            self._stats["writes"] += len(batch)
+            self._stats["commits"] += commits
+            self._stats["failed"] += failed
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self._commit(batch)
+            except Exception as e:
+                logger.error(f"Group commit failed: {e}")
+                for write in batch:
+                    write.error = write.error or e
+            finally:
+                for write in batch:
+                    write.done.set()
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update(queued=self._queue.qsize(), avg_group=round(stats["writes"] / stats["commits"], 2) if stats["commits"] else 0)
+        return stats
+
+
+def encode_cursor(created_at, row_id):
+    return base64.urlsafe_b64encode(f"{created_at}|{row_id}".encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """Return (created_at, id) from a cursor; raises ValueError if malformed."""
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+    except Exception:
+        raise ValueError("invalid cursor")
+    return created_at, row_id
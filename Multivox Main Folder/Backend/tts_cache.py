@@ -0,0 +1,149 @@
+"""
+Bounded on-disk cache for synthesized speech.
+
+MP3s are stored under a hash of (text, lang, slow). The cache is capped by
+total bytes and evicts least-recently-used files first; recency survives
+restarts because hits touch the file's mtime. Misses are written through
+while the bytes are streamed to the client.
+"""
+import os
+import uuid
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+TTS_CACHE_DIR = os.environ.get("TTS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "multivox_tts_cache"))
+TTS_CACHE_MAX_BYTES = int(os.environ.get("TTS_CACHE_MAX_BYTES", 256 * 1024 * 1024))  # 256 MB
+
+
+def tts_key(text, lang, slow=False):
+    raw = f"{lang}\x1f{int(bool(slow))}\x1f{text}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """Byte-capped LRU of MP3 files keyed by tts_key()."""
+
+    def __init__(self, directory=TTS_CACHE_DIR, max_bytes=TTS_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._index = OrderedDict()  # key -> size, oldest first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "bytes_evicted": 0}
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.mp3")
+
+    def _load_index(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if ".part-" in name:
+                # Leftover from an interrupted stream
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+                continue
+            if not name.endswith(".mp3"):
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, name[:-4], st.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._bytes += size
+        with self._lock:
+            self._evict_locked()
+
+    def _evict_locked(self):
+        while self._bytes > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self._bytes -= size
+            self._stats["evictions"] += 1
+            self._stats["bytes_evicted"] += size
+            try:
+                os.unlink(self._path(key))
+            except OSError:
+                pass
+
+    def open(self, text, lang, slow=False):
+        """Return an open binary file for a cached MP3, or None on a miss."""
+        key = tts_key(text, lang, slow)
+        with self._lock:
+            if key in self._index:
+                try:
+                    f = open(self._path(key), "rb")
+                except OSError:
+                    self._bytes -= self._index.pop(key)
+                else:
+                    self._touch_locked(key)
+                    return f
+            self._stats["misses"] += 1
+        return None
+
+    def read(self, text, lang, slow=False):
+        """Return the cached MP3 bytes, or None on a miss."""
+        f = self.open(text, lang, slow)
+        if f is None:
+            return None
+        with f:
+            return f.read()
+
+    def _touch_locked(self, key):
+        self._index.move_to_end(key)
+        self._stats["hits"] += 1
+        try:
+            os.utime(self._path(key))
+        except OSError:
+            pass
+
+    def stream_and_store(self, text, lang, slow, chunks):
+        """
+        Yield MP3 chunks from `chunks` while writing them to the cache.
+        The file is only published once the stream completes; an aborted
+        stream (error or client disconnect) leaves nothing behind.
+        """
+        key = tts_key(text, lang, slow)
+        part_path = f"{self._path(key)}.part-{uuid.uuid4().hex}"
+        size = 0
+        completed = False
+        try:
+            with open(part_path, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+                    yield chunk
+            completed = True
+        finally:
+            if completed and size:
+                os.replace(part_path, self._path(key))
+                with self._lock:
+                    self._bytes -= self._index.pop(key, 0)
+                    self._index[key] = size
+                    self._bytes += size
+                    self._evict_locked()
+            else:
+                try:
+                    os.unlink(part_path)
+                except OSError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._index)
+            stats["bytes"] = self._bytes
+            stats["max_bytes"] = self.max_bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,154 @@
+"""
+Lifecycle management for the uploads folder.
+
+Uploads, yt-dlp downloads and rendered outputs all land in one directory.
+UploadStorage tracks when each file was last used, and a background sweeper
+deletes files idle for longer than UPLOAD_TTL_SECONDS, then the least
+recently used ones while the folder is over UPLOAD_MAX_BYTES. Files pinned
+by a running job or an open download are never deleted.
+"""
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_TTL_SECONDS = float(os.environ.get("UPLOAD_TTL_SECONDS", 24 * 3600))
+UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES", 10 * 1024 * 1024 * 1024))  # 10 GB
+UPLOAD_SWEEP_INTERVAL = float(os.environ.get("UPLOAD_SWEEP_INTERVAL", 300))  # seconds
+
+
+class UploadStorage:
+    """Access tracking, pinning and TTL/quota eviction for one directory."""
+
+    def __init__(self, directory, ttl=UPLOAD_TTL_SECONDS, max_bytes=UPLOAD_MAX_BYTES,
+                 sweep_interval=UPLOAD_SWEEP_INTERVAL):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        self._last_access = {}
+        self._pins = {}
+        self._stats = {"sweeps": 0, "expired": 0, "evicted": 0, "bytes_freed": 0}
+        self._sweeper = None
+        self._stop = threading.Event()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, filename):
+        return os.path.join(self.directory, filename)
+
+    def touch(self, filename):
+        """Record an access; file mtimes are left alone so ETags stay stable."""
+        with self._lock:
+            self._last_access[filename] = time.time()
+
+    def pin(self, filename):
+        with self._lock:
+            self._pins[filename] = self._pins.get(filename, 0) + 1
+            self._last_access[filename] = time.time()
+
+    def release(self, filename):
+        with self._lock:
+            count = self._pins.get(filename, 0) - 1
+            if count > 0:
+                self._pins[filename] = count
+            else:
+                self._pins.pop(filename, None)
+            self._last_access[filename] = time.time()
+
+    @contextmanager
+    def in_use(self, filename):
+        self.pin(filename)
+        try:
+            yield self.path(filename)
+        finally:
+            self.release(filename)
+
+    def last_access(self, filename, st):
+        # Files from before this process started fall back to their mtime
+        return self._last_access.get(filename, st.st_mtime)
+
+    def _scan(self):
+        files = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False):
+                    files.append((entry.name, entry.stat()))
+        return files
+
+    def _delete(self, filename, size, reason):
+        try:
+            os.remove(self.path(filename))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not delete {filename}: {e}")
+            return False
+        self._last_access.pop(filename, None)
+        self._stats[reason] += 1
+        self._stats["bytes_freed"] += size
+        logger.info(f"Deleted {reason} upload {filename} ({size} bytes)")
+        return True
+
+    def sweep(self):
+        """Delete expired files, then least recently used ones until under quota."""
+        now = time.time()
+        files = self._scan()
+        with self._lock:
+            self._stats["sweeps"] += 1
+            kept = []
+            for name, st in files:
+                if name in self._pins:
+                    kept.append((self.last_access(name, st), name, st.st_size, True))
+                elif now - self.last_access(name, st) > self.ttl:
+                    self._delete(name, st.st_size, "expired")
+                else:
+                    kept.append((self.last_access(name, st), name, st.st_size, False))
+
+            total = sum(size for _, _, size, _ in kept)
+            for _, name, size, pinned in sorted(kept):
+                if total <= self.max_bytes:
+                    break
+                if not pinned and self._delete(name, size, "evicted"):
+                    total -= size
+            # Forget files that disappeared behind our back
+            present = {name for _, name, _, _ in kept}
+            for name in list(self._last_access):
+                if name not in present and name not in self._pins:
+                    del self._last_access[name]
+        return total
+
+    def start(self):
+        """Run sweep() every sweep_interval seconds on a daemon thread."""
+        if self._sweeper is not None:
+            return
+
+        def run():
+            while not self._stop.wait(self.sweep_interval):
+                try:
+                    self.sweep()
+                except Exception as e:
+                    logger.error(f"Upload sweep failed: {e}")
+
+        self._sweeper = threading.Thread(target=run, name="upload-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        files = self._scan()
+        with self._lock:
+            stats = dict(self._stats)
+            pinned = len(self._pins)
+        stats.update(
+            files=len(files),
+            bytes=sum(st.st_size for _, st in files),
+            max_bytes=self.max_bytes,
+            ttl_seconds=self.ttl,
+            pinned=pinned,
+        )
+        return stats
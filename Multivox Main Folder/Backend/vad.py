@@ -0,0 +1,206 @@
+"""
+Energy-based voice activity detection on 16-bit mono PCM.
+
+Used to cut long recordings into bounded-length chunks at pauses so they can
+be recognized independently and in parallel.
+"""
+import array
+import math
+
+try:
+    import audioop  # C implementation; removed from the stdlib in Python 3.13
+except ImportError:
+    audioop = None
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+FRAME_MS = 30
+
+# RMS below this is always treated as silence (s16 scale)
+MIN_ENERGY_THRESHOLD = 300
+# Speech must be this many times louder than the estimated noise floor
+NOISE_FLOOR_RATIO = 3.0
+
+
+def frame_rms(frame):
+    """RMS energy of one s16le frame."""
+    if audioop is not None:
+        return audioop.rms(frame, SAMPLE_WIDTH)
+    samples = array.array("h", frame[: len(frame) - len(frame) % SAMPLE_WIDTH])
+    if not samples:
+        return 0
+    return int(math.sqrt(sum(s * s for s in samples) / len(samples)))
+
+
+def frame_energies(pcm, sample_rate=SAMPLE_RATE, frame_ms=FRAME_MS):
+    """Split PCM into fixed-size frames and return (frame_bytes, [rms, ...])."""
+    frame_bytes = int(sample_rate * frame_ms / 1000) * SAMPLE_WIDTH
+    energies = [frame_rms(pcm[i:i + frame_bytes]) for i in range(0, len(pcm), frame_bytes)]
+    return frame_bytes, energies
+
+
+def energy_threshold(energies):
+    """Adaptive speech threshold from the quietest tenth of the frames."""
+    if not energies:
+        return MIN_ENERGY_THRESHOLD
+    floor = sorted(energies)[len(energies) // 10]
+    return max(MIN_ENERGY_THRESHOLD, floor * NOISE_FLOOR_RATIO)
+
+
+def split_on_silence(pcm, sample_rate=SAMPLE_RATE, max_chunk_s=15.0, min_chunk_s=2.0,
+                     min_silence_ms=300, frame_ms=FRAME_MS):
+    """
+    Split PCM at pauses into chunks no longer than max_chunk_s.
+
+    Returns a list of (start, end) byte offsets into `pcm`. Chunks are cut in
+    the middle of a pause once they are at least min_chunk_s long; a chunk
+    that reaches max_chunk_s without a pause is cut at its quietest frame.
+    Chunks with no voiced frames are dropped.
+    """
+    frame_bytes, energies = frame_energies(pcm, sample_rate, frame_ms)
+    if not energies:
+        return []
+    threshold = energy_threshold(energies)
+    voiced = [e >= threshold for e in energies]
+
+    max_frames = max(1, int(max_chunk_s * 1000 / frame_ms))
+    min_frames = int(min_chunk_s * 1000 / frame_ms)
+    min_silence = max(1, int(min_silence_ms / frame_ms))
+
+    cuts = []  # frame indices where a new chunk starts
+    start = 0
+    silence_run = 0
+    for i, is_voiced in enumerate(voiced):
+        silence_run = 0 if is_voiced else silence_run + 1
+        length = i - start + 1
+        pause_ends = silence_run and i + 1 < len(voiced) and voiced[i + 1]
+        if pause_ends and silence_run >= min_silence and length >= min_frames:
+            # Cut in the middle of the pause
+            cut = i + 1 - silence_run // 2
+            cuts.append(cut)
+            start = cut
+            silence_run = 0
+        elif length >= max_frames:
+            # No pause in time: cut at the quietest frame of the last third
+            window_start = start + max_frames * 2 // 3
+            cut = min(range(window_start, i + 1), key=lambda j: energies[j]) + 1
+            cuts.append(cut)
+            start = cut
+            silence_run = 0
+
+    spans = []
+    bounds = [0] + cuts + [len(energies)]
+    for a, b in zip(bounds, bounds[1:]):
+        if b > a and any(voiced[a:b]):
+            spans.append((a * frame_bytes, min(b * frame_bytes, len(pcm))))
+    return spans
+
+
+def span_seconds(span, sample_rate=SAMPLE_RATE):
+    """Convert a (start, end) byte span to seconds."""
+    start, end = span
+    return start / (sample_rate * SAMPLE_WIDTH), end / (sample_rate * SAMPLE_WIDTH)
+
+
+class StreamingSegmenter:
+    """
+    Incremental VAD for live audio.
+
+    Feed PCM as it arrives; feed() returns the utterances closed by a pause
+    of end_silence_ms (or by reaching max_utterance_s) as
+    (start_s, end_s, pcm) tuples. The noise floor is tracked as a running
+    average of unvoiced frames since there is no whole clip to look at.
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE, end_silence_ms=400, max_utterance_s=15.0,
+                 preroll_ms=200, min_speech_ms=150, frame_ms=FRAME_MS):
+        self.sample_rate = sample_rate
+        self.frame_bytes = int(sample_rate * frame_ms / 1000) * SAMPLE_WIDTH
+        self.frame_s = frame_ms / 1000
+        self.end_silence = max(1, int(end_silence_ms / frame_ms))
+        self.max_frames = max(1, int(max_utterance_s * 1000 / frame_ms))
+        self.min_speech = max(1, int(min_speech_ms / frame_ms))
+        self._preroll_frames = max(0, int(preroll_ms / frame_ms))
+        self._pending = b""
+        self._preroll = []
+        self._frames = []
+        self._speech_frames = 0
+        self._silence_run = 0
+        self._noise_floor = None
+        self._position = 0  # frames consumed so far
+        self._start = 0
+
+    @property
+    def in_utterance(self):
+        return bool(self._frames)
+
+    @property
+    def speech_seconds(self):
+        """Voiced audio in the utterance currently being collected."""
+        return self._speech_frames * self.frame_s
+
+    def current(self):
+        """The in-progress utterance as (start_s, end_s, pcm), or None."""
+        if not self._frames:
+            return None
+        return self._emit_tuple()
+
+    def _emit_tuple(self):
+        start = self._start * self.frame_s
+        return start, start + len(self._frames) * self.frame_s, b"".join(self._frames)
+
+    def _is_voiced(self, energy):
+        if self._noise_floor is None:
+            self._noise_floor = energy
+        threshold = max(MIN_ENERGY_THRESHOLD, self._noise_floor * NOISE_FLOOR_RATIO)
+        voiced = energy >= threshold
+        if not voiced:
+            self._noise_floor = 0.95 * self._noise_floor + 0.05 * energy
+        return voiced
+
+    def _close(self):
+        utterance = self._emit_tuple() if self._speech_frames >= self.min_speech else None
+        self._frames = []
+        self._speech_frames = 0
+        self._silence_run = 0
+        return utterance
+
+    def feed(self, pcm):
+        closed = []
+        data = self._pending + pcm
+        usable = len(data) - len(data) % self.frame_bytes
+        self._pending = data[usable:]
+        for i in range(0, usable, self.frame_bytes):
+            frame = data[i:i + self.frame_bytes]
+            voiced = self._is_voiced(frame_rms(frame))
+            self._position += 1
+            if not self._frames:
+                if voiced:
+                    self._frames = self._preroll + [frame]
+                    self._start = self._position - len(self._frames)
+                    self._speech_frames = 1
+                    self._preroll = []
+                elif self._preroll_frames:
+                    self._preroll = (self._preroll + [frame])[-self._preroll_frames:]
+                continue
+            self._frames.append(frame)
+            if voiced:
+                self._speech_frames += 1
+                self._silence_run = 0
+            else:
+                self._silence_run += 1
+            if self._silence_run >= self.end_silence or len(self._frames) >= self.max_frames:
+                utterance = self._close()
+                if utterance:
+                    closed.append(utterance)
+        return closed
+
+    def flush(self):
+        """Close whatever utterance is in progress at end of stream."""
+        if self._pending and self._frames:
+            self._frames.append(self._pending)
+        self._pending = b""
+        if not self._frames:
+            return []
+        utterance = self._close()
+        return [utterance] if utterance else []
@@ -0,0 +1,186 @@
+"""
+Live voice translation sessions.
+
+A session owns one incremental decoder and one StreamingSegmenter. Audio
+frames posted by the client are decoded as they arrive; every utterance the
+VAD closes is recognized and translated on the shared worker pool, and the
+results are queued as events for the client's event stream. While the user
+is still talking, the in-progress utterance is periodically recognized to
+push partial results.
+"""
+import os
+import time
+import uuid
+import queue
+import logging
+import threading
+from concurrent.futures import wait
+
+from audio_decoder import StreamingDecoder, PassthroughDecoder
+from vad import StreamingSegmenter
+
+logger = logging.getLogger(__name__)
+
+# Seconds of new speech between partial results for an utterance in progress
+PARTIAL_INTERVAL = float(os.environ.get("STREAM_PARTIAL_INTERVAL", "1.0"))
+# Sessions that receive no audio for this long are closed
+SESSION_IDLE_TIMEOUT = float(os.environ.get("STREAM_IDLE_TIMEOUT", "30"))
+# How often idle sessions are looked for
+SESSION_SWEEP_INTERVAL = float(os.environ.get("STREAM_SWEEP_INTERVAL", "5"))
+
+
+class StreamSession:
+    """One client's live audio stream and its outgoing event queue."""
+
+    def __init__(self, target_lang, recognize_fn, translate_fn, executor, input_format=None):
+        self.id = str(uuid.uuid4())
+        self.target_lang = target_lang
+        self.recognize_fn = recognize_fn
+        self.translate_fn = translate_fn
+        self.executor = executor
+        self.events = queue.Queue()
+        self.last_activity = time.time()
+        self.closed = False
+        self._lock = threading.Lock()
+        self._segmenter = StreamingSegmenter()
+        self._futures = []
+        self._utterance = 0
+        self._finalized = set()
+        self._partial_in_flight = False
+        self._partial_at = 0.0
+        if input_format == "s16le":
+            self._decoder = PassthroughDecoder(self._on_pcm, self._on_end)
+        else:
+            self._decoder = StreamingDecoder(self._on_pcm, self._on_end, input_format=input_format)
+
+    # ---------- Client side ----------
+    def feed(self, data):
+        with self._lock:
+            if self.closed:
+                raise ValueError("session is closed")
+            self.last_activity = time.time()
+            self._decoder.write(data)
+
+    def close(self):
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+        self._decoder.close()
+
+    # ---------- Decoder side ----------
+    def _on_pcm(self, pcm):
+        for start, end, utterance in self._segmenter.feed(pcm):
+            self._submit_final(start, end, utterance)
+        if (self._segmenter.in_utterance and not self._partial_in_flight
+                and self._segmenter.speech_seconds - self._partial_at >= PARTIAL_INTERVAL):
+            self._partial_at = self._segmenter.speech_seconds
+            self._partial_in_flight = True
+            _, _, pcm_so_far = self._segmenter.current()
+            self._futures.append(self.executor.submit(self._run_partial, self._utterance, pcm_so_far))
+
+    def _on_end(self):
+        for start, end, utterance in self._segmenter.flush():
+            self._submit_final(start, end, utterance)
+        wait(self._futures)
+        self.closed = True
+        self.events.put({"type": "end", "utterances": self._utterance})
+
+    def _submit_final(self, start, end, pcm):
+        index = self._utterance
+        self._utterance += 1
+        self._partial_at = 0.0
+        self._futures.append(self.executor.submit(self._run_final, index, start, end, pcm))
+        self._futures = [f for f in self._futures if not f.done()]
+
+    # ---------- Workers ----------
+    def _recognize_and_translate(self, pcm):
+        text = self.recognize_fn(pcm)
+        translated = self.translate_fn(text, self.target_lang) if text else ""
+        return text, translated
+
+    def _run_partial(self, index, pcm):
+        try:
+            text, translated = self._recognize_and_translate(pcm)
+            if text and index not in self._finalized:
+                self.events.put({
+                    "type": "partial",
+                    "utterance": index,
+                    "transcript": text,
+                    "translated_text": translated,
+                })
+        except Exception as e:
+            logger.debug(f"Partial recognition failed: {e}")
+        finally:
+            self._partial_in_flight = False
+
+    def _run_final(self, index, start, end, pcm):
+        self._finalized.add(index)
+        event = {"utterance": index, "start": round(start, 2), "end": round(end, 2)}
+        try:
+            text, translated = self._recognize_and_translate(pcm)
+            event.update(type="result", transcript=text, translated_text=translated)
+        except Exception as e:
+            event.update(type="error", error=f"Error with speech recognition service: {e}")
+        self.events.put(event)
+
+
+class SessionRegistry:
+    """Thread-safe map of live sessions with idle expiry (see start())."""
+
+    def __init__(self, idle_timeout=SESSION_IDLE_TIMEOUT, sweep_interval=SESSION_SWEEP_INTERVAL):
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sweeper = None
+
+    def add(self, session):
+        self.expire_idle()
+        with self._lock:
+            self._sessions[session.id] = session
+        return session
+
+    def get(self, session_id):
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def remove(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None)
+
+    def expire_idle(self):
+        """Close idle sessions and drop finished ones nobody collected."""
+        cutoff = time.time() - self.idle_timeout
+        with self._lock:
+            stale = [s for s in self._sessions.values() if s.last_activity < cutoff]
+            for session in stale:
+                if session.closed:
+                    del self._sessions[session.id]
+        for session in stale:
+            if not session.closed:
+                logger.info(f"Closing idle stream session {session.id}")
+                session.close()
+
+    def start(self):
+        """Run expire_idle() every sweep_interval seconds on a daemon thread."""
+        if self._sweeper is not None:
+            return
+
+        def run():
+            while not self._stop.wait(self.sweep_interval):
+                try:
+                    self.expire_idle()
+                except Exception as e:
+                    logger.error(f"Stream session sweep failed: {e}")
+
+        self._sweeper = threading.Thread(target=run, name="stream-session-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
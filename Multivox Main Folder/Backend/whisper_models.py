@@ -0,0 +1,270 @@
+"""
+Lazy, multi-size Whisper model manager.
+
+Models are loaded on first use rather than at import, so the server starts
+immediately and a failed load only fails the request that needed it. Each
+request can pick a size; loaded models are kept in an LRU bounded by a RAM
+budget (WHISPER_MODEL_BUDGET_MB), and models in use are never evicted.
+Sizes listed in WHISPER_WARMUP are loaded in the background at boot.
+
+The process pools used for long media (parallel_transcription) hold one CPU
+copy of the model per worker, so they are managed here too: each pool is
+charged workers x model size against the same budget, is evicted with the
+models in least-recently-used order, and is shut down once it has been idle
+for WHISPER_POOL_IDLE_SECONDS.
+"""
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import whisper
+
+from parallel_transcription import ParallelTranscriber
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_SIZE = os.environ.get("WHISPER_MODEL_SIZE", "base")
+MODEL_BUDGET_BYTES = int(float(os.environ.get("WHISPER_MODEL_BUDGET_MB", "4096")) * 1024 * 1024)
+WARMUP_SIZES = [s.strip() for s in os.environ.get("WHISPER_WARMUP", "").split(",") if s.strip()]
+POOL_IDLE_SECONDS = float(os.environ.get("WHISPER_POOL_IDLE_SECONDS", "600"))
+
+# Parameter counts, for sizing worker pools whose models live in other processes
+MODEL_PARAMS = {"tiny": 39e6, "base": 74e6, "small": 244e6, "medium": 769e6, "large": 1550e6, "turbo": 809e6}
+FLOAT32_BYTES = 4
+# torch runtime and audio buffers of one worker process
+WORKER_OVERHEAD_BYTES = 300 * 1024 * 1024
+
+
+class UnknownModelError(ValueError):
+    """Raised for a model size Whisper does not provide."""
+
+
+def model_bytes(model):
+    """Resident size of a model's parameters and buffers."""
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+def estimated_model_bytes(size):
+    """CPU (fp32) footprint of a model size that is not loaded in this process."""
+    family = "turbo" if "turbo" in size else size.split(".")[0].split("-")[0]
+    return int(MODEL_PARAMS.get(family, MODEL_PARAMS["large"]) * FLOAT32_BYTES)
+
+
+class LoadedModel:
+    """A resident model with its own transcription lock."""
+
+    def __init__(self, size, model):
+        self.size = size
+        self.model = model
+        # model.transcribe is not thread-safe; one transcription per model at a time
+        self.lock = threading.Lock()
+        self.bytes = model_bytes(model)
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+        self.users = 0
+
+
+class WorkerPool:
+    """A parallel transcriber's process pool, charged workers x model size."""
+
+    def __init__(self, size, transcriber, bytes_):
+        self.size = size
+        self.transcriber = transcriber
+        self.bytes = bytes_
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+        self.users = 0
+
+
+class ModelManager:
+    """LRU of loaded Whisper models and worker pools, bounded by a RAM budget."""
+
+    def __init__(self, default_size=DEFAULT_MODEL_SIZE, budget_bytes=MODEL_BUDGET_BYTES, loader=whisper.load_model,
+                 pool_factory=ParallelTranscriber, pool_idle_seconds=POOL_IDLE_SECONDS):
+        self.default_size = default_size
+        self.budget_bytes = budget_bytes
+        self.pool_idle_seconds = pool_idle_seconds
+        self._loader = loader
+        self._pool_factory = pool_factory
+        self._models = OrderedDict()
+        self._pools = {}  # size -> WorkerPool
+        self._lock = threading.Lock()
+        self._loading = {}  # size -> lock, so concurrent requests load a size once
+        self._reaper = None
+        self._stats = {"loads": 0, "hits": 0, "evictions": 0, "pools_started": 0, "pools_stopped": 0}
+
+    def available(self):
+        return whisper.available_models()
+
+    def resolve(self, size=None):
+        """Validate a requested size, defaulting to the configured one."""
+        size = (size or self.default_size).strip()
+        if size not in self.available():
+            raise UnknownModelError(f"Unknown Whisper model size: {size}")
+        return size
+
+    def _load(self, size):
+        with self._lock:
+            entry = self._models.get(size)
+            if entry:
+                self._models.move_to_end(size)
+                self._stats["hits"] += 1
+                return entry
+            load_lock = self._loading.setdefault(size, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                entry = self._models.get(size)
+                if entry:
+                    self._stats["hits"] += 1
+                    return entry
+            logger.info(f"Loading Whisper model '{size}'...")
+            started = time.time()
+            entry = LoadedModel(size, self._loader(size))
+            logger.info(f"Whisper model '{size}' loaded in {time.time() - started:.1f}s "
+                        f"({entry.bytes / 1024 / 1024:.0f} MB)")
+            with self._lock:
+                self._models[size] = entry
+                self._stats["loads"] += 1
+                self._evict_locked(keep=entry)
+            return entry
+
+    def _resident_bytes_locked(self):
+        return sum(e.bytes for e in self._models.values()) + sum(p.bytes for p in self._pools.values())
+
+    def _evict_locked(self, keep):
+        """Evict idle models and pools, least recently used first, until within budget; `keep` is an entry."""
+        total = self._resident_bytes_locked()
+        candidates = sorted(list(self._models.values()) + list(self._pools.values()), key=lambda e: e.last_used)
+        for entry in candidates:
+            if total <= self.budget_bytes:
+                break
+            if entry is keep or entry.users:
+                continue
+            if isinstance(entry, WorkerPool):
+                self._stop_pool_locked(entry, "evicted")
+            else:
+                del self._models[entry.size]
+                logger.info(f"Evicted Whisper model '{entry.size}' ({entry.bytes / 1024 / 1024:.0f} MB)")
+            total -= entry.bytes
+            self._stats["evictions"] += 1
+
+    def _stop_pool_locked(self, pool, reason):
+        del self._pools[pool.size]
+        pool.transcriber.shutdown()
+        self._stats["pools_stopped"] += 1
+        logger.info(f"Stopped Whisper worker pool '{pool.size}' ({reason}, {pool.bytes / 1024 / 1024:.0f} MB)")
+
+    @contextmanager
+    def use(self, size=None):
+        """Check out a loaded model (loading it if needed); it is not evicted while in use."""
+        size = self.resolve(size)
+        while True:
+            entry = self._load(size)
+            with self._lock:
+                # Lost a race with eviction between load and check-out
+                if self._models.get(size) is entry:
+                    entry.users += 1
+                    break
+        try:
+            yield entry
+        finally:
+            with self._lock:
+                entry.users -= 1
+                entry.last_used = time.time()
+                self._evict_locked(keep=None)
+
+    def _pool_bytes_locked(self, size, workers):
+        loaded = self._models.get(size)
+        per_worker = loaded.bytes if loaded else estimated_model_bytes(size)
+        return workers * (per_worker + WORKER_OVERHEAD_BYTES)
+
+    @contextmanager
+    def use_pool(self, size=None):
+        """
+        Check out the ParallelTranscriber for a size, creating it if needed.
+        Its pool counts against the budget and is not evicted while in use.
+        """
+        size = self.resolve(size)
+        with self._lock:
+            pool = self._pools.get(size)
+            if pool is None:
+                transcriber = self._pool_factory(size)
+                pool = WorkerPool(size, transcriber, self._pool_bytes_locked(size, transcriber.workers))
+                self._pools[size] = pool
+                self._stats["pools_started"] += 1
+                self._evict_locked(keep=pool)
+            pool.users += 1
+        try:
+            yield pool.transcriber
+        finally:
+            with self._lock:
+                pool.users -= 1
+                pool.last_used = time.time()
+                self._evict_locked(keep=None)
+
+    def reap_idle(self):
+        """Shut down worker pools unused for pool_idle_seconds."""
+        cutoff = time.time() - self.pool_idle_seconds
+        with self._lock:
+            for pool in list(self._pools.values()):
+                if not pool.users and pool.last_used < cutoff:
+                    self._stop_pool_locked(pool, "idle")
+
+    def start(self):
+        """Start the background thread that shuts down idle worker pools."""
+        def reap():
+            while True:
+                time.sleep(max(1.0, min(60.0, self.pool_idle_seconds / 2)))
+                try:
+                    self.reap_idle()
+                except Exception as e:
+                    logger.error(f"Reaping idle Whisper pools failed: {e}")
+
+        if self._reaper is None:
+            self._reaper = threading.Thread(target=reap, name="whisper-pool-reaper", daemon=True)
+            self._reaper.start()
+
+    def warm_up(self, sizes):
+        """Load `sizes` on a background thread."""
+        def load_all():
+            for size in sizes:
+                try:
+                    self._load(self.resolve(size))
+                except Exception as e:
+                    logger.error(f"Warm-up of Whisper model '{size}' failed: {e}")
+
+        if sizes:
+            threading.Thread(target=load_all, name="whisper-warmup", daemon=True).start()
+
+    def stats(self):
+        with self._lock:
+            resident = [{
+                "size": e.size,
+                "kind": "model",
+                "bytes": e.bytes,
+                "inUse": e.users,
+                "loadedAt": e.loaded_at,
+                "lastUsed": e.last_used,
+            } for e in self._models.values()] + [{
+                "size": p.size,
+                "kind": "workers",
+                "workers": p.transcriber.workers,
+                "bytes": p.bytes,
+                "inUse": p.users,
+                "loadedAt": p.loaded_at,
+                "lastUsed": p.last_used,
+            } for p in self._pools.values()]
+            stats = dict(self._stats)
+        stats.update(
+            default=self.default_size,
+            budget_bytes=self.budget_bytes,
+            pool_idle_seconds=self.pool_idle_seconds,
+            resident_bytes=sum(m["bytes"] for m in resident),
+            resident=resident,
+        )
+        return stats